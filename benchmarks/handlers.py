@@ -0,0 +1,393 @@
+"""
+Handler benchmarks.
+
+Run every handler against the local test fixtures and report, per handler, the
+median wall time and CPU time (all threads), the peak memory allocated through
+Python and numpy (tracemalloc, GDAL internal buffers are not included) and the
+bytes read by the process (Linux only, `rchar` of /proc/self/io). Results are
+saved as JSON; `compare` reports the changes against a baseline and exits with
+status 1 if a handler got slower or uses more memory than `--threshold`.
+
+    $ python benchmarks/handlers.py run --output baseline.json
+    $ python benchmarks/handlers.py run --output results.json --only l8_
+    $ python benchmarks/handlers.py compare baseline.json results.json
+
+Caches (results, metadata, SRTM tiles, open datasets) are cleared before each
+call, so numbers are for cold requests; the GDAL block cache is kept. Timings
+include the tracemalloc overhead, compare results from the same machine only.
+"""
+
+import os
+import sys
+import gc
+import gzip
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import contextlib
+import statistics
+from unittest.mock import patch
+
+import numpy as np
+
+import rasterio
+from rio_toa import toa_utils
+
+from remotepixel import (
+    aws,
+    cbers_full,
+    cbers_ndvi,
+    cbers_ovr,
+    cbers_tile,
+    l8_full,
+    l8_mosaic,
+    l8_ndvi,
+    l8_ovr,
+    l8_tile,
+    s2_ndvi,
+    s2_ovr,
+    s2_tile,
+    srtm_mosaic,
+)
+from remotepixel.datasets import pool
+from remotepixel.stats import stats_cache
+from remotepixel.utils import footprint_cache, metadata_cache, result_cache
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+LANDSAT_SCENE = "LC08_L1TP_016037_20170813_20170814_01_RT"
+LANDSAT_BUCKET = os.path.join(FIXTURES, "landsat-pds")
+SENTINEL_SCENE = "S2A_tile_20170729_19UDP_0"
+SENTINEL_BUCKET = os.path.join(FIXTURES, "sentinel-s2-l1c")
+CBERS_SCENE = "CBERS_4_MUX_20171121_057_094_L2"
+CBERS_BUCKET = os.path.join(FIXTURES, "cbers-pds")
+SRTM_TILES = ["N42W074", "N42W075", "N43W074", "N43W075"]
+SRTM_POINTS = [[-74.9, 42.1], [-74.1, 42.9], [-73.5, 43.5]]
+
+L8_NDVI = "(b5 - b4) / (b5 + b4)"
+S2_NDVI = "(b08 - b04) / (b08 + b04)"
+CBERS_NDVI = "(b8 - b7) / (b8 + b7)"
+
+METRICS = ["wall_time", "cpu_time", "peak_memory", "bytes_read"]
+
+
+def landsat_meta():
+    """Parse the fixture MTL file."""
+    path = os.path.join(
+        LANDSAT_BUCKET, "c1", "L8", "016", "037", LANDSAT_SCENE, LANDSAT_SCENE
+    )
+    with open(f"{path}_MTL.txt", "r") as f:
+        return toa_utils._parse_mtl_txt(f.read())
+
+
+def srtm_objects(size=1201):
+    """Create synthetic gzipped SRTM tiles (3 arc-second, big-endian int16)."""
+    rng = np.random.RandomState(0)
+    objects = {}
+    for tile in SRTM_TILES:
+        data = rng.normal(500, 200, (size, size)).astype(">i2")
+        objects[srtm_mosaic._tile_key(tile)] = gzip.compress(data.tobytes())
+    return objects
+
+
+@contextlib.contextmanager
+def fixtures():
+    """Point the handlers to the local fixtures."""
+    meta = landsat_meta()
+    objects = srtm_objects()
+    with contextlib.ExitStack() as stack:
+        for module in [l8_full, l8_mosaic, l8_ndvi, l8_ovr, l8_tile]:
+            stack.enter_context(patch.object(module, "LANDSAT_BUCKET", LANDSAT_BUCKET))
+            stack.enter_context(
+                patch.object(module, "landsat_get_mtl", return_value=meta)
+            )
+        for module in [s2_ndvi, s2_ovr, s2_tile]:
+            stack.enter_context(
+                patch.object(module, "SENTINEL_BUCKET", SENTINEL_BUCKET)
+            )
+        stack.enter_context(
+            patch.object(
+                s2_ndvi,
+                "sentinel2_get_info",
+                return_value={"cloud_coverage": 5.01, "sat": "S2B"},
+            )
+        )
+        for module in [cbers_full, cbers_ndvi, cbers_ovr, cbers_tile]:
+            stack.enter_context(patch.object(module, "CBERS_BUCKET", CBERS_BUCKET))
+        stack.enter_context(
+            patch.object(
+                aws,
+                "iter_object",
+                side_effect=lambda bucket, key, **kwargs: (
+                    body for body in [objects[key]]
+                ),
+            )
+        )
+        yield
+
+
+def close(memfile):
+    """Release a `MemoryFile` result."""
+    memfile.close()
+
+
+CASES = [
+    ("l8_ovr.create", lambda: l8_ovr.create(LANDSAT_SCENE, bands=[4, 3, 2]), None),
+    (
+        "l8_ovr.create[expression]",
+        lambda: l8_ovr.create(LANDSAT_SCENE, expression=L8_NDVI),
+        None,
+    ),
+    (
+        "l8_ndvi.point",
+        lambda: l8_ndvi.point(LANDSAT_SCENE, [-80.073, 33.17], L8_NDVI),
+        None,
+    ),
+    (
+        "l8_ndvi.area",
+        lambda: l8_ndvi.area(LANDSAT_SCENE, [-80.5, 32.5, -79.5, 33.5], L8_NDVI),
+        None,
+    ),
+    (
+        "l8_tile.tile",
+        lambda: l8_tile.tile(LANDSAT_SCENE, 8, 71, 102, bands=[4, 3, 2]),
+        None,
+    ),
+    (
+        "l8_full.create",
+        lambda: l8_full.create(LANDSAT_SCENE, expression=L8_NDVI),
+        close,
+    ),
+    (
+        "s2_ovr.create",
+        lambda: s2_ovr.create(SENTINEL_SCENE, bands=["04", "03", "02"]),
+        None,
+    ),
+    (
+        "s2_ndvi.point",
+        lambda: s2_ndvi.point(
+            SENTINEL_SCENE, [-69.6140202938876, 48.25520824803732], S2_NDVI
+        ),
+        None,
+    ),
+    (
+        "s2_ndvi.area",
+        lambda: s2_ndvi.area(
+            SENTINEL_SCENE,
+            [-68.90625, 47.98992166741417, -67.5, 48.92249926375824],
+            S2_NDVI,
+        ),
+        None,
+    ),
+    (
+        "s2_tile.tile",
+        lambda: s2_tile.tile(SENTINEL_SCENE, 8, 78, 88, bands=["04", "03", "02"]),
+        None,
+    ),
+    ("cbers_ovr.create", lambda: cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5]), None),
+    (
+        "cbers_ndvi.point",
+        lambda: cbers_ndvi.point(CBERS_SCENE, [53.9097, 5.3674], CBERS_NDVI),
+        None,
+    ),
+    (
+        "cbers_ndvi.area",
+        lambda: cbers_ndvi.area(
+            CBERS_SCENE,
+            [53.0859375, 5.266007882805496, 53.4375, 5.615985819155334],
+            CBERS_NDVI,
+        ),
+        None,
+    ),
+    (
+        "cbers_tile.tile",
+        lambda: cbers_tile.tile(CBERS_SCENE, 8, 166, 124, bands=[7, 6, 5]),
+        None,
+    ),
+    (
+        "cbers_full.create",
+        lambda: cbers_full.create(CBERS_SCENE, expression=CBERS_NDVI),
+        close,
+    ),
+    (
+        "l8_mosaic.create[overlap]",
+        lambda: l8_mosaic.create([LANDSAT_SCENE] * 8),
+        lambda result: close(result[0]),
+    ),
+    ("srtm_mosaic.create", lambda: srtm_mosaic.create(SRTM_TILES), close),
+    (
+        "srtm_mosaic.elevation",
+        lambda: srtm_mosaic.elevation(SRTM_POINTS, interpolate=True),
+        None,
+    ),
+    (
+        "srtm_mosaic.profile",
+        lambda: srtm_mosaic.profile(SRTM_POINTS[:2], n_samples=1000),
+        None,
+    ),
+]
+
+
+def bytes_read():
+    """Return the bytes read by the process so far, None if unknown."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def measure(func, cleanup=None):
+    """Run `func` once on cold caches and return its metrics."""
+    result_cache.clear()
+    metadata_cache.clear()
+    footprint_cache.clear()
+    stats_cache.clear()
+    srtm_mosaic.tile_cache.clear()
+    pool.clear()
+    gc.collect()
+
+    tracemalloc.start()
+    read = bytes_read()
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    result = func()
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    if read is not None:
+        read = bytes_read() - read
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if cleanup is not None:
+        cleanup(result)
+
+    return {"wall_time": wall, "cpu_time": cpu, "peak_memory": peak, "bytes_read": read}
+
+
+def run(repeat=5, only=None):
+    """Benchmark the handlers and return the results."""
+    results = {}
+    with fixtures():
+        for name, func, cleanup in CASES:
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+
+            runs = [measure(func, cleanup) for _ in range(repeat)]
+            results[name] = {
+                "wall_time": statistics.median(r["wall_time"] for r in runs),
+                "cpu_time": statistics.median(r["cpu_time"] for r in runs),
+                "peak_memory": max(r["peak_memory"] for r in runs),
+                "bytes_read": runs[-1]["bytes_read"],
+                "repeat": repeat,
+            }
+            print(format_row(name, results[name]), file=sys.stderr)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "rasterio": rasterio.__version__,
+            "gdal": rasterio.__gdal_version__,
+        },
+        "handlers": results,
+    }
+
+
+def format_row(name, metrics):
+    """Format the metrics of one handler."""
+    read = metrics["bytes_read"]
+    read = f"{read / 1024 ** 2:>9.2f}MB" if read is not None else f"{'-':>11}"
+    return (
+        f"{name:<28} {metrics['wall_time'] * 1000:>9.1f}ms "
+        f"{metrics['cpu_time'] * 1000:>9.1f}ms "
+        f"{metrics['peak_memory'] / 1024 ** 2:>9.2f}MB {read}"
+    )
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Compare two benchmark results.
+
+    Returns the report lines and the names of the handlers whose wall time, CPU
+    time or peak memory grew by more than `threshold` (relative).
+    """
+    lines = [f"{'handler':<28} " + " ".join(f"{m:>12}" for m in METRICS)]
+    regressions = []
+    for name, metrics in current["handlers"].items():
+        base = baseline["handlers"].get(name)
+        if base is None:
+            lines.append(f"{name:<28} {'(new)':>12}")
+            continue
+
+        changes = []
+        for metric in METRICS:
+            if not base.get(metric) or metrics.get(metric) is None:
+                changes.append(f"{'-':>12}")
+                continue
+            change = metrics[metric] / base[metric] - 1
+            changes.append(f"{change:>+11.1%} ")
+            if metric != "bytes_read" and change > threshold:
+                regressions.append(name)
+
+        lines.append(f"{name:<28} " + " ".join(changes))
+
+    for name in baseline["handlers"]:
+        if name not in current["handlers"]:
+            lines.append(f"{name:<28} {'(missing)':>12}")
+
+    return lines, sorted(set(regressions))
+
+
+def main(args=None):
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description="remotepixel handler benchmarks")
+    commands = parser.add_subparsers(dest="command")
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--output", help="JSON output file (default: stdout)")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument(
+        "--only", action="append", help="Only run handlers starting with this prefix"
+    )
+
+    compare_parser = commands.add_parser("compare", help="Compare to a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+
+    args = parser.parse_args(args)
+    if args.command == "run":
+        results = run(repeat=args.repeat, only=args.only)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        else:
+            print(json.dumps(results, indent=2, sort_keys=True))
+        return 0
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        lines, regressions = compare(baseline, current, threshold=args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            return 1
+        return 0
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+GDAL profile benchmark.
+
+Serve the test fixtures over a local HTTP server (range requests, like S3)
+and run the Landsat-8, Sentinel-2 and CBERS handlers with their profile and
+without any GDAL option, reporting the number of HTTP requests, bytes
+transferred and latency of each run. A new server (host:port) is used for
+every run so GDAL's /vsicurl/ cache starts empty.
+
+    $ python benchmarks/profiles.py
+    $ python benchmarks/profiles.py --delay 0.02  # simulate 20ms per request
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import multiprocessing
+import contextlib
+from unittest.mock import patch
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+
+import handlers as cases
+
+from remotepixel import profiles
+from remotepixel.datasets import pool
+from remotepixel.stats import stats_cache
+from remotepixel.utils import footprint_cache, metadata_cache, result_cache
+
+SENSORS = {"landsat": "l8_", "sentinel2": "s2_", "cbers": "cbers_"}
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Static file handler supporting single byte ranges (HTTP/1.1 keep-alive)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        """Silence logs."""
+
+    def send_head(self):
+        """Send headers (206 for a range request)."""
+        with self.server.requests.get_lock():
+            self.server.requests.value += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(int(match.group(2) or size - 1), size - 1)
+        if start >= size:
+            self.send_error(416)
+            return None
+
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        with self.server.bytes.get_lock():
+            self.server.bytes.value += end - start + 1
+        return _RangeFile(f, end - start + 1)
+
+    def copyfile(self, source, outputfile):
+        """Copy the (range of the) file."""
+        if isinstance(source, _RangeFile):
+            outputfile.write(source.file.read(source.length))
+        else:
+            super().copyfile(source, outputfile)
+
+
+class _RangeFile(object):
+    """Open file and length of the range to send."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.length = length
+
+    def close(self):
+        self.file.close()
+
+
+def _serve(directory, delay, requests, nbytes, port):
+    """Run the HTTP server (in a child process)."""
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(RangeHandler, directory=directory)
+    )
+    server.delay = delay
+    server.requests = requests
+    server.bytes = nbytes
+    port.put(server.server_address[1])
+    server.serve_forever()
+
+
+class Server(object):
+    """HTTP server counters."""
+
+    def __init__(self, url, requests, nbytes):
+        self.url = url
+        self._requests = requests
+        self._bytes = nbytes
+
+    @property
+    def requests(self):
+        return self._requests.value
+
+    @property
+    def bytes(self):
+        return self._bytes.value
+
+
+@contextlib.contextmanager
+def serve(directory, delay=0):
+    """
+    Serve `directory` on a new local port.
+
+    The server runs in another process: GDAL holds the GIL while opening
+    datasets, an in-process server would stall.
+    """
+    requests = multiprocessing.Value("l", 0)
+    nbytes = multiprocessing.Value("l", 0)
+    port = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve, args=(directory, delay, requests, nbytes, port), daemon=True
+    )
+    process.start()
+    try:
+        yield Server(f"http://127.0.0.1:{port.get(timeout=10)}", requests, nbytes)
+    finally:
+        process.terminate()
+        process.join()
+
+
+def buckets(url):
+    """Point the handlers to the HTTP server."""
+    stack = contextlib.ExitStack()
+    for module in [cases.l8_full, cases.l8_ndvi, cases.l8_ovr, cases.l8_tile]:
+        stack.enter_context(
+            patch.object(module, "LANDSAT_BUCKET", f"{url}/landsat-pds")
+        )
+    for module in [cases.s2_ndvi, cases.s2_ovr, cases.s2_tile]:
+        stack.enter_context(
+            patch.object(module, "SENTINEL_BUCKET", f"{url}/sentinel-s2-l1c")
+        )
+    for module in [
+        cases.cbers_full,
+        cases.cbers_ndvi,
+        cases.cbers_ovr,
+        cases.cbers_tile,
+    ]:
+        stack.enter_context(patch.object(module, "CBERS_BUCKET", f"{url}/cbers-pds"))
+    return stack
+
+
+def measure(func, enabled, delay=0):
+    """Run `func` once on a new server, return requests, bytes and latency."""
+    result_cache.clear()
+    metadata_cache.clear()
+    footprint_cache.clear()
+    stats_cache.clear()
+    pool.clear()
+
+    with contextlib.ExitStack() as stack:
+        server = stack.enter_context(serve(cases.FIXTURES, delay=delay))
+        stack.enter_context(buckets(server.url))
+        if not enabled:
+            stack.enter_context(
+                patch.dict(profiles.PROFILES, {name: {} for name in profiles.PROFILES})
+            )
+
+        start = time.perf_counter()
+        result = func()
+        latency = time.perf_counter() - start
+        if hasattr(result, "close"):
+            result.close()
+        return server.requests, server.bytes, latency
+
+
+def main(args=None):
+    """Print the requests, bytes and latency of each handler per profile."""
+    parser = argparse.ArgumentParser(description="GDAL profile benchmark")
+    parser.add_argument("--delay", type=float, default=0, help="Seconds per request")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(args)
+
+    print(
+        f"{'handler':<28} {'profile':<10} {'requests':>14} {'MB':>14} {'latency':>20}"
+    )
+    with cases.fixtures():
+        for name, func, _ in cases.CASES:
+            profile = next(
+                (p for p, prefix in SENSORS.items() if name.startswith(prefix)), None
+            )
+            if profile is None:
+                continue
+
+            runs = {}
+            for enabled in [False, True]:
+                results = [
+                    measure(func, enabled, args.delay) for _ in range(args.repeat)
+                ]
+                runs[enabled] = (
+                    results[-1][0],
+                    results[-1][1] / 1024 ** 2,
+                    min(r[2] for r in results) * 1000,
+                )
+
+            (req0, mb0, ms0), (req1, mb1, ms1) = runs[False], runs[True]
+            print(
+                f"{name:<28} {profile:<10} {req0:>6} -> {req1:<5} "
+                f"{mb0:>5.2f} -> {mb1:<5.2f} {ms0:>7.1f}ms -> {ms1:>6.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
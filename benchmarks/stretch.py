@@ -0,0 +1,60 @@
+"""
+Contrast stretch benchmark.
+
+Compare `np.percentile` on the masked values with
+`remotepixel.stretch.histogram_percentiles` for 512px and 1024px bands.
+
+    $ python benchmarks/stretch.py
+"""
+
+import timeit
+
+import numpy as np
+
+from remotepixel.stretch import histogram_percentiles
+
+
+def band(size, dtype, seed=0):
+    """Create a synthetic band and its mask (30% nodata)."""
+    rng = np.random.RandomState(seed)
+    if dtype == np.uint8:
+        data = rng.randint(1, 256, (size, size)).astype(dtype)
+    elif dtype == np.uint16:
+        data = rng.normal(8000, 2000, (size, size)).clip(1, 65535).astype(dtype)
+    else:
+        data = rng.gamma(2, 0.05, (size, size)).astype(dtype)
+    mask = (rng.rand(size, size) > 0.3).astype(np.uint8) * 255
+    data[mask == 0] = 0
+    return data, mask
+
+
+def main(repeat=20):
+    """Print timings and speedup."""
+    print(
+        f"{'size':>6} {'dtype':>8} {'percentile':>12} {'histogram':>12} {'speedup':>8}"
+    )
+    for size in [512, 1024]:
+        for dtype in [np.uint8, np.uint16, np.float64]:
+            data, mask = band(size, dtype)
+            ref = min(
+                timeit.repeat(
+                    lambda: np.percentile(data[mask > 0], (2, 98)),
+                    number=1,
+                    repeat=repeat,
+                )
+            )
+            new = min(
+                timeit.repeat(
+                    lambda: histogram_percentiles(data, mask, (2, 98)),
+                    number=1,
+                    repeat=repeat,
+                )
+            )
+            print(
+                f"{size:>6} {np.dtype(dtype).name:>8} {ref * 1000:>10.2f}ms "
+                f"{new * 1000:>10.2f}ms {ref / new:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+remotepixel.aio module.
+
+asyncio versions of the handlers, for use in an asyncio service.
+
+Handlers run in a shared, bounded pool of request threads (at most
+`REMOTEPIXEL_AIO_REQUESTS` at once, other requests wait on a semaphore without
+holding a thread) and their band reads go to one shared pool of
+`REMOTEPIXEL_AIO_WORKERS` threads, at most `max_concurrency` per request,
+instead of a thread pool per call. Cancelling the task (e.g client disconnect)
+cancels the pending reads and stops the handler at its next read or block.
+"""
+
+import os
+import asyncio
+import threading
+import weakref
+from concurrent import futures
+
+from remotepixel.executors import RequestExecutor
+from remotepixel.sensors import get_handler
+
+MAX_REQUESTS = int(os.environ.get("REMOTEPIXEL_AIO_REQUESTS", 16))
+MAX_WORKERS = int(os.environ.get("REMOTEPIXEL_AIO_WORKERS", 32))
+
+_executors = {}
+_executors_lock = threading.Lock()
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _executor(name, max_workers):
+    """Return a shared thread pool, created on first use."""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = _executors[name] = futures.ThreadPoolExecutor(
+                max_workers=max_workers
+            )
+        return executor
+
+
+def _semaphore(loop):
+    """Return the global request semaphore of an event loop."""
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(MAX_REQUESTS)
+    return semaphore
+
+
+async def run(func, *args, max_concurrency=3, **kwargs):
+    """
+    Run a blocking handler within the global and per-request limits.
+
+    Attributes
+    ----------
+    func : callable
+        Handler, its band reads use `remotepixel.executors.band_executor`.
+    max_concurrency : int, optional
+        Maximum number of concurrent band reads for this request (default: 3).
+
+    """
+    loop = asyncio.get_event_loop()
+    request = RequestExecutor(
+        _executor("workers", MAX_WORKERS), max_workers=max_concurrency
+    )
+    async with _semaphore(loop):
+        future = _executor("requests", MAX_REQUESTS).submit(
+            request.run, func, *args, **kwargs
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            request.cancel()
+            raise
+
+
+async def point(scene, *args, max_concurrency=3, **kwargs):
+    """Point handler (see `*_ndvi.point`)."""
+    handler = get_handler(scene, "ndvi")
+    return await run(
+        handler.point, scene, *args, max_concurrency=max_concurrency, **kwargs
+    )
+
+
+async def area(scene, *args, max_concurrency=3, **kwargs):
+    """Area handler (see `*_ndvi.area`)."""
+    handler = get_handler(scene, "ndvi")
+    return await run(
+        handler.area, scene, *args, max_concurrency=max_concurrency, **kwargs
+    )
+
+
+async def tile(scene, *args, max_concurrency=3, **kwargs):
+    """Tile handler (see `*_tile.tile`)."""
+    handler = get_handler(scene, "tile")
+    return await run(
+        handler.tile, scene, *args, max_concurrency=max_concurrency, **kwargs
+    )
+
+
+async def overview(scene, *args, max_concurrency=3, **kwargs):
+    """Overview handler (see `*_ovr.create`)."""
+    handler = get_handler(scene, "ovr")
+    return await run(
+        handler.create, scene, *args, max_concurrency=max_concurrency, **kwargs
+    )
+
+
+async def full(scene, *args, max_concurrency=3, **kwargs):
+    """
+    Full resolution handler (see `l8_full.create` and `cbers_full.create`).
+
+    Block reads go to the shared pool, `max_concurrency` replaces the handler
+    `max_workers` option.
+    """
+    handler = get_handler(scene, "full")
+    return await run(
+        handler.create, scene, *args, max_concurrency=max_concurrency, **kwargs
+    )
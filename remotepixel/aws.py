@@ -1,20 +1,135 @@
 """remotepixel.aws module."""
 
 import os
+import threading
+from concurrent import futures
 
+from botocore.config import Config
 from boto3.session import Session as boto3_session
 
+from remotepixel import instrument
+
 region = os.environ.get("AWS_REGION", "us-east-1")
 
+MAX_POOL_CONNECTIONS = int(os.environ.get("REMOTEPIXEL_S3_MAX_CONNECTIONS", 16))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(region_name=None):
+    """
+    Return a shared S3 client.
+
+    Clients are created once per region and kept for the life of the process.
+    botocore clients are thread-safe, and reusing them keeps the underlying
+    HTTPS connections (and their TLS sessions) alive between calls.
+    """
+    region_name = region_name or region
+    client = _clients.get(region_name)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(region_name)
+        if client is None:
+            session = boto3_session(region_name=region_name)
+            client = session.client(
+                "s3",
+                config=Config(
+                    max_pool_connections=MAX_POOL_CONNECTIONS, tcp_keepalive=True
+                ),
+            )
+            _clients[region_name] = client
+
+    return client
+
 
 def get_object(bucket, key, request_pays=False):
     """AWS s3 get object content."""
-    session = boto3_session(region_name=region)
-    s3 = session.client("s3")
+    params = {"Bucket": bucket, "Key": key}
+    if request_pays:
+        params["RequestPayer"] = "requester"
+
+    with instrument.stage("s3", dataset=f"{bucket}/{key}") as stage:
+        body = get_client().get_object(**params)["Body"].read()
+        stage.set(bytes=len(body))
+    return body
 
+
+def iter_object(bucket, key, request_pays=False, chunk_size=1024 * 1024):
+    """
+    AWS s3 get object content, as an iterator of chunks.
+
+    The response body is closed once the iterator is exhausted, closed or
+    garbage collected.
+    """
     params = {"Bucket": bucket, "Key": key}
     if request_pays:
         params["RequestPayer"] = "requester"
 
-    response = s3.get_object(**params)
-    return response["Body"].read()
+    with instrument.stage("s3", dataset=f"{bucket}/{key}") as stage:
+        body = get_client().get_object(**params)["Body"]
+        nbytes = 0
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                nbytes += len(chunk)
+                yield chunk
+        finally:
+            # Release the pooled connection if the consumer stops early
+            body.close()
+        stage.set(bytes=nbytes)
+
+
+def _get_decoded(bucket, key, request_pays=False, decode=None):
+    """Return the object content, or `decode` result on its streamed chunks."""
+    if decode is None:
+        return get_object(bucket, key, request_pays=request_pays)
+    chunks = iter_object(bucket, key, request_pays=request_pays)
+    try:
+        return decode(chunks)
+    finally:
+        chunks.close()
+
+
+def get_objects(bucket, keys, request_pays=False, max_workers=8, decode=None):
+    """
+    AWS s3 get multiple objects content.
+
+    Objects are fetched concurrently (at most `max_workers` at once) through
+    the shared client. A failing key does not stop the others. With `decode`,
+    each object is streamed (see `iter_object`) to `decode(chunks)` instead of
+    being read whole.
+
+    Returns
+    -------
+    objects : dict
+        Object content (bytes), or `decode` result, keyed by S3 key, for the
+        successful requests.
+    errors : dict
+        Exception raised, keyed by S3 key, for the failed requests.
+
+    """
+    keys = list(dict.fromkeys(keys))
+    objects = {}
+    errors = {}
+    if not keys:
+        return objects, errors
+
+    max_workers = max(1, min(max_workers, len(keys)))
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        executor = instrument.pool(pool)
+        future_to_key = {
+            executor.submit(
+                _get_decoded, bucket, key, request_pays=request_pays, decode=decode
+            ): key
+            for key in keys
+        }
+        for future in futures.as_completed(future_to_key):
+            key = future_to_key[future]
+            try:
+                objects[key] = future.result()
+            except Exception as err:
+                errors[key] = err
+
+    return objects, errors
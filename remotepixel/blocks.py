@@ -0,0 +1,205 @@
+"""remotepixel.blocks module."""
+
+import os
+import shutil
+import tempfile
+from collections import deque
+
+import numpy as np
+
+import rasterio
+from rasterio.io import MemoryFile
+
+from remotepixel.executors import band_executor, check_cancelled
+
+MIN_GDAL_CACHE = 16 * 1024 * 1024
+
+
+def block_layout(src):
+    """Return block windows of `src` and creation options matching its tiling."""
+    windows = [w for ij, w in src.block_windows(1)]
+    layout = {}
+    if src.profile.get("tiled"):
+        blockysize, blockxsize = src.block_shapes[0]
+        layout.update(tiled=True, blockxsize=blockxsize, blockysize=blockysize)
+    return windows, layout
+
+
+def process_blocks(windows, readers, process, read_ahead=4, max_workers=3):
+    """
+    Pipelined block processing.
+
+    Band reads run in one thread pool, up to `read_ahead` windows ahead of the
+    window being processed, so the network stays busy while the calling thread
+    computes and writes the previous blocks. Within a cancellable request (see
+    `remotepixel.executors`), processing stops at the next window once the
+    request is cancelled.
+
+    Attributes
+    ----------
+    windows : iterable
+        Block windows, in processing order.
+    readers : list
+        One callable per band: `reader(window)` returns the band data.
+    process : callable
+        `process(window, data)`, called in the calling thread and in window
+        order with the list of band data (e.g compute and write the block).
+    read_ahead : int, optional
+        Number of windows read in advance (default: 4).
+    max_workers : int, optional
+        Number of reading threads (default: 3).
+
+    """
+    windows = iter(windows)
+    read_ahead = max(1, read_ahead)
+    queue = deque()
+
+    with band_executor(max_workers) as executor:
+
+        def submit():
+            """Schedule the reads of the next window."""
+            for window in windows:
+                queue.append(
+                    (window, [executor.submit(reader, window) for reader in readers])
+                )
+                return
+
+        for _ in range(read_ahead):
+            submit()
+
+        try:
+            while queue:
+                check_cancelled()
+                window, reads = queue.popleft()
+                submit()
+                process(window, [read.result() for read in reads])
+        finally:
+            for _, reads in queue:
+                for read in reads:
+                    read.cancel()
+
+
+def _budget_read_ahead(windows, nreaders, meta, memory_budget, work_dtype=np.float64):
+    """Return the read-ahead depth allowed by a memory budget (in bytes)."""
+    pixels = max(w.height * w.width for w in windows)
+    # Band reads are `work_dtype`; stacking and band math need a copy.
+    itemsize = np.dtype(work_dtype).itemsize
+    window_bytes = (
+        pixels
+        * 2
+        * (
+            nreaders * itemsize
+            + meta["count"] * max(np.dtype(meta["dtype"]).itemsize, itemsize)
+        )
+    )
+    read_ahead = memory_budget // window_bytes - 1
+    if read_ahead < 1:
+        raise ValueError(
+            f"Memory budget too small, need at least {2 * window_bytes} bytes "
+            "to process blocks"
+        )
+    return read_ahead
+
+
+def write_blocks(
+    meta,
+    windows,
+    readers,
+    compute,
+    output=None,
+    memory_budget=None,
+    read_ahead=4,
+    max_workers=3,
+    work_dtype=np.float64,
+):
+    """
+    Read, compute and write block windows to a new GeoTIFF.
+
+    Attributes
+    ----------
+    meta : dict
+        Output dataset creation options.
+    windows : list
+        Block windows, in processing order.
+    readers : list
+        One callable per band: `reader(window)` returns the band data.
+    compute : callable
+        `compute(data)` returns the output block from the list of band data.
+    output : str or file object, optional
+        Where to write the dataset. By default the whole dataset is kept in a
+        `MemoryFile`. With a path, blocks are streamed to that file. A writable
+        file object gets the file content once finished (GeoTIFF writing needs
+        random access, so blocks go through a temporary file first).
+    memory_budget : int, optional
+        Maximum memory (in bytes) used for in-flight blocks and the GDAL block
+        cache; limits `read_ahead` accordingly. Only used with `output`.
+    read_ahead : int, optional
+        Number of windows read in advance (default: 4).
+    max_workers : int, optional
+        Number of reading threads (default: 3).
+    work_dtype : numpy.dtype, optional
+        Data type of band reads and computation, used with `memory_budget`
+        (default: float64).
+
+    Returns
+    -------
+    MemoryFile, str or file object
+        The `MemoryFile` holding the dataset, or `output`.
+
+    """
+    env_options = {}
+    if output is not None and memory_budget:
+        gdal_cache = max(memory_budget // 4, MIN_GDAL_CACHE)
+        env_options["GDAL_CACHEMAX"] = gdal_cache
+        read_ahead = min(
+            read_ahead,
+            _budget_read_ahead(
+                windows,
+                len(readers),
+                meta,
+                memory_budget - gdal_cache,
+                work_dtype=work_dtype,
+            ),
+        )
+
+    def _write(dataset):
+        process_blocks(
+            windows,
+            readers,
+            lambda window, data: dataset.write(compute(data), window=window),
+            read_ahead=read_ahead,
+            max_workers=max_workers,
+        )
+
+    if output is None:
+        memfile = MemoryFile()
+        with memfile.open(**meta) as dataset:
+            _write(dataset)
+        return memfile
+
+    if isinstance(output, str):
+        with rasterio.Env(**env_options):
+            with rasterio.open(output, "w", **meta) as dataset:
+                _write(dataset)
+        return output
+
+    fd, path = tempfile.mkstemp(suffix=".tif")
+    os.close(fd)
+    try:
+        write_blocks(
+            meta,
+            windows,
+            readers,
+            compute,
+            output=path,
+            memory_budget=memory_budget,
+            read_ahead=read_ahead,
+            max_workers=max_workers,
+            work_dtype=work_dtype,
+        )
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, output)
+    finally:
+        os.remove(path)
+
+    return output
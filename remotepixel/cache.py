@@ -0,0 +1,357 @@
+"""remotepixel.cache module."""
+
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import inspect
+import tempfile
+import threading
+import functools
+from collections import OrderedDict
+
+
+def _nbytes(value):
+    """Estimate the memory size of a cached value."""
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class LRUCache(object):
+    """
+    Thread-safe, bounded LRU cache with optional time-to-live.
+
+    Attributes
+    ----------
+    maxsize : int
+        Maximum number of entries kept in the cache.
+    ttl : float, optional
+        Entry lifetime in seconds (default: None, entries never expire).
+    maxbytes : int, optional
+        Maximum estimated size of all values (default: None, no limit).
+
+    """
+
+    def __init__(self, maxsize=128, ttl=None, maxbytes=None):
+        """Create an empty cache."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return number of entries."""
+        return len(self._data)
+
+    def __contains__(self, key):
+        """Check for a non-expired entry (does not count as hit or miss)."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry)
+
+    def _expired(self, entry):
+        return entry[1] is not None and entry[1] < time.monotonic()
+
+    def get(self, key, default=None):
+        """Return cached value or `default`."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry):
+                if entry is not None:
+                    self._pop(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        """Add or replace a value."""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        nbytes = _nbytes(value) if self.maxbytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires, nbytes)
+            self._nbytes += nbytes
+            while len(self._data) > self.maxsize or (
+                self.maxbytes is not None and self._nbytes > self.maxbytes
+            ):
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key):
+        self._nbytes -= self._data.pop(key)[2]
+
+    def clear(self):
+        """Remove all entries and reset counters."""
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return cache counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+class DiskCache(object):
+    """
+    Thread-safe, bounded on-disk cache (one pickle file per entry).
+
+    Entries are evicted in least recently used order once the files take more
+    than `maxbytes`. Entries already in `directory` are picked up on creation.
+
+    Attributes
+    ----------
+    directory : str
+        Cache directory (created if needed).
+    maxbytes : int
+        Maximum size of all cache files.
+
+    """
+
+    suffix = ".pkl"
+
+    def __init__(self, directory, maxbytes=1024 * 1024 * 1024):
+        """Create cache and index existing entries."""
+        self.directory = directory
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self._files = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(self.suffix):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[: -len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._files[key] = size
+            self._nbytes += size
+
+    def __len__(self):
+        """Return number of entries."""
+        return len(self._files)
+
+    def __contains__(self, key):
+        """Check for an entry (does not count as hit or miss)."""
+        return key in self._files
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def get(self, key, default=None):
+        """Return cached value or `default`."""
+        with self._lock:
+            if key not in self._files:
+                self.misses += 1
+                return default
+            self._files.move_to_end(key)
+
+        try:
+            with open(self._path(key), "rb") as f:
+                value = pickle.load(f)
+            os.utime(self._path(key))
+        except Exception:
+            # Removed by another process or truncated
+            with self._lock:
+                if key in self._files:
+                    self._nbytes -= self._files.pop(key)
+                self.misses += 1
+            return default
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Add or replace a value."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._add(key, tmp)
+
+    def _add(self, key, tmp):
+        """
+        Move file `tmp` to entry `key` and evict entries over the budget.
+
+        Returns False (and removes `tmp`) if the file alone is over the budget.
+        """
+        size = os.path.getsize(tmp)
+        if size > self.maxbytes:
+            os.remove(tmp)
+            return False
+        os.replace(tmp, self._path(key))
+
+        to_remove = []
+        with self._lock:
+            self._nbytes += size - self._files.pop(key, 0)
+            self._files[key] = size
+            # `key` is the most recent entry, it fits once all others are gone
+            while self._nbytes > self.maxbytes:
+                old_key, old_size = self._files.popitem(last=False)
+                self._nbytes -= old_size
+                to_remove.append(old_key)
+
+        for old_key in to_remove:
+            self._remove(old_key)
+        return True
+
+    def _remove(self, key):
+        """Remove the file of evicted entry `key`."""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove all entries and reset counters."""
+        with self._lock:
+            keys = list(self._files)
+            self._files.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+        for key in keys:
+            self._remove(key)
+
+    def stats(self):
+        """Return cache counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._files),
+                "bytes": self._nbytes,
+                "maxbytes": self.maxbytes,
+            }
+
+
+class ResultCache(object):
+    """
+    Two-tier cache for rendered results.
+
+    Lookups go to an in-memory LRU first, then to an optional on-disk cache;
+    disk hits are promoted to memory.
+
+    Attributes
+    ----------
+    maxsize : int
+        Maximum number of entries kept in memory.
+    maxbytes : int
+        Maximum estimated size of the entries kept in memory.
+    directory : str, optional
+        On-disk cache directory (default: None, memory only).
+    disk_maxbytes : int, optional
+        Maximum size of the on-disk cache.
+
+    """
+
+    def __init__(
+        self,
+        maxsize=128,
+        maxbytes=64 * 1024 * 1024,
+        directory=None,
+        disk_maxbytes=1024 * 1024 * 1024,
+    ):
+        """Create the cache tiers."""
+        self.memory = LRUCache(maxsize=maxsize, maxbytes=maxbytes)
+        self.disk = DiskCache(directory, maxbytes=disk_maxbytes) if directory else None
+
+    def get(self, key, default=None):
+        """Return cached value or `default`."""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return default if value is None else value
+
+    def set(self, key, value):
+        """Add or replace a value in all tiers."""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        """Remove all entries and reset counters."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """Return counters of each tier and the overall hit rate."""
+        memory = self.memory.stats()
+        disk = self.disk.stats() if self.disk is not None else None
+        hits = memory["hits"] + (disk["hits"] if disk else 0)
+        requests = memory["hits"] + memory["misses"]
+        return {
+            "memory": memory,
+            "disk": disk,
+            "hits": hits,
+            "misses": requests - hits,
+            "hit_rate": hits / requests if requests else 0.0,
+        }
+
+
+def cache_key(name, arguments):
+    """Return a canonical hash of a function name and its arguments."""
+    payload = json.dumps([name, arguments], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def cached(cache, depends=None):
+    """
+    Cache the results of a function in `cache`.
+
+    Keys are built from all arguments, defaults included, so equivalent calls
+    (positional or keyword, list or tuple) share an entry. `depends(arguments)`
+    returns any other state the result depends on (e.g scene statistics), also
+    part of the key. Exceptions and None results are not cached.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            if depends is not None:
+                arguments = [arguments, depends(arguments)]
+            key = cache_key(name, arguments)
+
+            value = cache.get(key)
+            if value is None:
+                value = func(*args, **kwargs)
+                if value is not None:
+                    cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
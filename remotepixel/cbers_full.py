@@ -1,16 +1,11 @@
 """remotepixel.cbers_full module."""
 
-import re
-import contextlib
-from functools import partial
-from concurrent import futures
-
 import numpy as np
-import numexpr as ne
-
-import rasterio
-from rasterio.io import MemoryFile
 
+from remotepixel import instrument, profiles
+from remotepixel.blocks import block_layout, write_blocks
+from remotepixel.datasets import open_dataset
+from remotepixel.expression import compile_expression
 from remotepixel.utils import cbers_parse_scene_id
 
 np.seterr(divide="ignore", invalid="ignore")
@@ -18,8 +13,25 @@ np.seterr(divide="ignore", invalid="ignore")
 CBERS_BUCKET = "s3://cbers-pds"
 
 
-def create(scene, bands=None, expression=None):
-    """Handler."""
+@instrument.handler
+@profiles.profile("cbers")
+def create(
+    scene,
+    bands=None,
+    expression=None,
+    output=None,
+    memory_budget=None,
+    read_ahead=4,
+    max_workers=3,
+):
+    """
+    Handler.
+
+    By default the result is returned as a `MemoryFile`. Set `output` to a path
+    or a writable file object to stream the blocks to it instead, with
+    `memory_budget` (in bytes) bounding the memory used while processing (see
+    `remotepixel.blocks.write_blocks`).
+    """
     scene_params = cbers_parse_scene_id(scene)
     cbers_address = f'{CBERS_BUCKET}/{scene_params["key"]}'
 
@@ -33,17 +45,18 @@ def create(scene, bands=None, expression=None):
             raise Exception("RGB combination only")
 
     if expression:
-        bands = tuple(set(re.findall(r"b(?P<bands>[0-9]{1,2})", expression)))
-        rgb = expression.split(",")
+        expr = compile_expression(expression)
+        bands = expr.bands
         data_type = np.float32
-        nb_bands = len(rgb)
+        nb_bands = len(expr)
 
     bqa = f"{cbers_address}/{scene}_BAND6.tif"
-    with rasterio.open(bqa) as src:
+    with open_dataset(bqa) as src:
         meta = src.meta
-        wind = [w for ij, w in src.block_windows(1)]
+        wind, layout = block_layout(src)
 
         meta.update(
+            **layout,
             nodata=0,
             count=nb_bands,
             interleave="pixel",
@@ -52,34 +65,32 @@ def create(scene, bands=None, expression=None):
             dtype=data_type,
         )
 
-    memfile = MemoryFile()
-    with memfile.open(**meta) as dataset:
-        with contextlib.ExitStack() as stack:
-            srcs = [
-                stack.enter_context(
-                    rasterio.open(f"{cbers_address}/{scene}_BAND{band}.tif")
-                )
-                for band in bands
-            ]
-
-            def get_window(idx, window):
-                return srcs[idx].read(window=window, boundless=True, indexes=(1))
-
-            for window in wind:
-                _worker = partial(get_window, window=window)
-                with futures.ThreadPoolExecutor(max_workers=3) as executor:
-                    data = np.stack(list(executor.map(_worker, range(len(bands)))))
-                    if expression:
-                        ctx = {}
-                        for bdx, b in enumerate(bands):
-                            ctx["b{}".format(b)] = data[bdx]
-                        data = np.array(
-                            [
-                                np.nan_to_num(ne.evaluate(bloc.strip(), local_dict=ctx))
-                                for bloc in rgb
-                            ]
-                        )
-
-                    dataset.write(data.astype(data_type), window=window)
-
-    return memfile
+    def band_reader(band):
+        """Create window reader for band."""
+        address = f"{cbers_address}/{scene}_BAND{band}.tif"
+
+        def get_window(window):
+            with open_dataset(address) as src:
+                return src.read(window=window, boundless=True, indexes=(1))
+
+        return get_window
+
+    def compute(data):
+        """Compute output block."""
+        if expression:
+            data = expr.evaluate(data)
+        else:
+            data = np.stack(data)
+
+        return data.astype(data_type)
+
+    return write_blocks(
+        meta,
+        wind,
+        [band_reader(band) for band in bands],
+        compute,
+        output=output,
+        memory_budget=memory_budget,
+        read_ahead=read_ahead,
+        max_workers=max_workers,
+    )
@@ -1,26 +1,35 @@
 """remotepixel.cbers_ndvi module."""
 
-import re
 from functools import partial
-from concurrent import futures
 
 import numpy as np
-import numexpr as ne
 
-import rasterio
 from rasterio import warp
 
-from remotepixel.utils import cbers_parse_scene_id, get_area
-from rio_tiler.utils import linear_rescale, array_to_img, get_colormap, b64_encode_img
+from remotepixel import instrument, profiles
+from remotepixel.cache import cached
+from remotepixel.datasets import open_dataset
+from remotepixel.executors import band_executor
+from remotepixel.expression import compile_expression
+from remotepixel.utils import (
+    cbers_parse_scene_id,
+    check_encoder_options,
+    encode_img,
+    format_img,
+    get_area,
+    result_cache,
+    sample_points,
+)
+from rio_tiler.utils import linear_rescale, array_to_img, get_colormap
 
 np.seterr(divide="ignore", invalid="ignore")
 
 CBERS_BUCKET = "s3://cbers-pds"
 
 
-def point(scene, coordinates, expression):
-    """Point handler."""
-    bands = tuple(set(re.findall(r"b(?P<bands>[0-9]{1,2})", expression)))
+def scene_sources(scene, expression):
+    """Return expression bands, band addresses, value converter and scene info."""
+    bands = compile_expression(expression).bands
 
     scene_params = cbers_parse_scene_id(scene)
     cbers_address = f'{CBERS_BUCKET}/{scene_params["key"]}'
@@ -28,26 +37,6 @@ def point(scene, coordinates, expression):
         "{}/{}_BAND{}.tif".format(cbers_address, scene, band) for band in bands
     ]
 
-    def worker(address):
-        """Point worker."""
-        with rasterio.open(address) as band:
-            lon_srs, lat_srs = warp.transform(
-                "EPSG:4326", band.crs, [coordinates[0]], [coordinates[1]]
-            )
-            point = list(band.sample([(lon_srs[0], lat_srs[0])]))[0]
-        return point[0]
-
-    try:
-        with futures.ThreadPoolExecutor(max_workers=3) as executor:
-            data = list(executor.map(worker, addresses))
-
-            ctx = {}
-            for bdx, b in enumerate(bands):
-                ctx["b{}".format(b)] = data[bdx]
-            ratio = np.nan_to_num(ne.evaluate(expression, local_dict=ctx))
-    except IndexError:
-        ratio = 0.0
-
     date = (
         scene_params["acquisitionYear"]
         + "-"
@@ -55,22 +44,61 @@ def point(scene, coordinates, expression):
         + "-"
         + scene_params["acquisitionDay"]
     )
+    info = {"scene": scene, "date": date}
+    return bands, addresses, lambda band, values: values, info
 
-    return {"ndvi": ratio, "scene": scene, "date": date}
 
+@instrument.handler
+@profiles.profile("cbers")
+def point(scene, coordinates, expression):
+    """
+    Point handler.
 
-def area(
+    `coordinates` is a single [lon, lat] pair or a sequence of N pairs; for N
+    pairs, `ndvi` is a numpy array of N values.
+    """
+    expr = compile_expression(expression)
+    bands, addresses, _, info = scene_sources(scene, expression)
+
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    single = coordinates.ndim == 1
+    lon, lat = coordinates.reshape(-1, 2).T
+
+    def worker(idx):
+        """Worker."""
+        with open_dataset(addresses[idx]) as band:
+            xs, ys = warp.transform("EPSG:4326", band.crs, lon, lat)
+            values = sample_points(band, xs, ys)
+        return values
+
+    with band_executor() as executor:
+        data = list(executor.map(worker, range(len(bands))))
+
+    ratio = expr.evaluate(data)[0]
+
+    return dict(ndvi=ratio[0] if single else ratio, **info)
+
+
+@cached(result_cache)
+def render_area(
     scene,
     bbox,
     expression,
     expression_range=[-1, 1],
     bbox_crs="epsg:4326",
     out_crs="epsg:3857",
+    img_format="jpeg",
+    **options,
 ):
-    """Area handler."""
+    """Render the area (`ndvi` as raw image bytes, `options`: encoder options)."""
+    if img_format not in ["png", "jpeg", "webp"]:
+        raise UserWarning(f"Invalid {img_format} extension")
+    check_encoder_options(img_format, options)
+
     max_img_size = 512
 
-    bands = tuple(set(re.findall(r"b(?P<bands>[0-9]{1,2})", expression)))
+    expr = compile_expression(expression)
+    bands = expr.bands
 
     scene_params = cbers_parse_scene_id(scene)
     cbers_address = f'{CBERS_BUCKET}/{scene_params["key"]}'
@@ -85,24 +113,24 @@ def area(
         bbox_crs=bbox_crs,
         out_crs=out_crs,
     )
-    with futures.ThreadPoolExecutor(max_workers=3) as executor:
+    with band_executor() as executor:
         data = np.concatenate(list(executor.map(_worker, addresses)))
         if not np.any(data):
             raise Exception("No valid data in array")
 
         mask = np.all(data != 0, axis=0).astype(np.uint8) * 255
 
-        ctx = {}
-        for bdx, b in enumerate(bands):
-            ctx["b{}".format(b)] = data[bdx]
-        ratio = np.nan_to_num(ne.evaluate(expression, local_dict=ctx))
+        ratio = expr.evaluate(data)[0]
 
-    ratio = np.where(
-        mask, linear_rescale(ratio, in_range=expression_range, out_range=[0, 255]), 0
-    ).astype(np.uint8)
+    with instrument.stage("rescale"):
+        ratio = np.where(
+            mask,
+            linear_rescale(ratio, in_range=expression_range, out_range=[0, 255]),
+            0,
+        ).astype(np.uint8)
 
     img = array_to_img(ratio, mask, get_colormap(name="cfastie"))
-    ndvi = b64_encode_img(img, "jpeg")
+    ndvi = encode_img(img, img_format, **options)
 
     date = (
         scene_params["acquisitionYear"]
@@ -113,3 +141,36 @@ def area(
     )
 
     return {"ndvi": ndvi, "scene": scene, "date": date}
+
+
+@instrument.handler
+@profiles.profile("cbers")
+def area(
+    scene,
+    bbox,
+    expression,
+    expression_range=[-1, 1],
+    bbox_crs="epsg:4326",
+    out_crs="epsg:3857",
+    img_format="jpeg",
+    output="base64",
+    **options,
+):
+    """
+    Area handler.
+
+    `ndvi` is base64 (default), raw bytes (`output="bytes"`) or written to a
+    file object (`output=<file>`). `options` are encoder options (e.g
+    `quality=85`, see `remotepixel.utils.encode_img`).
+    """
+    result = render_area(
+        scene,
+        bbox,
+        expression,
+        expression_range=expression_range,
+        bbox_crs=bbox_crs,
+        out_crs=out_crs,
+        img_format=img_format,
+        **options,
+    )
+    return dict(result, ndvi=format_img(result["ndvi"], output))
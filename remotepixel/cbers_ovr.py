@@ -1,31 +1,44 @@
 """remotepixel.l8_ovr module."""
 
-import re
 from functools import partial
-from concurrent import futures
 
 import numpy as np
-import numexpr as ne
 
-from remotepixel.utils import cbers_parse_scene_id, get_overview
-from rio_tiler.utils import linear_rescale, array_to_img, get_colormap, b64_encode_img
+from remotepixel import instrument, profiles
+from remotepixel.cache import cached
+from remotepixel.executors import band_executor
+from remotepixel.expression import compile_expression
+from remotepixel.stats import band_ranges, stats_version
+from remotepixel.stretch import histogram_percentiles
+from remotepixel.utils import (
+    cbers_parse_scene_id,
+    check_encoder_options,
+    encode_img,
+    format_img,
+    get_overview,
+    result_cache,
+)
+from rio_tiler.utils import linear_rescale, array_to_img, get_colormap
 
 np.seterr(divide="ignore", invalid="ignore")
 
 CBERS_BUCKET = "s3://cbers-pds"
 
 
-def create(
+@cached(result_cache, depends=lambda arguments: stats_version(arguments["scene"]))
+def render(
     scene,
     bands=None,
     expression=None,
     expression_range=[-1, 1],
     img_format="jpeg",
     ovrSize=512,
+    **options,
 ):
-    """Handler."""
-    if img_format not in ["png", "jpeg"]:
+    """Render the overview as raw image bytes (`options`: encoder options)."""
+    if img_format not in ["png", "jpeg", "webp"]:
         raise UserWarning(f"Invalid {img_format} extension")
+    check_encoder_options(img_format, options)
 
     if not expression and not bands:
         raise Exception("Expression or Bands must be provided")
@@ -36,9 +49,9 @@ def create(
             raise Exception("RGB combination only")
 
     if expression:
-        bands = tuple(set(re.findall(r"b(?P<bands>[0-9]{1,2})", expression)))
-        rgb = expression.split(",")
-        nb_bands = len(rgb)
+        expr = compile_expression(expression)
+        bands = expr.bands
+        nb_bands = len(expr)
 
     scene_params = cbers_parse_scene_id(scene)
     cbers_address = f'{CBERS_BUCKET}/{scene_params["key"]}'
@@ -47,35 +60,62 @@ def create(
     ]
 
     worker = partial(get_overview, ovrSize=ovrSize)
-    with futures.ThreadPoolExecutor(max_workers=3) as executor:
+    with band_executor() as executor:
         data = np.concatenate(list(executor.map(worker, addresses)))
         mask = np.all(data != 0, axis=0).astype(np.uint8) * 255
 
         if expression:
-            ctx = {}
-            for bdx, b in enumerate(bands):
-                ctx["b{}".format(b)] = data[bdx]
-            data = np.array(
-                [
-                    np.nan_to_num(ne.evaluate(bloc.strip(), local_dict=ctx))
-                    for bloc in rgb
-                ]
-            )
-
-        for band in range(data.shape[0]):
-            imgRange = (
-                expression_range
-                if expression
-                else np.percentile(data[band][mask > 0], (2, 98)).tolist()
-            )
-            data[band] = np.where(
-                mask,
-                linear_rescale(data[band], in_range=imgRange, out_range=[0, 255]),
-                0,
-            )
+            data = expr.evaluate(data)
+            ranges = [expression_range] * nb_bands
+        else:
+            ranges = band_ranges(scene, bands) or [
+                histogram_percentiles(data[band], mask, (2, 98))
+                for band in range(nb_bands)
+            ]
+
+        with instrument.stage("rescale"):
+            for band in range(data.shape[0]):
+                data[band] = np.where(
+                    mask,
+                    linear_rescale(
+                        data[band], in_range=ranges[band], out_range=[0, 255]
+                    ),
+                    0,
+                )
 
     data = data.squeeze()
     colormap = None if len(data.shape) >= 3 else get_colormap(name="cfastie")
 
     img = array_to_img(data, mask, colormap)
-    return b64_encode_img(img, img_format)
+    return encode_img(img, img_format, **options)
+
+
+@instrument.handler
+@profiles.profile("cbers")
+def create(
+    scene,
+    bands=None,
+    expression=None,
+    expression_range=[-1, 1],
+    img_format="jpeg",
+    ovrSize=512,
+    output="base64",
+    **options,
+):
+    """
+    Handler.
+
+    Returns the overview as base64 (default), raw bytes (`output="bytes"`) or
+    written to a file object (`output=<file>`). `options` are encoder options
+    (e.g `quality=85`, see `remotepixel.utils.encode_img`).
+    """
+    content = render(
+        scene,
+        bands=bands,
+        expression=expression,
+        expression_range=expression_range,
+        img_format=img_format,
+        ovrSize=ovrSize,
+        **options,
+    )
+    return format_img(content, output)
@@ -0,0 +1,98 @@
+"""remotepixel.cbers_tile module."""
+
+from functools import partial
+
+import numpy as np
+
+from remotepixel import instrument, profiles
+from remotepixel.executors import band_executor
+from remotepixel.expression import compile_expression
+from remotepixel.stats import band_ranges
+from remotepixel.utils import (
+    cbers_parse_scene_id,
+    check_encoder_options,
+    encode_img,
+    get_tile,
+    tile_exists,
+)
+from rio_tiler.utils import linear_rescale, array_to_img, get_colormap
+
+np.seterr(divide="ignore", invalid="ignore")
+
+CBERS_BUCKET = "s3://cbers-pds"
+BANDS_RANGE = [0, 255]
+
+
+@instrument.handler
+@profiles.profile("cbers")
+def tile(
+    scene,
+    z,
+    x,
+    y,
+    bands=None,
+    expression=None,
+    expression_range=[-1, 1],
+    bands_range=None,
+    tilesize=256,
+    img_format="png",
+    **options,
+):
+    """
+    Tile handler.
+
+    Read the web mercator tile `z/x/y` (one windowed read per band) and return
+    raw PNG, JPEG or WebP bytes. Band combinations are rescaled from
+    `bands_range`, or else from the scene statistics sidecar (see
+    `remotepixel.stats`) or `BANDS_RANGE`, so neighbouring tiles match.
+    `options` are encoder options (e.g `quality=85`, see
+    `remotepixel.utils.encode_img`).
+    """
+    if img_format not in ["png", "jpeg", "webp"]:
+        raise UserWarning(f"Invalid {img_format} extension")
+    check_encoder_options(img_format, options)
+
+    if not expression and not bands:
+        raise Exception("Expression or Bands must be provided")
+
+    if bands:
+        if len(bands) != 3:
+            raise Exception("RGB combination only")
+
+    if expression:
+        expr = compile_expression(expression)
+        bands = expr.bands
+
+    scene_params = cbers_parse_scene_id(scene)
+    cbers_address = f'{CBERS_BUCKET}/{scene_params["key"]}'
+    addresses = [
+        "{}/{}_BAND{}.tif".format(cbers_address, scene, band) for band in bands
+    ]
+    if not tile_exists(addresses[0], z, x, y):
+        raise Exception(f"Tile {z}/{x}/{y} is outside image bounds")
+
+    worker = partial(get_tile, z=z, x=x, y=y, tilesize=tilesize)
+    with band_executor() as executor:
+        data = np.concatenate(list(executor.map(worker, addresses)))
+    mask = np.all(data != 0, axis=0).astype(np.uint8) * 255
+
+    if expression:
+        data = expr.evaluate(data)
+        ranges = [expression_range] * len(expr)
+    else:
+        ranges = None if bands_range else band_ranges(scene, bands)
+        ranges = ranges or [bands_range or BANDS_RANGE] * len(bands)
+
+    with instrument.stage("rescale"):
+        data = np.stack(
+            [
+                np.where(mask, linear_rescale(arr, in_range=rng, out_range=[0, 255]), 0)
+                for arr, rng in zip(data, ranges)
+            ]
+        ).astype(np.uint8)
+
+    data = data.squeeze()
+    colormap = None if len(data.shape) >= 3 else get_colormap(name="cfastie")
+
+    img = array_to_img(data, mask, colormap)
+    return encode_img(img, img_format, **options)
@@ -0,0 +1,143 @@
+"""remotepixel.datasets module."""
+
+import os
+import threading
+import contextlib
+from collections import OrderedDict
+
+import rasterio
+
+from remotepixel import instrument, profiles
+
+
+class DatasetPool(object):
+    """
+    Thread-safe pool of open rasterio datasets.
+
+    Opening a remote COG fetches its header and IFDs; keeping handles open lets
+    warm requests skip that cost. A handle is only used by one thread at a time:
+    `open` checks out an idle handle for the address (or opens a new one) and
+    returns it to the pool when the block exits. Handles are only shared
+    between calls with the same `profiles.PER_DATASET` GDAL options, which
+    only take effect when a dataset is opened. Idle handles are closed in
+    least recently used order once more than `max_handles` are kept.
+
+    Attributes
+    ----------
+    max_handles : int
+        Maximum number of idle handles kept open.
+
+    """
+
+    def __init__(self, max_handles=32):
+        """Create an empty pool."""
+        self.max_handles = max_handles
+        self.hits = 0
+        self.misses = 0
+        self._idle = OrderedDict()
+        self._nidle = 0
+        # Incremented by `discard`, handles checked out before are not kept
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return number of idle handles."""
+        return self._nidle
+
+    def _checkout(self, key):
+        with self._lock:
+            handles = self._idle.get(key)
+            if handles:
+                self.hits += 1
+                self._nidle -= 1
+                src = handles.pop()
+                if not handles:
+                    del self._idle[key]
+                return src
+            self.misses += 1
+
+        address, options, _ = key
+        with instrument.stage("open", dataset=address):
+            return rasterio.open(address, **dict(options))
+
+    def _checkin(self, key, src, generation):
+        to_close = []
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                to_close.append(src)
+            else:
+                self._idle.setdefault(key, []).append(src)
+                self._idle.move_to_end(key)
+                self._nidle += 1
+            while self._nidle > self.max_handles:
+                old_key, handles = next(iter(self._idle.items()))
+                to_close.append(handles.pop(0))
+                self._nidle -= 1
+                if not handles:
+                    del self._idle[old_key]
+
+        for handle in to_close:
+            handle.close()
+
+    @contextlib.contextmanager
+    def open(self, address, **options):
+        """Check out an open dataset (read mode) for `address`."""
+        gdal_options = rasterio.env.getenv() if rasterio.env.hasenv() else {}
+        per_dataset = sorted(
+            (name, value)
+            for name, value in gdal_options.items()
+            if name in profiles.PER_DATASET
+        )
+        key = (address, tuple(sorted(options.items())), tuple(per_dataset))
+        with self._lock:
+            generation = self._generations.get(address, 0)
+        src = self._checkout(key)
+        try:
+            yield src
+        except Exception:
+            # The handle might be in a bad state (e.g network error)
+            src.close()
+            raise
+        else:
+            self._checkin(key, src, generation)
+
+    def discard(self, address):
+        """Close the idle handles of `address`, handles in use are closed on return."""
+        with self._lock:
+            self._generations[address] = self._generations.get(address, 0) + 1
+            keys = [key for key in self._idle if key[0] == address]
+            handles = [src for key in keys for src in self._idle.pop(key)]
+            self._nidle -= len(handles)
+
+        for src in handles:
+            src.close()
+
+    def clear(self):
+        """Close all idle handles and reset counters."""
+        with self._lock:
+            handles = [src for srcs in self._idle.values() for src in srcs]
+            self._idle.clear()
+            self._nidle = 0
+            self.hits = 0
+            self.misses = 0
+
+        for src in handles:
+            src.close()
+
+    def stats(self):
+        """Return pool counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": self._nidle,
+                "max_handles": self.max_handles,
+            }
+
+
+pool = DatasetPool(max_handles=int(os.environ.get("REMOTEPIXEL_MAX_DATASETS", 32)))
+
+
+def open_dataset(address, **options):
+    """Check out an open dataset from the shared pool."""
+    return pool.open(address, **options)
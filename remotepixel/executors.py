@@ -0,0 +1,129 @@
+"""remotepixel.executors module."""
+
+import threading
+import contextlib
+from concurrent import futures
+
+from remotepixel import instrument, profiles
+
+_local = threading.local()
+
+
+class RequestExecutor(object):
+    """
+    Per-request view of a shared executor.
+
+    Calls are submitted to the shared `executor`, at most `max_workers` at once
+    for this request. Once `cancel` is called, pending calls are cancelled and
+    new submissions raise `concurrent.futures.CancelledError`. Calls run with
+    the GDAL options of the submitting thread.
+
+    Attributes
+    ----------
+    executor : concurrent.futures.Executor
+        Shared executor running the calls.
+    max_workers : int, optional
+        Maximum number of concurrent calls for this request (default: 3).
+
+    """
+
+    def __init__(self, executor, max_workers=3):
+        """Create the request limits."""
+        self.executor = executor
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._cancelled = threading.Event()
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        """Return True once the request is cancelled."""
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raise `CancelledError` if the request is cancelled."""
+        if self._cancelled.is_set():
+            raise futures.CancelledError()
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule `func(*args, **kwargs)`, waiting for a free request slot."""
+        while not self._slots.acquire(timeout=0.1):
+            self.check()
+
+        try:
+            self.check()
+            future = self.executor.submit(profiles.bind(func), *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def map(self, func, *iterables):
+        """Return the list of `func` results, in order."""
+        calls = []
+        try:
+            for args in zip(*iterables):
+                calls.append(self.submit(func, *args))
+            return [future.result() for future in calls]
+        finally:
+            for future in calls:
+                future.cancel()
+
+    def cancel(self):
+        """Cancel pending calls and refuse new ones."""
+        self._cancelled.set()
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+
+    def run(self, func, *args, **kwargs):
+        """Call `func` with this executor used by `band_executor`."""
+        previous = getattr(_local, "request", None)
+        _local.request = self
+        try:
+            self.check()
+            return func(*args, **kwargs)
+        finally:
+            _local.request = previous
+
+
+def current_request():
+    """Return the `RequestExecutor` of the calling thread, if any."""
+    return getattr(_local, "request", None)
+
+
+def check_cancelled():
+    """Raise `CancelledError` if the request of the calling thread is cancelled."""
+    request = current_request()
+    if request is not None:
+        request.check()
+
+
+@contextlib.contextmanager
+def band_executor(max_workers=3):
+    """
+    Executor for concurrent band reads.
+
+    Within `RequestExecutor.run` (e.g the `remotepixel.aio` handlers) reads go
+    to the shared executor under the request limits, otherwise to a private
+    thread pool of `max_workers` threads. Reads run with the GDAL options of
+    the calling thread (e.g the handler profile).
+    """
+    request = current_request()
+    if request is not None:
+        yield instrument.pool(request)
+        return
+
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield instrument.pool(RequestExecutor(executor, max_workers=max_workers))
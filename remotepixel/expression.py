@@ -0,0 +1,115 @@
+"""remotepixel.expression module."""
+
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+import numexpr as ne
+
+from remotepixel import instrument
+
+BAND_PATTERN = r"[0-9]{1,2}"
+
+# numexpr signature types: python `float` is its single precision kind
+SIGNATURE_TYPES = {np.dtype(np.float32): float, np.dtype(np.float64): np.float64}
+
+
+class Expression(object):
+    """
+    Parsed band math expression.
+
+    Attributes
+    ----------
+    expression : str
+        Band math expression, one per output band separated by commas
+        (e.g "b4,b3,b2" or "(b5 - b4) / (b5 + b4)").
+    bands : tuple
+        Band names used in the expression, in order of first appearance.
+    blocs : list
+        Expression of each output band.
+
+    """
+
+    def __init__(self, expression, band_pattern=BAND_PATTERN):
+        """Parse and validate the expression."""
+        if not expression or not expression.strip():
+            raise ValueError("Empty expression")
+
+        self.expression = expression
+        self.blocs = [bloc.strip() for bloc in expression.split(",")]
+        if not all(self.blocs):
+            raise ValueError(f"Invalid expression: {expression}")
+
+        pattern = re.compile(r"\bb(?P<bands>{})\b".format(band_pattern))
+        bloc_bands = [list(dict.fromkeys(pattern.findall(bloc))) for bloc in self.blocs]
+        self.bands = tuple(dict.fromkeys(b for bands in bloc_bands for b in bands))
+        if not self.bands:
+            raise ValueError(f"No band found in expression: {expression}")
+
+        self._inputs = [[self.bands.index(b) for b in bands] for bands in bloc_bands]
+        self._programs = {}
+        self._lock = threading.Lock()
+
+        # Compile once to validate the expression
+        self.programs(np.float64)
+
+    def __len__(self):
+        """Return number of output bands."""
+        return len(self.blocs)
+
+    def __repr__(self):
+        """Return representation."""
+        return f"Expression({self.expression!r})"
+
+    def programs(self, dtype):
+        """Return compiled numexpr programs for input `dtype`."""
+        dtype = np.dtype(dtype)
+        programs = self._programs.get(dtype)
+        if programs is not None:
+            return programs
+
+        with self._lock:
+            programs = self._programs.get(dtype)
+            if programs is None:
+                programs = []
+                for bloc, inputs in zip(self.blocs, self._inputs):
+                    signature = [
+                        (f"b{self.bands[idx]}", SIGNATURE_TYPES[dtype])
+                        for idx in inputs
+                    ]
+                    try:
+                        programs.append(ne.NumExpr(bloc, signature=signature))
+                    except Exception as err:
+                        raise ValueError(f"Invalid expression {bloc}: {err}")
+                self._programs[dtype] = programs
+
+        return programs
+
+    def evaluate(self, data):
+        """
+        Apply the expression.
+
+        `data` holds one array per band, in `bands` order. Inputs are computed
+        as float32 if they all are float32, as float64 otherwise. Returns an
+        array of shape (len(blocs), ...) with NaN/inf replaced by numbers.
+        """
+        arrays = [np.asarray(d) for d in data]
+        if len(arrays) != len(self.bands):
+            raise ValueError(f"Expected {len(self.bands)} bands, got {len(arrays)}")
+
+        with instrument.stage("expression", expression=self.expression):
+            dtype = np.float32 if np.result_type(*arrays) == np.float32 else np.float64
+            arrays = [np.ascontiguousarray(arr, dtype=dtype) for arr in arrays]
+            return np.array(
+                [
+                    np.nan_to_num(program(*[arrays[idx] for idx in inputs]))
+                    for program, inputs in zip(self.programs(dtype), self._inputs)
+                ]
+            )
+
+
+@lru_cache(maxsize=256)
+def compile_expression(expression, band_pattern=BAND_PATTERN):
+    """Return a cached `Expression`."""
+    return Expression(expression, band_pattern=band_pattern)
@@ -0,0 +1,286 @@
+"""
+remotepixel.instrument module.
+
+Per-stage timing and I/O instrumentation.
+
+Handlers report the duration of their stages ("metadata", "s3", "open",
+"read", "expression", "rescale", "encode", thread pool "queue" wait and the
+whole "handler" call) as events sent to the registered sinks. An event is a
+dict with `stage`, `duration` (seconds), `handler` (entry point name) and,
+depending on the stage, `dataset` (address or S3 key), `bytes` (decoded array
+or S3 object size) and `error` (exception name).
+
+A sink is any callable taking an event, e.g `LoggingSink`, `StatsdSink` or a
+`Recorder`. Without sinks (the default) instrumentation is skipped entirely.
+
+    >>> from remotepixel import instrument, l8_ovr
+    >>> with instrument.record() as recorder:
+    ...     l8_ovr.create(scene, bands=[4, 3, 2])
+    >>> recorder.summary()
+
+"""
+
+import time
+import socket
+import logging
+import threading
+import contextlib
+import functools
+from collections import defaultdict
+
+from remotepixel import profiles
+
+logger = logging.getLogger(__name__)
+
+_sinks = []
+_local = threading.local()
+
+
+def enabled():
+    """Return True if at least one sink is registered."""
+    return bool(_sinks)
+
+
+def add_sink(sink):
+    """Register a sink (callable taking an event dict) and return it."""
+    _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    """Unregister a sink."""
+    _sinks.remove(sink)
+
+
+def emit(stage, duration, **tags):
+    """Send an event to the sinks (sink errors are logged, not raised)."""
+    event = dict(tags, stage=stage, duration=duration)
+    event.setdefault("handler", getattr(_local, "handler", None))
+    for sink in list(_sinks):
+        try:
+            sink(event)
+        except Exception:
+            logger.exception("Instrumentation sink failed")
+
+
+class _Stage(object):
+    """Time a block and emit its event on exit."""
+
+    __slots__ = ("name", "tags", "start")
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.tags["error"] = exc_type.__name__
+        emit(self.name, time.perf_counter() - self.start, **self.tags)
+
+    def set(self, **tags):
+        """Add tags to the event (e.g `bytes`)."""
+        self.tags.update(tags)
+
+
+class _NullStage(object):
+    """Disabled stage."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def set(self, **tags):
+        """Ignore tags."""
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, **tags):
+    """
+    Time a block as stage `name`.
+
+    Returns a context manager whose `set(**tags)` adds tags to the event, e.g
+    `with stage("read", dataset=address) as s: ...; s.set(bytes=data.nbytes)`.
+    """
+    if not _sinks:
+        return _NULL_STAGE
+    return _Stage(name, tags)
+
+
+def handler(func):
+    """Time a handler entry point and tag the events of its stages."""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _sinks:
+            return func(*args, **kwargs)
+
+        previous = getattr(_local, "handler", None)
+        _local.handler = previous or name
+        try:
+            with _Stage("handler", {"handler": name}):
+                return func(*args, **kwargs)
+        finally:
+            _local.handler = previous
+
+    return wrapper
+
+
+class InstrumentedExecutor(object):
+    """
+    Executor proxy recording the queue wait of each call ("queue" stage).
+
+    Calls run with the handler tag and GDAL options of the submitting thread.
+    """
+
+    def __init__(self, executor):
+        """Wrap `executor`."""
+        self.executor = executor
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule `func(*args, **kwargs)`."""
+        queued = time.perf_counter()
+        name = getattr(_local, "handler", None)
+        func = profiles.bind(func)
+
+        def call():
+            previous = getattr(_local, "handler", None)
+            _local.handler = name
+            emit("queue", time.perf_counter() - queued)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _local.handler = previous
+
+        return self.executor.submit(call)
+
+    def map(self, func, *iterables):
+        """Return the list of `func` results, in order."""
+        calls = []
+        try:
+            for args in zip(*iterables):
+                calls.append(self.submit(func, *args))
+            return [future.result() for future in calls]
+        finally:
+            for future in calls:
+                future.cancel()
+
+
+def pool(executor):
+    """Return `executor`, wrapped to record queue waits if enabled."""
+    if not _sinks:
+        return executor
+    return InstrumentedExecutor(executor)
+
+
+class LoggingSink(object):
+    """Log events (one line per event)."""
+
+    def __init__(self, logger=logger, level=logging.INFO):
+        """Create sink."""
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, event):
+        """Log an event."""
+        tags = " ".join(
+            f"{key}={value}"
+            for key, value in sorted(event.items())
+            if key not in ["stage", "duration"] and value is not None
+        )
+        self.logger.log(
+            self.level, "%s %.2fms %s", event["stage"], event["duration"] * 1000, tags
+        )
+
+
+class StatsdSink(object):
+    """
+    Send events to a StatsD server over UDP.
+
+    Durations are sent as timers (`{prefix}.{stage}` or
+    `{prefix}.{handler}.{stage}` with `per_handler`) and bytes as counters
+    (`{prefix}.{stage}.bytes`).
+    """
+
+    def __init__(
+        self, host="localhost", port=8125, prefix="remotepixel", per_handler=False
+    ):
+        """Create sink."""
+        self.address = (host, port)
+        self.prefix = prefix
+        self.per_handler = per_handler
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, event):
+        """Send an event."""
+        name = event["stage"]
+        if self.per_handler and event.get("handler"):
+            name = f"{event['handler']}.{name}"
+        name = f"{self.prefix}.{name}"
+
+        metrics = [f"{name}:{event['duration'] * 1000:.3f}|ms"]
+        if event.get("bytes") is not None:
+            metrics.append(f"{name}.bytes:{event['bytes']}|c")
+        self._socket.sendto("\n".join(metrics).encode(), self.address)
+
+    def close(self):
+        """Close the socket."""
+        self._socket.close()
+
+
+class Recorder(object):
+    """Keep events in memory and summarize them per stage and per dataset."""
+
+    def __init__(self):
+        """Create an empty recorder."""
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        """Record an event."""
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self):
+        """
+        Return totals per stage and per dataset.
+
+        Stage totals have `count` and `duration` (seconds, summed across
+        threads); dataset totals have `requests` (opens, reads and S3 requests)
+        and `bytes`.
+        """
+        stages = defaultdict(lambda: {"count": 0, "duration": 0.0})
+        datasets = defaultdict(lambda: {"requests": 0, "bytes": 0})
+        with self._lock:
+            events = list(self.events)
+
+        for event in events:
+            totals = stages[event["stage"]]
+            totals["count"] += 1
+            totals["duration"] += event["duration"]
+            if event.get("dataset") is not None:
+                totals = datasets[event["dataset"]]
+                totals["requests"] += 1
+                totals["bytes"] += event.get("bytes") or 0
+
+        return {"stages": dict(stages), "datasets": dict(datasets)}
+
+
+@contextlib.contextmanager
+def record():
+    """Record the events of a block in a `Recorder`."""
+    recorder = add_sink(Recorder())
+    try:
+        yield recorder
+    finally:
+        remove_sink(recorder)
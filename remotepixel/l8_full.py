@@ -1,26 +1,40 @@
 """remotepixel.l8_full module."""
 
-import re
-import contextlib
-from functools import partial
-from concurrent import futures
-
 import numpy as np
-import numexpr as ne
-
-import rasterio
-from rasterio.io import MemoryFile
-from rio_toa import reflectance
 
-from rio_tiler.utils import landsat_parse_scene_id, landsat_get_mtl
+from remotepixel import instrument, profiles
+from remotepixel.blocks import block_layout, write_blocks
+from remotepixel.datasets import open_dataset
+from remotepixel.expression import compile_expression
+from remotepixel.utils import landsat_get_mtl, landsat_reflectance
+from rio_tiler.utils import landsat_parse_scene_id
 
 np.seterr(divide="ignore", invalid="ignore")
 
 LANDSAT_BUCKET = "s3://landsat-pds"
 
 
-def create(scene, bands=None, expression=None):
-    """Handler."""
+@instrument.handler
+@profiles.profile("landsat")
+def create(
+    scene,
+    bands=None,
+    expression=None,
+    output=None,
+    memory_budget=None,
+    read_ahead=4,
+    max_workers=3,
+    precision="float32",
+):
+    """
+    Handler.
+
+    By default the result is returned as a `MemoryFile`. Set `output` to a path
+    or a writable file object to stream the blocks to it instead, with
+    `memory_budget` (in bytes) bounding the memory used while processing (see
+    `remotepixel.blocks.write_blocks`). Reflectance and band math are computed
+    in `precision` ("float32" or "float64"; float32 halves the block memory).
+    """
     scene_params = landsat_parse_scene_id(scene)
     meta_data = landsat_get_mtl(scene).get("L1_METADATA_FILE")
     landsat_address = f'{LANDSAT_BUCKET}/{scene_params["key"]}'
@@ -35,17 +49,18 @@ def create(scene, bands=None, expression=None):
             raise Exception("RGB combination only")
 
     if expression:
-        bands = list(set(re.findall(r"b(?P<bands>[0-9]{1,2})", expression)))
-        rgb = expression.split(",")
+        expr = compile_expression(expression)
+        bands = expr.bands
         data_type = np.float32
-        nb_bands = len(rgb)
+        nb_bands = len(expr)
 
     bqa = f"{landsat_address}_BQA.TIF"
-    with rasterio.open(bqa) as src:
+    with open_dataset(bqa) as src:
         meta = src.meta
-        wind = [w for ij, w in src.block_windows(1)]
+        wind, layout = block_layout(src)
 
         meta.update(
+            **layout,
             nodata=0,
             count=nb_bands,
             interleave="pixel",
@@ -54,46 +69,34 @@ def create(scene, bands=None, expression=None):
             dtype=data_type,
         )
 
-    sun_elev = meta_data["IMAGE_ATTRIBUTES"]["SUN_ELEVATION"]
-
-    memfile = MemoryFile()
-    with memfile.open(**meta) as dataset:
-        with contextlib.ExitStack() as stack:
-            srcs = [
-                stack.enter_context(rasterio.open(f"{landsat_address}_B{band}.TIF"))
-                for band in bands
-            ]
-
-            def get_window(idx, window):
-                band = bands[idx]
-                multi_reflect = meta_data["RADIOMETRIC_RESCALING"].get(
-                    f"REFLECTANCE_MULT_BAND_{band}"
-                )
-                add_reflect = meta_data["RADIOMETRIC_RESCALING"].get(
-                    f"REFLECTANCE_ADD_BAND_{band}"
-                )
-                data = srcs[idx].read(window=window, boundless=True, indexes=(1))
-                return reflectance.reflectance(
-                    data, multi_reflect, add_reflect, sun_elev
-                )
-
-            for window in wind:
-                _worker = partial(get_window, window=window)
-                with futures.ThreadPoolExecutor(max_workers=3) as executor:
-                    data = np.stack(list(executor.map(_worker, range(len(bands)))))
-                    if expression:
-                        ctx = {}
-                        for bdx, b in enumerate(bands):
-                            ctx["b{}".format(b)] = data[bdx]
-                        data = np.array(
-                            [
-                                np.nan_to_num(ne.evaluate(bloc.strip(), local_dict=ctx))
-                                for bloc in rgb
-                            ]
-                        )
-                    else:
-                        data *= 10000
-
-                    dataset.write(data.astype(data_type), window=window)
-
-    return memfile
+    def band_reader(band):
+        """Create window reader for band."""
+        address = f"{landsat_address}_B{band}.TIF"
+
+        def get_window(window):
+            with open_dataset(address) as src:
+                data = src.read(window=window, boundless=True, indexes=(1))
+            return landsat_reflectance(data, band, meta_data, precision=precision)
+
+        return get_window
+
+    def compute(data):
+        """Compute output block."""
+        if expression:
+            data = expr.evaluate(data)
+        else:
+            data = np.stack(data) * 10000
+
+        return data.astype(data_type)
+
+    return write_blocks(
+        meta,
+        wind,
+        [band_reader(band) for band in bands],
+        compute,
+        output=output,
+        memory_budget=memory_budget,
+        read_ahead=read_ahead,
+        max_workers=max_workers,
+        work_dtype=precision,
+    )
@@ -1,88 +1,112 @@
 """remotepixel.l8_ndvi module."""
 
-import re
-from functools import partial
-from concurrent import futures
-
 import numpy as np
-import numexpr as ne
 
-import rasterio
 from rasterio import warp
-from rio_toa.reflectance import reflectance
 
-from remotepixel.utils import get_area
+from remotepixel import instrument, profiles
+from remotepixel.cache import cached
+from remotepixel.datasets import open_dataset
+from remotepixel.executors import band_executor
+from remotepixel.expression import compile_expression
+from remotepixel.utils import (
+    check_encoder_options,
+    encode_img,
+    format_img,
+    get_area,
+    landsat_get_mtl,
+    landsat_reflectance,
+    result_cache,
+    sample_points,
+)
 from rio_tiler.utils import (
     landsat_parse_scene_id,
-    landsat_get_mtl,
     linear_rescale,
     array_to_img,
     get_colormap,
-    b64_encode_img,
 )
 
-
 np.seterr(divide="ignore", invalid="ignore")
 
 LANDSAT_BUCKET = "s3://landsat-pds"
 
 
-def point(scene, coordinates, expression):
-    """Point handler."""
-    bands = tuple(set(re.findall(r"b(?P<bands>[0-9]{1,2})", expression)))
+def scene_sources(scene, expression, precision="float32"):
+    """Return expression bands, band addresses, value converter and scene info."""
+    bands = compile_expression(expression).bands
 
     scene_params = landsat_parse_scene_id(scene)
     meta_data = landsat_get_mtl(scene).get("L1_METADATA_FILE")
     landsat_address = f'{LANDSAT_BUCKET}/{scene_params["key"]}'
+    addresses = [f"{landsat_address}_B{band}.TIF" for band in bands]
 
-    def worker(band, coordinates):
-        """Worker."""
-        address = f"{landsat_address}_B{band}.TIF"
-        sun_elev = meta_data["IMAGE_ATTRIBUTES"]["SUN_ELEVATION"]
-        multi_reflect = meta_data["RADIOMETRIC_RESCALING"][
-            f"REFLECTANCE_MULT_BAND_{band}"
-        ]
-        add_reflect = meta_data["RADIOMETRIC_RESCALING"][f"REFLECTANCE_ADD_BAND_{band}"]
-        with rasterio.open(address) as band:
-            lon_srs, lat_srs = warp.transform(
-                "EPSG:4326", band.crs, [coordinates[0]], [coordinates[1]]
-            )
-            point = list(band.sample([(lon_srs[0], lat_srs[0])]))[0]
-
-        return reflectance(point, multi_reflect, add_reflect, sun_elev, src_nodata=0)[0]
-
-    try:
-        _worker = partial(worker, coordinates=coordinates)
-        with futures.ThreadPoolExecutor(max_workers=3) as executor:
-            data = list(executor.map(_worker, bands))
-
-            ctx = {}
-            for bdx, b in enumerate(bands):
-                ctx["b{}".format(b)] = data[bdx]
-            ratio = np.nan_to_num(ne.evaluate(expression, local_dict=ctx))
-    except IndexError:
-        ratio = 0.0
+    def to_reflectance(band, values):
+        """Convert DN to TOA reflectance."""
+        return landsat_reflectance(values, band, meta_data, precision=precision)
 
-    return {
-        "ndvi": ratio,
+    info = {
         "date": scene_params["date"],
         "scene": scene,
         "cloud": meta_data["IMAGE_ATTRIBUTES"]["CLOUD_COVER"],
     }
+    return bands, addresses, to_reflectance, info
 
 
-def area(
+@instrument.handler
+@profiles.profile("landsat")
+def point(scene, coordinates, expression, precision="float32"):
+    """
+    Point handler.
+
+    `coordinates` is a single [lon, lat] pair or a sequence of N pairs; for N
+    pairs, `ndvi` is a numpy array of N values. `precision` ("float32" or
+    "float64") sets the reflectance and band math data type.
+    """
+    expr = compile_expression(expression)
+    bands, addresses, to_reflectance, info = scene_sources(
+        scene, expression, precision=precision
+    )
+
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    single = coordinates.ndim == 1
+    lon, lat = coordinates.reshape(-1, 2).T
+
+    def worker(idx):
+        """Worker."""
+        with open_dataset(addresses[idx]) as band:
+            xs, ys = warp.transform("EPSG:4326", band.crs, lon, lat)
+            values = sample_points(band, xs, ys)
+        return to_reflectance(bands[idx], values)
+
+    with band_executor() as executor:
+        data = list(executor.map(worker, range(len(bands))))
+
+    ratio = expr.evaluate(data)[0]
+
+    return dict(ndvi=ratio[0] if single else ratio, **info)
+
+
+@cached(result_cache)
+def render_area(
     scene,
     bbox,
     expression,
     expression_range=[-1, 1],
     bbox_crs="epsg:4326",
     out_crs="epsg:3857",
+    img_format="jpeg",
+    precision="float32",
+    **options,
 ):
-    """Area handler."""
+    """Render the area (`ndvi` as raw image bytes, `options`: encoder options)."""
+    if img_format not in ["png", "jpeg", "webp"]:
+        raise UserWarning(f"Invalid {img_format} extension")
+    check_encoder_options(img_format, options)
+
     max_img_size = 512
 
-    bands = tuple(set(re.findall(r"b(?P<bands>[0-9]{1,2})", expression)))
+    expr = compile_expression(expression)
+    bands = expr.bands
 
     scene_params = landsat_parse_scene_id(scene)
     meta_data = landsat_get_mtl(scene).get("L1_METADATA_FILE")
@@ -91,34 +115,28 @@ def area(
     def worker(band):
         """Worker."""
         address = f"{landsat_address}_B{band}.TIF"
-        sun_elev = meta_data["IMAGE_ATTRIBUTES"]["SUN_ELEVATION"]
-        multi_reflect = meta_data["RADIOMETRIC_RESCALING"][
-            f"REFLECTANCE_MULT_BAND_{band}"
-        ]
-        add_reflect = meta_data["RADIOMETRIC_RESCALING"][f"REFLECTANCE_ADD_BAND_{band}"]
-
-        band = get_area(
+        matrix = get_area(
             address, bbox, max_img_size=max_img_size, bbox_crs=bbox_crs, out_crs=out_crs
         )
-        return reflectance(band, multi_reflect, add_reflect, sun_elev, src_nodata=0)
+        return landsat_reflectance(matrix, band, meta_data, precision=precision)
 
-    with futures.ThreadPoolExecutor(max_workers=3) as executor:
+    with band_executor() as executor:
         data = np.concatenate(list(executor.map(worker, bands)))
         if not np.any(data):
             raise Exception("No valid data in array")
         mask = np.all(data != 0, axis=0).astype(np.uint8) * 255
 
-        ctx = {}
-        for bdx, b in enumerate(bands):
-            ctx["b{}".format(b)] = data[bdx]
-        ratio = np.nan_to_num(ne.evaluate(expression, local_dict=ctx))
+        ratio = expr.evaluate(data)[0]
 
-    ratio = np.where(
-        mask, linear_rescale(ratio, in_range=expression_range, out_range=[0, 255]), 0
-    ).astype(np.uint8)
+    with instrument.stage("rescale"):
+        ratio = np.where(
+            mask,
+            linear_rescale(ratio, in_range=expression_range, out_range=[0, 255]),
+            0,
+        ).astype(np.uint8)
 
     img = array_to_img(ratio, mask, get_colormap(name="cfastie"))
-    ndvi = b64_encode_img(img, "jpeg")
+    ndvi = encode_img(img, img_format, **options)
 
     return {
         "ndvi": ndvi,
@@ -126,3 +144,38 @@ def area(
         "scene": scene,
         "cloud": meta_data["IMAGE_ATTRIBUTES"]["CLOUD_COVER"],
     }
+
+
+@instrument.handler
+@profiles.profile("landsat")
+def area(
+    scene,
+    bbox,
+    expression,
+    expression_range=[-1, 1],
+    bbox_crs="epsg:4326",
+    out_crs="epsg:3857",
+    img_format="jpeg",
+    output="base64",
+    precision="float32",
+    **options,
+):
+    """
+    Area handler.
+
+    `ndvi` is base64 (default), raw bytes (`output="bytes"`) or written to a
+    file object (`output=<file>`). `options` are encoder options (e.g
+    `quality=85`, see `remotepixel.utils.encode_img`).
+    """
+    result = render_area(
+        scene,
+        bbox,
+        expression,
+        expression_range=expression_range,
+        bbox_crs=bbox_crs,
+        out_crs=out_crs,
+        img_format=img_format,
+        precision=precision,
+        **options,
+    )
+    return dict(result, ndvi=format_img(result["ndvi"], output))
@@ -1,22 +1,29 @@
 """remotepixel.l8_ovr module."""
 
-import re
 from functools import partial
-from concurrent import futures
 
 import numpy as np
-import numexpr as ne
 
-from rio_toa.reflectance import reflectance
-
-from remotepixel.utils import get_overview
+from remotepixel import instrument, profiles
+from remotepixel.cache import cached
+from remotepixel.executors import band_executor
+from remotepixel.expression import compile_expression
+from remotepixel.stats import band_ranges, stats_version
+from remotepixel.stretch import histogram_percentiles
+from remotepixel.utils import (
+    check_encoder_options,
+    encode_img,
+    format_img,
+    get_overview,
+    landsat_get_mtl,
+    landsat_reflectance,
+    result_cache,
+)
 from rio_tiler.utils import (
     landsat_parse_scene_id,
-    landsat_get_mtl,
     linear_rescale,
     array_to_img,
     get_colormap,
-    b64_encode_img,
 )
 
 np.seterr(divide="ignore", invalid="ignore")
@@ -24,28 +31,28 @@ np.seterr(divide="ignore", invalid="ignore")
 LANDSAT_BUCKET = "s3://landsat-pds"
 
 
-def worker(band, landsat_address, meta, ovr_size):
+def worker(band, landsat_address, meta, ovr_size, precision="float32"):
     """Worker."""
     address = f"{landsat_address}_B{band}.TIF"
-    sun_elev = meta["IMAGE_ATTRIBUTES"]["SUN_ELEVATION"]
-    multi_reflect = meta["RADIOMETRIC_RESCALING"][f"REFLECTANCE_MULT_BAND_{band}"]
-    add_reflect = meta["RADIOMETRIC_RESCALING"][f"REFLECTANCE_ADD_BAND_{band}"]
-
     matrix = get_overview(address, ovr_size)
-    return reflectance(matrix, multi_reflect, add_reflect, sun_elev, src_nodata=0)
+    return landsat_reflectance(matrix, band, meta, precision=precision)
 
 
-def create(
+@cached(result_cache, depends=lambda arguments: stats_version(arguments["scene"]))
+def render(
     scene,
     bands=None,
     expression=None,
     expression_range=[-1, 1],
     img_format="jpeg",
     ovrSize=512,
+    precision="float32",
+    **options,
 ):
-    """Handler."""
-    if img_format not in ["png", "jpeg"]:
+    """Render the overview as raw image bytes (`options`: encoder options)."""
+    if img_format not in ["png", "jpeg", "webp"]:
         raise UserWarning(f"Invalid {img_format} extension")
+    check_encoder_options(img_format, options)
 
     if not expression and not bands:
         raise Exception("Expression or Bands must be provided")
@@ -56,46 +63,80 @@ def create(
             raise Exception("RGB combination only")
 
     if expression:
-        bands = tuple(set(re.findall(r"b(?P<bands>[0-9]{1,2})", expression)))
-        rgb = expression.split(",")
-        nb_bands = len(rgb)
+        expr = compile_expression(expression)
+        bands = expr.bands
+        nb_bands = len(expr)
 
     scene_params = landsat_parse_scene_id(scene)
     meta_data = landsat_get_mtl(scene).get("L1_METADATA_FILE")
     landsat_address = f'{LANDSAT_BUCKET}/{scene_params["key"]}'
 
     _worker = partial(
-        worker, landsat_address=landsat_address, meta=meta_data, ovr_size=ovrSize
+        worker,
+        landsat_address=landsat_address,
+        meta=meta_data,
+        ovr_size=ovrSize,
+        precision=precision,
     )
-    with futures.ThreadPoolExecutor(max_workers=3) as executor:
+    with band_executor() as executor:
         data = np.concatenate(list(executor.map(_worker, bands)))
         mask = np.all(data != 0, axis=0).astype(np.uint8) * 255
 
         if expression:
-            ctx = {}
-            for bdx, b in enumerate(bands):
-                ctx["b{}".format(b)] = data[bdx]
-            data = np.array(
-                [
-                    np.nan_to_num(ne.evaluate(bloc.strip(), local_dict=ctx))
-                    for bloc in rgb
-                ]
-            )
-
-        for band in range(data.shape[0]):
-            imgRange = (
-                expression_range
-                if expression
-                else np.percentile(data[band][mask > 0], (2, 98)).tolist()
-            )
-            data[band] = np.where(
-                mask,
-                linear_rescale(data[band], in_range=imgRange, out_range=[0, 255]),
-                0,
-            )
+            data = expr.evaluate(data)
+            ranges = [expression_range] * nb_bands
+        else:
+            ranges = band_ranges(scene, bands) or [
+                histogram_percentiles(data[band], mask, (2, 98))
+                for band in range(nb_bands)
+            ]
+
+        with instrument.stage("rescale"):
+            for band in range(data.shape[0]):
+                data[band] = np.where(
+                    mask,
+                    linear_rescale(
+                        data[band], in_range=ranges[band], out_range=[0, 255]
+                    ),
+                    0,
+                )
 
     data = data.squeeze()
     colormap = None if len(data.shape) >= 3 else get_colormap(name="cfastie")
 
     img = array_to_img(data, mask, colormap)
-    return b64_encode_img(img, img_format)
+    return encode_img(img, img_format, **options)
+
+
+@instrument.handler
+@profiles.profile("landsat")
+def create(
+    scene,
+    bands=None,
+    expression=None,
+    expression_range=[-1, 1],
+    img_format="jpeg",
+    ovrSize=512,
+    output="base64",
+    precision="float32",
+    **options,
+):
+    """
+    Handler.
+
+    Returns the overview as base64 (default), raw bytes (`output="bytes"`) or
+    written to a file object (`output=<file>`). `options` are encoder options
+    (e.g `quality=85`, see `remotepixel.utils.encode_img`). Reflectance, band
+    math and rescaling are computed in `precision` ("float32" or "float64").
+    """
+    content = render(
+        scene,
+        bands=bands,
+        expression=expression,
+        expression_range=expression_range,
+        img_format=img_format,
+        ovrSize=ovrSize,
+        precision=precision,
+        **options,
+    )
+    return format_img(content, output)
@@ -0,0 +1,122 @@
+"""remotepixel.l8_tile module."""
+
+from functools import partial
+
+import numpy as np
+
+from remotepixel import instrument, profiles
+from remotepixel.executors import band_executor
+from remotepixel.expression import compile_expression
+from remotepixel.stats import band_ranges
+from remotepixel.utils import (
+    check_encoder_options,
+    encode_img,
+    get_tile,
+    landsat_get_mtl,
+    landsat_reflectance,
+    tile_exists,
+)
+from rio_tiler.utils import (
+    landsat_parse_scene_id,
+    linear_rescale,
+    array_to_img,
+    get_colormap,
+)
+
+np.seterr(divide="ignore", invalid="ignore")
+
+LANDSAT_BUCKET = "s3://landsat-pds"
+BANDS_RANGE = [0, 3000]
+
+
+def worker(band, landsat_address, meta, z, x, y, tilesize, precision="float32"):
+    """Worker."""
+    address = f"{landsat_address}_B{band}.TIF"
+    matrix = get_tile(address, z, x, y, tilesize=tilesize)
+    return landsat_reflectance(matrix, band, meta, precision=precision)
+
+
+@instrument.handler
+@profiles.profile("landsat")
+def tile(
+    scene,
+    z,
+    x,
+    y,
+    bands=None,
+    expression=None,
+    expression_range=[-1, 1],
+    bands_range=None,
+    tilesize=256,
+    img_format="png",
+    precision="float32",
+    **options,
+):
+    """
+    Tile handler.
+
+    Read the web mercator tile `z/x/y` (one windowed read per band) and return
+    raw PNG, JPEG or WebP bytes. Band combinations are TOA reflectance * 10000
+    rescaled from `bands_range`, or else from the scene statistics sidecar
+    (see `remotepixel.stats`) or `BANDS_RANGE`, so neighbouring tiles match.
+    `options` are encoder options (e.g `quality=85`, see
+    `remotepixel.utils.encode_img`). Reflectance, band math and rescaling are
+    computed in `precision` ("float32" or "float64").
+    """
+    if img_format not in ["png", "jpeg", "webp"]:
+        raise UserWarning(f"Invalid {img_format} extension")
+    check_encoder_options(img_format, options)
+
+    if not expression and not bands:
+        raise Exception("Expression or Bands must be provided")
+
+    if bands:
+        if len(bands) != 3:
+            raise Exception("RGB combination only")
+
+    if expression:
+        expr = compile_expression(expression)
+        bands = expr.bands
+
+    scene_params = landsat_parse_scene_id(scene)
+    landsat_address = f'{LANDSAT_BUCKET}/{scene_params["key"]}'
+    if not tile_exists(f"{landsat_address}_BQA.TIF", z, x, y):
+        raise Exception(f"Tile {z}/{x}/{y} is outside image bounds")
+
+    meta_data = landsat_get_mtl(scene).get("L1_METADATA_FILE")
+
+    _worker = partial(
+        worker,
+        landsat_address=landsat_address,
+        meta=meta_data,
+        z=z,
+        x=x,
+        y=y,
+        tilesize=tilesize,
+        precision=precision,
+    )
+    with band_executor() as executor:
+        data = np.concatenate(list(executor.map(_worker, bands)))
+    mask = np.all(data != 0, axis=0).astype(np.uint8) * 255
+
+    if expression:
+        data = expr.evaluate(data)
+        ranges = [expression_range] * len(expr)
+    else:
+        data = data * 10000
+        ranges = None if bands_range else band_ranges(scene, bands, scale=10000)
+        ranges = ranges or [bands_range or BANDS_RANGE] * len(bands)
+
+    with instrument.stage("rescale"):
+        data = np.stack(
+            [
+                np.where(mask, linear_rescale(arr, in_range=rng, out_range=[0, 255]), 0)
+                for arr, rng in zip(data, ranges)
+            ]
+        ).astype(np.uint8)
+
+    data = data.squeeze()
+    colormap = None if len(data.shape) >= 3 else get_colormap(name="cfastie")
+
+    img = array_to_img(data, mask, colormap)
+    return encode_img(img, img_format, **options)
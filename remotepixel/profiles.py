@@ -0,0 +1,104 @@
+"""
+remotepixel.profiles module.
+
+GDAL runtime profiles: named `rasterio.Env` presets tuned for each sensor.
+
+Entry points apply their sensor preset (see `profile`), options can be
+changed per call with `gdal_options={...}` (a None value removes a preset
+option). Options set outside the main thread are local to that thread, calls
+submitted to the band-read thread pools carry them with `bind`. Set from the
+main thread, GDAL configuration is process-wide: presets only hold
+performance options, credentials and requester-pays settings stay in the
+environment. Presets share the values of the `COMMON` options, except for
+`PER_DATASET` options which GDAL reads when a dataset is opened, so a
+concurrent handler with another preset can't change them under a read (pooled
+dataset handles are not shared between different values).
+"""
+
+import functools
+
+import rasterio
+
+MB = 1024 * 1024
+
+# Options for remote reads through /vsicurl/ and /vsis3/
+COMMON = {
+    # Do not list the "directory" of a file on open (no sidecar files on S3)
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    # Fetch adjacent byte ranges in one request
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    # Share HTTP/2 connections between parallel range requests
+    "GDAL_HTTP_VERSION": "2",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "VSI_CACHE": "TRUE",
+    "VSI_CACHE_SIZE": 5 * MB,
+}
+
+# Options read when a dataset is opened, sensors may override them
+PER_DATASET = {"VSI_CACHE_SIZE", "GDAL_INGESTED_BYTES_AT_OPEN", "GDAL_NUM_THREADS"}
+
+PROFILES = {
+    "default": dict(COMMON),
+    # COGs: header and IFDs (overviews included) come with the first request
+    "landsat": dict(COMMON, GDAL_INGESTED_BYTES_AT_OPEN=32768),
+    "cbers": dict(COMMON, GDAL_INGESTED_BYTES_AT_OPEN=32768),
+    # JPEG2000: codestream reads jump around (a larger per-file cache keeps
+    # the packets of all resolution levels) and decoding is CPU bound
+    "sentinel2": dict(COMMON, VSI_CACHE_SIZE=25 * MB, GDAL_NUM_THREADS="ALL_CPUS"),
+    # Tiles are decoded in memory, no remote reads
+    "srtm": {"GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR"},
+}
+
+
+def get_profile(name, gdal_options=None):
+    """Return the GDAL options of profile `name`, updated with `gdal_options`."""
+    if name not in PROFILES:
+        raise ValueError(f"Invalid profile: {name}")
+
+    options = dict(PROFILES[name], **(gdal_options or {}))
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def env(name, gdal_options=None):
+    """Return a `rasterio.Env` applying profile `name`."""
+    return rasterio.Env(**get_profile(name, gdal_options))
+
+
+def bind(func, options=None):
+    """
+    Return `func` running with `options` or the GDAL options of the calling thread.
+
+    `rasterio.Env` options set outside the main thread are local to that
+    thread; calls submitted to a thread pool must carry them.
+    """
+    if options is None:
+        if not rasterio.env.hasenv():
+            return func
+        options = rasterio.env.getenv()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with rasterio.Env(**options):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def profile(name):
+    """
+    Run a handler within the `name` profile.
+
+    The decorated handler accepts a `gdal_options` keyword (dict) overriding
+    options of the profile for that call.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, gdal_options=None, **kwargs):
+            with env(name, gdal_options):
+                return func(*args, **kwargs)
+
+        wrapper.profile = name
+        return wrapper
+
+    return decorator
@@ -0,0 +1,21 @@
+"""remotepixel.sensors module."""
+
+import importlib
+
+SENSORS = [("CBERS", "cbers"), ("S2", "s2"), ("LC", "l8")]
+
+
+def get_handler(scene, name):
+    """Return the `name` handler module (e.g "ovr", "full") matching a scene id."""
+    for prefix, sensor in SENSORS:
+        if scene.startswith(prefix):
+            try:
+                return importlib.import_module(f"remotepixel.{sensor}_{name}")
+            except ImportError:
+                raise ValueError(f"No {name} handler for {scene}")
+    raise ValueError(f"Could not match {scene} to a sensor")
+
+
+def get_sensor(scene):
+    """Return the point module (`scene_sources`, `point`) matching a scene id."""
+    return get_handler(scene, "ndvi")
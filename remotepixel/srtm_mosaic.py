@@ -1,50 +1,220 @@
 """remotepixel.srtm_mosaic module."""
 
+import os
+import math
 import zlib
-import contextlib
-from concurrent import futures
 
 import numpy as np
 
-import rasterio
-from rasterio.merge import merge
 from rasterio.io import MemoryFile
+from rasterio.transform import Affine
 
-from remotepixel import aws
+from remotepixel import aws, instrument, profiles
+from remotepixel.cache import LRUCache
+from remotepixel.utils import merge_arrays
 
 SRTM_BUCKET = "elevation-tiles-prod"
+SRTM_NODATA = -32767
+HGT_VOID = -32768
+EARTH_RADIUS = 6371008.8
 
+# Decoded tiles (one arc-second tiles are ~26MB each)
+tile_cache = LRUCache(
+    maxsize=int(os.environ.get("REMOTEPIXEL_SRTM_CACHE_SIZE", 64)),
+    maxbytes=int(os.environ.get("REMOTEPIXEL_SRTM_CACHE_BYTES", 256 * 1024 * 1024)),
+)
 
-def worker(tile):
-    """Worker."""
-    try:
-        outpath = f"/tmp/{tile}.hgt"
-        key = f"skadi/{tile[0:3]}/{tile}.hgt.gz"
-        with open(outpath, "wb") as f:
-            f.write(
-                zlib.decompress(aws.get_object(SRTM_BUCKET, key), zlib.MAX_WBITS | 16)
+
+def _tile_key(tile):
+    """Return skadi tile S3 key."""
+    return f"skadi/{tile[0:3]}/{tile}.hgt.gz"
+
+
+def tile_transform(tile, size):
+    """Return the geotransform of a skadi tile (e.g "N42W075") of `size` pixels."""
+    lat = int(tile[1:3]) * (1 if tile[0] == "N" else -1)
+    lon = int(tile[4:7]) * (1 if tile[3] == "E" else -1)
+    # HGT pixels are centered on the tile edges
+    res = 1 / (size - 1)
+    return Affine(res, 0, lon - res / 2, 0, -res, lat + 1 + res / 2)
+
+
+def decode_tile(chunks):
+    """
+    Decode a gzipped HGT tile.
+
+    `chunks` is an iterable of compressed bytes, decompressed as they come.
+    Returns a read-only (size, size) int16 array, voids set to `SRTM_NODATA`.
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += decompressor.decompress(chunk)
+    buffer += decompressor.flush()
+
+    size = int(round(math.sqrt(len(buffer) // 2)))
+    if size < 2 or size * size * 2 != len(buffer):
+        raise ValueError(f"Invalid HGT tile size: {len(buffer)} bytes")
+
+    data = np.frombuffer(buffer, dtype=">i2").reshape(size, size).astype(np.int16)
+    data[data == HGT_VOID] = SRTM_NODATA
+    data.setflags(write=False)
+    return data
+
+
+def get_tiles(tiles):
+    """
+    Return {tile: decoded array} for the tiles that can be fetched.
+
+    Tiles missing from `tile_cache` are streamed and decoded concurrently.
+    """
+    results = {tile: tile_cache.get(tile) for tile in dict.fromkeys(tiles)}
+    keys = {_tile_key(tile): tile for tile, data in results.items() if data is None}
+    objects, _ = aws.get_objects(SRTM_BUCKET, keys, max_workers=8, decode=decode_tile)
+    for key, data in objects.items():
+        tile_cache.set(keys[key], data)
+        results[keys[key]] = data
+
+    return {tile: data for tile, data in results.items() if data is not None}
+
+
+def tile_name(lon, lat):
+    """Return the skadi tile (e.g "N42W075") covering a coordinate."""
+    lat, lon = math.floor(lat), min(math.floor(lon), 179)
+    return "{}{:02d}{}{:03d}".format(
+        "N" if lat >= 0 else "S", abs(lat), "E" if lon >= 0 else "W", abs(lon)
+    )
+
+
+def sample_tile(data, tile, lon, lat, interpolate=False):
+    """
+    Sample a decoded tile at arrays of coordinates (inside the tile).
+
+    Returns float64 values, NaN for voids. With `interpolate`, values are
+    bilinearly interpolated from the valid pixels around each point.
+    """
+    size = data.shape[0]
+    col, row = ~tile_transform(tile, size) * (lon, lat)
+    # Pixel centers are at .5 offsets
+    col, row = np.clip(col - 0.5, 0, size - 1), np.clip(row - 0.5, 0, size - 1)
+    if not interpolate:
+        values = data[np.rint(row).astype(int), np.rint(col).astype(int)]
+        return np.where(values == SRTM_NODATA, np.nan, values.astype(np.float64))
+
+    row0 = np.minimum(np.floor(row).astype(int), size - 2)
+    col0 = np.minimum(np.floor(col).astype(int), size - 2)
+    dr, dc = row - row0, col - col0
+
+    total = np.zeros(lon.shape, dtype=np.float64)
+    weights = np.zeros(lon.shape, dtype=np.float64)
+    for i, j, weight in [
+        (0, 0, (1 - dr) * (1 - dc)),
+        (0, 1, (1 - dr) * dc),
+        (1, 0, dr * (1 - dc)),
+        (1, 1, dr * dc),
+    ]:
+        values = data[row0 + i, col0 + j]
+        weight = np.where(values == SRTM_NODATA, 0, weight)
+        total += weight * values
+        weights += weight
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weights > 0, total / weights, np.nan)
+
+
+def sample(lon, lat, interpolate=False):
+    """Return elevations at arrays of coordinates, NaN where there is no data."""
+    values = np.full(lon.shape, np.nan)
+    if not lon.size:
+        return values
+
+    corners = np.column_stack([np.floor(lon), np.floor(lat)])
+    corners, groups = np.unique(corners, axis=0, return_inverse=True)
+    names = [tile_name(x, y) for x, y in corners]
+    tiles = get_tiles(names)
+
+    for group, tile in enumerate(names):
+        if tile in tiles:
+            idx = np.flatnonzero(groups.ravel() == group)
+            values[idx] = sample_tile(
+                tiles[tile], tile, lon[idx], lat[idx], interpolate
             )
-        return outpath
-    except:
-        return ""
+    return values
+
+
+@instrument.handler
+@profiles.profile("srtm")
+def elevation(coordinates, interpolate=False):
+    """
+    Elevation handler.
+
+    `coordinates` is a single [lon, lat] pair or a sequence of N pairs; for N
+    pairs, returns a numpy array of N values. Elevations are in meters, NaN
+    for voids and points without tile. Only the covering tiles are fetched.
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    single = coordinates.ndim == 1
+    lon, lat = coordinates.reshape(-1, 2).T
 
+    values = sample(lon, lat, interpolate)
+    return values[0] if single else values
 
+
+def haversine(lon, lat):
+    """Return the distances (in meters) between consecutive coordinates."""
+    lon, lat = np.radians(lon), np.radians(lat)
+    a = (
+        np.sin(np.diff(lat) / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+@instrument.handler
+@profiles.profile("srtm")
+def profile(linestring, n_samples=100, interpolate=False):
+    """
+    Line profile handler.
+
+    `linestring` is a sequence of [lon, lat] vertices (or a GeoJSON
+    LineString). Returns `n_samples` points evenly spaced along the line:
+    `coordinates` (N, 2), `distance` from the start (meters) and `elevation`.
+    """
+    if isinstance(linestring, dict):
+        linestring = linestring["coordinates"]
+    vertices = np.asarray(linestring, dtype=np.float64)
+    if vertices.ndim != 2 or vertices.shape[0] < 2:
+        raise ValueError("Linestring must have at least 2 vertices")
+    if n_samples < 2:
+        raise ValueError("n_samples must be at least 2")
+
+    along = np.concatenate([[0], np.cumsum(haversine(*vertices.T))])
+    distance = np.linspace(0, along[-1], n_samples)
+    lon = np.interp(distance, along, vertices[:, 0])
+    lat = np.interp(distance, along, vertices[:, 1])
+
+    return dict(
+        coordinates=np.column_stack([lon, lat]),
+        distance=distance,
+        elevation=sample(lon, lat, interpolate),
+    )
+
+
+@instrument.handler
+@profiles.profile("srtm")
 def create(tiles):
     """Handler."""
-    with futures.ThreadPoolExecutor(max_workers=8) as executor:
-        responses = executor.map(worker, tiles)
-
-    with contextlib.ExitStack() as stack:
-        sources = [
-            stack.enter_context(rasterio.open(tile)) for tile in responses if tile
-        ]
-        dest, output_transform = merge(sources, nodata=-32767)
+    arrays = [
+        (data[np.newaxis], tile_transform(tile, data.shape[0]))
+        for tile, data in get_tiles(tiles).items()
+    ]
+    dest, output_transform = merge_arrays(arrays, "epsg:4326", nodata=SRTM_NODATA)
 
     meta = {
         "driver": "GTiff",
         "count": 1,
         "dtype": np.int16,
-        "nodata": -32767,
+        "nodata": SRTM_NODATA,
         "height": dest.shape[1],
         "width": dest.shape[2],
         "compress": "DEFLATE",
@@ -0,0 +1,153 @@
+"""remotepixel.stats module."""
+
+import os
+import json
+import tempfile
+from functools import partial
+
+import numpy as np
+
+from remotepixel import instrument, profiles
+from remotepixel.datasets import open_dataset
+from remotepixel.executors import band_executor
+from remotepixel.sensors import get_sensor
+from remotepixel.stretch import histogram_percentiles
+from remotepixel.cache import LRUCache
+
+np.seterr(divide="ignore", invalid="ignore")
+
+STATS_DIR = os.environ.get("REMOTEPIXEL_STATS_DIR")
+PERCENTILES = (2, 98)
+
+# Loaded statistics, apart from the scene metadata as every cached overview
+# render looks them up
+stats_cache = LRUCache(
+    maxsize=int(os.environ.get("REMOTEPIXEL_STATS_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("REMOTEPIXEL_METADATA_CACHE_TTL", 86400)),
+)
+
+
+def band_stats(address, convert=None, percentiles=PERCENTILES, bins=64):
+    """
+    Compute band statistics from the lowest resolution overview.
+
+    `convert(values)` is applied to valid values first (e.g TOA reflectance).
+    Returns min, max, percentile values (`pc`) and a `bins` histogram.
+    """
+    with open_dataset(address) as src:
+        levels = src.overviews(1)
+
+    options = {"overview_level": len(levels) - 1} if levels else {}
+    with open_dataset(address, **options) as src:
+        data = src.read(indexes=1)
+
+    mask = data != 0
+    if not mask.any():
+        raise Exception("No valid data in array")
+
+    if convert is not None:
+        data = convert(data)
+
+    values = data[mask]
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "pc": histogram_percentiles(data, mask, percentiles),
+        "histogram": [counts.tolist(), edges.tolist()],
+    }
+
+
+def sidecar_path(scene, directory=None):
+    """Return the sidecar file path of a scene."""
+    return os.path.join(directory or STATS_DIR, f"{scene}_stats.json")
+
+
+def save(scene, stats, directory=None):
+    """Store scene statistics in memory and as a JSON sidecar (if a directory is set)."""
+    stats_cache.set(scene, stats)
+
+    directory = directory or STATS_DIR
+    if not directory:
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(stats, f, separators=(",", ":"))
+    os.replace(tmp, sidecar_path(scene, directory))
+
+
+def load(scene, directory=None):
+    """Return scene statistics from memory or its sidecar (None if missing)."""
+    stats = stats_cache.get(scene)
+    if stats is not None:
+        return stats
+
+    directory = directory or STATS_DIR
+    if not directory or not os.path.exists(sidecar_path(scene, directory)):
+        return None
+
+    with open(sidecar_path(scene, directory), "r") as f:
+        stats = json.load(f)
+    stats_cache.set(scene, stats)
+    return stats
+
+
+def stats_version(scene, directory=None):
+    """
+    Return the percentiles of each band in the scene statistics (None if missing).
+
+    Used in the result cache keys of renders rescaled with the statistics, so
+    they are rendered again once statistics are created or updated.
+    """
+    stats = load(scene, directory=directory)
+    if stats is None:
+        return None
+    return {band: values["pc"] for band, values in stats["bands"].items()}
+
+
+def band_ranges(scene, bands, scale=1, directory=None):
+    """
+    Return the percentile range of each band from the scene statistics.
+
+    Returns None unless statistics exist for all `bands`.
+    """
+    stats = load(scene, directory=directory)
+    if stats is None:
+        return None
+
+    try:
+        ranges = [stats["bands"][str(band)]["pc"] for band in bands]
+    except KeyError:
+        return None
+    return [[value * scale for value in pc] for pc in ranges]
+
+
+@instrument.handler
+@profiles.profile("default")
+def create(scene, bands, percentiles=PERCENTILES, directory=None):
+    """
+    Stats handler.
+
+    Compute statistics of `bands` once per scene (Landsat-8 values are TOA
+    reflectance) and store them, merged with existing ones, as the scene
+    sidecar. The overview and tile handlers then only need a linear rescale.
+    """
+    expression = ",".join(f"b{band}" for band in bands)
+    bands, addresses, convert, _ = get_sensor(scene).scene_sources(scene, expression)
+
+    def worker(band, address):
+        """Worker."""
+        return band_stats(address, partial(convert, band), percentiles=percentiles)
+
+    with band_executor() as executor:
+        results = list(executor.map(worker, bands, addresses))
+
+    stats = load(scene, directory=directory)
+    if stats is None or stats["percentiles"] != list(percentiles):
+        stats = {"scene": scene, "percentiles": list(percentiles), "bands": {}}
+    stats = dict(stats, bands=dict(stats["bands"], **dict(zip(bands, results))))
+
+    save(scene, stats, directory=directory)
+    return stats
@@ -0,0 +1,76 @@
+"""remotepixel.stretch module."""
+
+import numpy as np
+
+# Integer data spanning fewer values gets one histogram bin per value
+MAX_INTEGER_BINS = 65536
+BLOCK_SIZE = 65536
+
+
+def histogram_percentiles(data, mask=None, percentiles=(2, 98), bins=4096):
+    """
+    Approximate percentiles of `data` (where `mask` is set) from a histogram.
+
+    Drop-in for `np.percentile(data[mask > 0], percentiles)` without the masked
+    copy and the sort: values are counted in one pass, block by block. Integer
+    data uses one bin per value; other data uses `bins` equal bins between the
+    data minimum and maximum, with linear interpolation inside a bin.
+
+    Attributes
+    ----------
+    data : numpy.ndarray
+        Band values.
+    mask : numpy.ndarray, optional
+        Valid pixels (non-zero), same shape as `data`.
+    percentiles : sequence, optional
+        Percentiles to compute, between 0 and 100 (default: (2, 98)).
+    bins : int, optional
+        Number of bins for non-integer data (default: 4096).
+
+    Returns
+    -------
+    list
+        One value per percentile (NaN when no pixel is valid).
+
+    """
+    data = np.asarray(data)
+    if not data.size:
+        return [np.nan] * len(percentiles)
+
+    vmin, vmax = float(data.min()), float(data.max())
+    integer = data.dtype.kind in "biu" and vmax - vmin < MAX_INTEGER_BINS
+    if integer:
+        bins = int(vmax - vmin) + 1
+    else:
+        hist_range = (vmin, vmax) if vmax > vmin else (vmin, vmin + 1)
+        scale = bins / (hist_range[1] - hist_range[0])
+
+    # Count by block: only one block of valid values is copied at a time
+    values = data.ravel()
+    valid = None if mask is None else np.asarray(mask).ravel()
+    counts = np.zeros(bins, dtype=np.int64)
+    for start in range(0, values.size, BLOCK_SIZE):
+        block = values[start : start + BLOCK_SIZE]
+        if valid is not None:
+            block = block[valid[start : start + BLOCK_SIZE] != 0]
+        if integer:
+            index = block.astype(np.int64) - int(vmin)
+        else:
+            index = ((block - hist_range[0]) * scale).astype(np.int64)
+            np.minimum(index, bins - 1, out=index)
+        counts += np.bincount(index, minlength=bins)
+
+    cdf = np.cumsum(counts, dtype=np.float64)
+    if not cdf[-1]:
+        return [np.nan] * len(percentiles)
+
+    targets = np.asarray(percentiles, dtype=np.float64) / 100.0 * cdf[-1]
+    idx = np.minimum(np.searchsorted(cdf, targets, side="left"), len(counts) - 1)
+    if integer:
+        return (vmin + idx).tolist()
+
+    edges = np.linspace(hist_range[0], hist_range[1], bins + 1)
+    before = np.where(idx > 0, cdf[idx - 1], 0)
+    frac = np.clip((targets - before) / np.maximum(counts[idx], 1e-12), 0, 1)
+    result = edges[idx] + frac * (edges[idx + 1] - edges[idx])
+    return np.clip(result, vmin, vmax).tolist()
@@ -0,0 +1,152 @@
+"""remotepixel.timeseries module."""
+
+import threading
+from concurrent import futures
+
+import numpy as np
+
+from rasterio import warp
+
+from remotepixel import profiles
+from remotepixel.datasets import open_dataset
+from remotepixel.expression import BAND_PATTERN, compile_expression
+from remotepixel.sensors import get_sensor
+from remotepixel.utils import sample_points
+
+np.seterr(divide="ignore", invalid="ignore")
+
+
+def _projector(coordinates):
+    """Return a function reprojecting `coordinates`, memoized by CRS."""
+    projected = {}
+    lock = threading.Lock()
+
+    def project(crs):
+        key = crs.to_string()
+        with lock:
+            if key not in projected:
+                xs, ys = warp.transform(
+                    "EPSG:4326", crs, [coordinates[0]], [coordinates[1]]
+                )
+                projected[key] = (xs[0], ys[0])
+            return projected[key]
+
+    return project
+
+
+def _sample(address, project):
+    """Read pixel value."""
+    with open_dataset(address) as src:
+        x, y = project(src.crs)
+        return sample_points(src, [x], [y])
+
+
+def _evaluate(task):
+    """Apply the expression on the sampled values."""
+    data = [
+        task["convert"](b, task["values"][bdx]) for bdx, b in enumerate(task["bands"])
+    ]
+    return float(task["expr"].evaluate(data)[0][0])
+
+
+def _sources(scene, expression):
+    """Get scene metadata and band addresses."""
+    sensor = get_sensor(scene)
+    bands, addresses, convert, info = sensor.scene_sources(scene, expression)
+    if not bands:
+        raise ValueError("No band found in expression")
+
+    return dict(
+        expr=compile_expression(
+            expression, band_pattern=getattr(sensor, "BAND_PATTERN", BAND_PATTERN)
+        ),
+        bands=bands,
+        addresses=addresses,
+        convert=convert,
+        info=info,
+        values=[None] * len(bands),
+        remaining=len(bands),
+    )
+
+
+def timeseries(scenes, coordinates, expression, max_workers=10, gdal_options=None):
+    """
+    Time series point handler.
+
+    Sample one coordinate across many scenes (Landsat-8, Sentinel-2 or CBERS)
+    through a single bounded thread pool. The coordinate is reprojected once per
+    CRS and results are yielded as soon as each scene completes, in completion
+    order. A scene that fails yields `{"scene": scene, "error": message}`
+    instead of stopping the series.
+
+    Attributes
+    ----------
+    scenes : list
+        Scene ids.
+    coordinates : list
+        [lon, lat] in EPSG:4326.
+    expression : str
+        Band math expression (e.g "(b5 - b4) / (b5 + b4)").
+    max_workers : int, optional
+        Maximum number of concurrent requests (default: 10).
+    gdal_options : dict, optional
+        GDAL options overriding the "default" profile (see
+        `remotepixel.profiles`).
+
+    Returns
+    -------
+    generator of dict
+        Same output as the sensor `point` handlers.
+
+    """
+    # The profile only applies to the pool threads: an Env held across `yield`
+    # would leak into the caller code between results
+    options = profiles.get_profile("default", gdal_options)
+    yield from _timeseries(scenes, coordinates, expression, max_workers, options)
+
+
+def _timeseries(scenes, coordinates, expression, max_workers, options):
+    """Yield the point results of each scene, in completion order."""
+    scenes = list(scenes)
+    project = _projector(coordinates)
+
+    sources = profiles.bind(_sources, options)
+    sample = profiles.bind(_sample, options)
+
+    executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+    pending = {
+        executor.submit(sources, scene, expression): (sdx, None)
+        for sdx, scene in enumerate(scenes)
+    }
+    tasks = {}
+    try:
+        while pending:
+            done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                sdx, band_idx = pending.pop(future)
+                try:
+                    if band_idx is None:
+                        task = tasks[sdx] = future.result()
+                        for idx, address in enumerate(task["addresses"]):
+                            read = executor.submit(sample, address, project)
+                            pending[read] = (sdx, idx)
+                        continue
+
+                    task = tasks.get(sdx)
+                    if task is None:
+                        # Another band of this scene already failed
+                        continue
+
+                    task["values"][band_idx] = future.result()
+                    task["remaining"] -= 1
+                    if not task["remaining"]:
+                        del tasks[sdx]
+                        yield dict(ndvi=_evaluate(task), **task["info"])
+
+                except Exception as err:
+                    tasks.pop(sdx, None)
+                    yield {"scene": scenes[sdx], "error": str(err)}
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,182 @@
+"""
+remotepixel.transcode module.
+
+Opt-in local cache of JPEG2000 bands transcoded to tiled GeoTIFFs.
+
+Decoding JPEG2000 is the slowest part of Sentinel-2 reads and is repeated
+for every request on the same band. With `REMOTEPIXEL_TRANSCODE_DIR` set,
+the first `get_overview` / `get_area` call on a band copies it to a tiled,
+compressed GeoTIFF with overviews in that directory; later calls read the
+local file. Files are evicted in least recently used order once they take
+more than `REMOTEPIXEL_TRANSCODE_BYTES`.
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+
+import rasterio
+import rasterio.shutil
+from rasterio.enums import Resampling
+
+from remotepixel import instrument
+from remotepixel.cache import DiskCache
+from remotepixel.datasets import pool
+
+BLOCK_SIZE = 512
+
+
+def overview_factors(width, height, min_size=BLOCK_SIZE // 2):
+    """Return decimation factors down to `min_size` pixels."""
+    factors = []
+    factor = 2
+    while max(width, height) / factor >= min_size:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+
+def transcode(address, path, compress="DEFLATE"):
+    """Copy the first band of `address` to a tiled GeoTIFF with overviews."""
+    with rasterio.open(address) as src:
+        predictor = 3 if src.dtypes[0].startswith("float") else 2
+        rasterio.shutil.copy(
+            src,
+            path,
+            driver="GTiff",
+            TILED="YES",
+            BLOCKXSIZE=BLOCK_SIZE,
+            BLOCKYSIZE=BLOCK_SIZE,
+            COMPRESS=compress,
+            PREDICTOR=predictor,
+            NUM_THREADS="ALL_CPUS",
+            BIGTIFF="IF_SAFER",
+        )
+
+    with rasterio.open(path, "r+") as dst:
+        factors = overview_factors(dst.width, dst.height)
+        if factors:
+            dst.build_overviews(factors, Resampling.average)
+
+
+class TranscodeCache(DiskCache):
+    """
+    Thread-safe, bounded directory of transcoded bands.
+
+    `get` returns the local GeoTIFF for an address, transcoding it on first
+    access (once, concurrent calls for the same address wait for it), or the
+    address itself if the GeoTIFF alone is over the budget.
+
+    Attributes
+    ----------
+    directory : str
+        Cache directory (created if needed).
+    maxbytes : int
+        Maximum size of all files.
+    compress : str
+        GeoTIFF codec (e.g DEFLATE, ZSTD if supported by GDAL).
+    stale_after : int
+        Age in seconds after which leftover temporary files (from a killed
+        process) are removed on creation.
+
+    """
+
+    suffix = ".tif"
+
+    def __init__(
+        self, directory, maxbytes=10 * 1024 ** 3, compress="DEFLATE", stale_after=3600
+    ):
+        """Create cache, index existing files and remove stale temporary files."""
+        super().__init__(directory, maxbytes=maxbytes)
+        self.compress = compress
+        self._pending = {}
+        self._oversized = set()
+        self._remove_stale(stale_after)
+
+    def _remove_stale(self, age):
+        # Recent files may still be written by another process
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) >= age:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _remove(self, key):
+        # Open handles would keep the disk space of the evicted file
+        pool.discard(self._path(key))
+        super()._remove(key)
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._files and os.path.exists(self._path(key)):
+                self._files.move_to_end(key)
+                self.hits += 1
+                return self._path(key)
+        return None
+
+    def get(self, address):
+        """Return the path of the transcoded `address` (or `address` if over the budget)."""
+        key = hashlib.sha1(address.encode()).hexdigest()
+        if key in self._oversized:
+            return address
+        path = self._lookup(key)
+        if path:
+            return path
+
+        with self._lock:
+            lock = self._pending.setdefault(key, threading.Lock())
+        with lock:
+            # Transcoded by another thread while waiting
+            path = self._lookup(key)
+            if path:
+                return path
+            if key in self._oversized:
+                return address
+
+            with self._lock:
+                self.misses += 1
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            try:
+                with instrument.stage("transcode", dataset=address) as stage:
+                    transcode(address, tmp, compress=self.compress)
+                    stage.set(bytes=os.path.getsize(tmp))
+                if not self._add(key, tmp):
+                    with self._lock:
+                        self._oversized.add(key)
+                    return address
+            except Exception:
+                os.remove(tmp)
+                raise
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+        return self._path(key)
+
+
+TRANSCODE_DIR = os.environ.get("REMOTEPIXEL_TRANSCODE_DIR")
+
+cache = (
+    TranscodeCache(
+        TRANSCODE_DIR,
+        maxbytes=int(os.environ.get("REMOTEPIXEL_TRANSCODE_BYTES", 10 * 1024 ** 3)),
+        compress=os.environ.get("REMOTEPIXEL_TRANSCODE_COMPRESS", "DEFLATE"),
+    )
+    if TRANSCODE_DIR
+    else None
+)
+
+
+def local_address(address):
+    """Return the transcoded path of a JPEG2000 `address` (cache enabled)."""
+    if cache is None or not address.endswith(".jp2"):
+        return address
+    return cache.get(address)
@@ -1,21 +1,93 @@
 """remotepixel utils."""
 
+import os
 import re
+import math
 import json
+import base64
+from io import BytesIO
 
-import rasterio
+import numpy as np
+import mercantile
+
+from rasterio import windows
 from rasterio.vrt import WarpedVRT
 from rasterio.enums import Resampling
-from rasterio.warp import transform_bounds
+from rasterio.errors import RasterioIOError
+from rasterio.transform import Affine, array_bounds, from_bounds, rowcol
+from rasterio.warp import reproject, transform_bounds
 
-from remotepixel import aws
+from remotepixel import aws, instrument, transcode
+from remotepixel.cache import LRUCache, ResultCache
+from remotepixel.datasets import open_dataset
+from rio_tiler import utils as rt_utils
 from rio_tiler.utils import get_vrt_transform
 
+metadata_cache = LRUCache(
+    maxsize=int(os.environ.get("REMOTEPIXEL_METADATA_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("REMOTEPIXEL_METADATA_CACHE_TTL", 86400)),
+)
+
+# Dataset footprints (EPSG:4326 bounds), kept apart from the scene metadata
+footprint_cache = LRUCache(
+    maxsize=int(os.environ.get("REMOTEPIXEL_FOOTPRINT_CACHE_SIZE", 1024))
+)
+
+result_cache = ResultCache(
+    maxsize=int(os.environ.get("REMOTEPIXEL_RESULT_CACHE_SIZE", 128)),
+    maxbytes=int(os.environ.get("REMOTEPIXEL_RESULT_CACHE_BYTES", 64 * 1024 * 1024)),
+    directory=os.environ.get("REMOTEPIXEL_RESULT_CACHE_DIR"),
+    disk_maxbytes=int(
+        os.environ.get("REMOTEPIXEL_RESULT_CACHE_DISK_BYTES", 1024 * 1024 * 1024)
+    ),
+)
+
+
+def _read_local(read, address, *args, **kwargs):
+    """
+    Run `read` on the transcoded `address` (see `remotepixel.transcode`).
+
+    Falls back to `address` if the local file was evicted in the meantime.
+    """
+    local = transcode.local_address(address)
+    if local != address:
+        try:
+            return read(local, *args, **kwargs)
+        except RasterioIOError:
+            if os.path.exists(local):
+                raise
+    return read(address, *args, **kwargs)
+
 
 def get_area(
-    address, bbox, max_img_size=512, bbox_crs="epsg:4326", out_crs="epsg:3857", nodata=0
+    address,
+    bbox,
+    max_img_size=512,
+    bbox_crs="epsg:4326",
+    out_crs="epsg:3857",
+    nodata=0,
+    out_size=None,
 ):
-    """Read image part."""
+    """
+    Read image part.
+
+    With `out_size`, `bbox` is read on an exact `out_size` x `out_size` grid
+    (e.g a map tile) instead of at the dataset resolution. JPEG2000 bands are
+    read from the transcoding cache when enabled (see `remotepixel.transcode`).
+    """
+    return _read_local(
+        _get_area,
+        address,
+        bbox,
+        max_img_size=max_img_size,
+        bbox_crs=bbox_crs,
+        out_crs=out_crs,
+        nodata=nodata,
+        out_size=out_size,
+    )
+
+
+def _get_area(address, bbox, max_img_size, bbox_crs, out_crs, nodata, out_size):
     bounds = transform_bounds(bbox_crs, out_crs, *bbox, densify_pts=21)
 
     vrt_params = dict(add_alpha=True, crs=out_crs, resampling=Resampling.bilinear)
@@ -30,32 +102,334 @@ def get_area(
             )
         )
 
-    with rasterio.open(address) as src:
-        vrt_transform, vrt_width, vrt_height = get_vrt_transform(src, bounds)
+    with open_dataset(address) as src:
+        if out_size:
+            vrt_width = vrt_height = out_size
+            vrt_transform = from_bounds(*bounds, vrt_width, vrt_height)
+        else:
+            vrt_transform, vrt_width, vrt_height = get_vrt_transform(src, bounds)
+            vrt_width = round(vrt_width) if vrt_width < max_img_size else max_img_size
+            vrt_height = (
+                round(vrt_height) if vrt_height < max_img_size else max_img_size
+            )
 
-        vrt_width = round(vrt_width) if vrt_width < max_img_size else max_img_size
-        vrt_height = round(vrt_height) if vrt_height < max_img_size else max_img_size
         vrt_params.update(
             dict(transform=vrt_transform, width=vrt_width, height=vrt_height)
         )
 
-        with WarpedVRT(src, **vrt_params) as vrt:
-            data = vrt.read(
-                out_shape=(1, vrt_height, vrt_width),
-                resampling=Resampling.bilinear,
+        with instrument.stage("read", dataset=address) as stage:
+            with WarpedVRT(src, **vrt_params) as vrt:
+                data = vrt.read(
+                    out_shape=(1, vrt_height, vrt_width),
+                    resampling=Resampling.bilinear,
+                    indexes=[1],
+                )
+            stage.set(bytes=data.nbytes)
+
+    return data
+
+
+def tile_exists(address, z, x, y):
+    """Check if a web mercator tile intersects the dataset footprint."""
+    footprint = footprint_cache.get(address)
+    if footprint is None:
+        with open_dataset(address) as src:
+            footprint = transform_bounds(
+                src.crs, "epsg:4326", *src.bounds, densify_pts=21
+            )
+        footprint_cache.set(address, footprint)
+
+    west, south, east, north = mercantile.bounds(x, y, z)
+    return (
+        west < footprint[2]
+        and east > footprint[0]
+        and south < footprint[3]
+        and north > footprint[1]
+    )
+
+
+def get_tile(address, z, x, y, tilesize=256, nodata=0):
+    """Read a web mercator tile (one windowed read of the first band)."""
+    return get_area(
+        address,
+        mercantile.xy_bounds(x, y, z),
+        bbox_crs="epsg:3857",
+        out_crs="epsg:3857",
+        nodata=nodata,
+        out_size=tilesize,
+    )
+
+
+# Pillow encoder options accepted by `encode_img`, per format
+ENCODER_OPTIONS = {
+    "png": {"compress_level", "optimize", "dpi"},
+    "jpeg": {"quality", "optimize", "progressive", "subsampling", "dpi"},
+    "webp": {"quality", "method", "lossless", "exact"},
+}
+
+
+def check_encoder_options(img_format, options):
+    """Raise ValueError for encoder options `img_format` does not accept."""
+    unknown = sorted(set(options) - ENCODER_OPTIONS.get(img_format, set()))
+    if unknown:
+        raise ValueError(f"Invalid {img_format} encoder options: {', '.join(unknown)}")
+
+
+def encode_img(img, img_format="png", **options):
+    """
+    Encode a PIL image to raw PNG, JPEG or WebP bytes.
+
+    `options` are passed to the Pillow encoder, e.g `quality` (JPEG, WebP),
+    `method` (WebP speed, 0 fastest to 6), `compress_level` (PNG, 0-9) or
+    `optimize` (see `ENCODER_OPTIONS`, others raise ValueError).
+    """
+    check_encoder_options(img_format, options)
+    if img_format == "jpeg":
+        img = img.convert("RGB")
+    elif img.mode not in ["RGB", "RGBA"]:
+        # e.g paletted image with alpha
+        img = img.convert("RGBA")
+
+    with instrument.stage("encode", format=img_format) as stage:
+        sio = BytesIO()
+        img.save(sio, img_format.upper(), **options)
+        stage.set(bytes=sio.tell())
+    return sio.getvalue()
+
+
+def format_img(content, output="bytes"):
+    """
+    Return encoded image `content` in an output mode.
+
+    `output` is "bytes" (raw bytes), "base64" (str) or a writable file object
+    (the image is written to it and the file object returned).
+    """
+    if hasattr(output, "write"):
+        output.write(content)
+        return output
+    elif output == "bytes":
+        return content
+    elif output == "base64":
+        return base64.b64encode(content).decode()
+    raise UserWarning(f"Invalid {output} output")
+
+
+def overview_level(src, size):
+    """
+    Return the smallest overview level of `src` still covering `size` pixels.
+
+    Levels are indexes in `src.overviews(1)`; None means full resolution (no
+    overviews, or none large enough).
+    """
+    level = None
+    for idx, factor in enumerate(src.overviews(1)):
+        if (
+            math.ceil(src.width / factor) < size
+            or math.ceil(src.height / factor) < size
+        ):
+            break
+        level = idx
+    return level
+
+
+def get_overview(address, ovrSize, return_level=False):
+    """
+    Get Overview.
+
+    The first band is read from the smallest internal overview still covering
+    `ovrSize` pixels, opened directly so only that level is decoded. Datasets
+    without overviews fall back to a decimated read of the full resolution.
+    With `return_level`, returns `(matrix, level)` where `level` is the
+    overview index used (None for full resolution). JPEG2000 bands are read
+    from the transcoding cache when enabled.
+    """
+    return _read_local(_get_overview, address, ovrSize, return_level=return_level)
+
+
+def _get_overview(address, ovrSize, return_level):
+    with open_dataset(address) as src:
+        level = overview_level(src, ovrSize)
+
+    options = {} if level is None else {"overview_level": level}
+    with open_dataset(address, **options) as src:
+        with instrument.stage("read", dataset=address) as stage:
+            matrix = src.read(
                 indexes=[1],
+                out_shape=(1, ovrSize, ovrSize),
+                resampling=Resampling.bilinear,
             )
+            stage.set(bytes=matrix.nbytes)
 
-    return data
+    if return_level:
+        return matrix, level
+    return matrix
 
 
-def get_overview(address, ovrSize):
-    """Get Overview."""
-    with rasterio.open(address) as src:
-        matrix = src.read(
-            indexes=[1], out_shape=(1, ovrSize, ovrSize), resampling=Resampling.bilinear
+def sample_points(src, xs, ys, nodata=0):
+    """
+    Read first band values at multiple coordinates (in the dataset CRS).
+
+    Points are sampled in one `src.sample` call, ordered by internal block so
+    each block is only fetched once. Points outside the dataset get `nodata`.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    values = np.full(xs.shape, nodata, dtype=src.dtypes[0])
+    if not xs.size:
+        return values
+
+    rows, cols = rowcol(src.transform, xs, ys)
+    rows = np.asarray(rows).reshape(xs.shape)
+    cols = np.asarray(cols).reshape(xs.shape)
+    inside = np.flatnonzero(
+        (rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width)
+    )
+    if not inside.size:
+        return values
+
+    block_height, block_width = src.block_shapes[0]
+    inside = inside[
+        np.lexsort((cols[inside] // block_width, rows[inside] // block_height))
+    ]
+    with instrument.stage("read", dataset=src.name) as stage:
+        samples = src.sample(zip(xs[inside], ys[inside]), indexes=1)
+        values[inside] = np.fromiter((v[0] for v in samples), values.dtype, inside.size)
+        stage.set(bytes=inside.size * values.itemsize)
+    return values
+
+
+def _merge_grid(arrays):
+    """Return the output transform, shape and each array bounds of a merge."""
+    res_x, res_y = arrays[0][1].a, -arrays[0][1].e
+
+    all_bounds = [array_bounds(d.shape[1], d.shape[2], t) for d, t in arrays]
+    west = min(b[0] for b in all_bounds)
+    south = min(b[1] for b in all_bounds)
+    east = max(b[2] for b in all_bounds)
+    north = max(b[3] for b in all_bounds)
+
+    width = int(round((east - west) / res_x))
+    height = int(round((north - south) / res_y))
+    dst_transform = Affine.translation(west, north) * Affine.scale(res_x, -res_y)
+    return dst_transform, (height, width), all_bounds
+
+
+def _to_grid(data, transform, bounds, crs, nodata, dst_transform, shape):
+    """Return the output window of an array and its data on the output grid."""
+    window = (
+        windows.from_bounds(*bounds, transform=dst_transform)
+        .round_offsets()
+        .round_lengths()
+        .intersection(windows.Window(0, 0, shape[1], shape[0]))
+    )
+    window_transform = windows.transform(window, dst_transform)
+    if data.shape[1:] == (window.height, window.width) and transform.almost_equals(
+        window_transform
+    ):
+        # Already on the output grid
+        return window, data
+
+    tmp = np.full(
+        (data.shape[0], window.height, window.width), nodata, dtype=data.dtype
+    )
+    reproject(
+        data,
+        tmp,
+        src_transform=transform,
+        src_crs=crs,
+        src_nodata=nodata,
+        dst_transform=window_transform,
+        dst_crs=crs,
+        dst_nodata=nodata,
+        resampling=Resampling.nearest,
+    )
+    return window, tmp
+
+
+def merge_arrays(arrays, crs, nodata=0):
+    """
+    Merge in-memory rasters.
+
+    `arrays` is a list of (data, transform) tuples, all in `crs`, with data of
+    shape (bands, height, width). The first valid pixel wins, like
+    `rasterio.merge.merge`, and the output uses the first array resolution.
+    Arrays are removed from the list as they are merged so their memory can be
+    released.
+    """
+    if not arrays:
+        raise ValueError("No data to merge")
+
+    count, dtype = arrays[0][0].shape[0], arrays[0][0].dtype
+    dst_transform, shape, all_bounds = _merge_grid(arrays)
+    dest = np.full((count,) + shape, nodata, dtype=dtype)
+
+    while arrays:
+        data, transform = arrays.pop(0)
+        window, tmp = _to_grid(
+            data, transform, all_bounds.pop(0), crs, nodata, dst_transform, shape
         )
-    return matrix
+        del data
+
+        region = dest[(slice(None),) + window.toslices()]
+        np.copyto(region, tmp, where=(region == nodata) & (tmp != nodata))
+
+    return dest, dst_transform
+
+
+def select_covering(masks, crs):
+    """
+    Select the masks adding coverage, in priority order.
+
+    `masks` is a list of (mask, transform) tuples (2D boolean arrays, all in
+    `crs`), burned on the grid `merge_arrays` would use. Returns the indexes
+    of the masks covering pixels not covered by the previous selected ones,
+    stopping once every pixel covered by any mask is covered.
+    """
+    if not masks:
+        return []
+
+    arrays = [(mask[np.newaxis].astype(np.uint8), t) for mask, t in masks]
+    dst_transform, shape, all_bounds = _merge_grid(arrays)
+
+    target = np.zeros(shape, dtype=bool)
+    aligned = []
+    for (data, transform), bounds in zip(arrays, all_bounds):
+        window, data = _to_grid(data, transform, bounds, crs, 0, dst_transform, shape)
+        slices = window.toslices()
+        aligned.append((slices, data[0] != 0))
+        target[slices] |= aligned[-1][1]
+
+    covered = np.zeros(shape, dtype=bool)
+    remaining = np.count_nonzero(target)
+    selected = []
+    for idx, (slices, mask) in enumerate(aligned):
+        if not remaining:
+            break
+        added = np.count_nonzero(mask & ~covered[slices])
+        if added:
+            selected.append(idx)
+            covered[slices] |= mask
+            remaining -= added
+    return selected
+
+
+def trim_edges(mask, width):
+    """
+    Erode a valid-data mask along rows.
+
+    Removes `width` pixels at both ends of every run of valid pixels (runs are
+    taken in row-major order, like `np.ma.notmasked_contiguous` on the
+    flattened array). Runs of at most 2 * `width` pixels are removed.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if width <= 0:
+        return mask.copy()
+
+    valid = np.zeros(mask.size + 2 * width, dtype=np.int32)
+    valid[width:-width] = mask.ravel()
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    window = 2 * width + 1
+    return (counts[window:] - counts[:-window] == window).reshape(mask.shape)
 
 
 def zeroPad(n, l):
@@ -63,16 +437,63 @@ def zeroPad(n, l):
     return str(n).zfill(l)
 
 
+def landsat_get_mtl(sceneid):
+    """Get Landsat-8 MTL metadata (cached)."""
+    meta = metadata_cache.get(sceneid)
+    if meta is None:
+        with instrument.stage("metadata", dataset=sceneid):
+            meta = rt_utils.landsat_get_mtl(sceneid)
+        metadata_cache.set(sceneid, meta)
+    return meta
+
+
+def landsat_reflectance(data, band, meta, precision="float32", nodata=0):
+    """
+    Convert Landsat-8 DN to TOA reflectance.
+
+    `meta` is the MTL `L1_METADATA_FILE` section. Values are computed in place
+    in a single `precision` ("float32" or "float64") array; `nodata` pixels
+    are set to 0.
+    """
+    dtype = np.dtype(precision)
+    if dtype not in [np.float32, np.float64]:
+        raise ValueError(f"Invalid precision: {precision}")
+
+    sun_elev = meta["IMAGE_ATTRIBUTES"]["SUN_ELEVATION"]
+    if sun_elev < 0:
+        raise ValueError("Sun elevation must be nonnegative")
+    multi_reflect = meta["RADIOMETRIC_RESCALING"][f"REFLECTANCE_MULT_BAND_{band}"]
+    add_reflect = meta["RADIOMETRIC_RESCALING"][f"REFLECTANCE_ADD_BAND_{band}"]
+
+    values = data.astype(dtype)
+    values *= multi_reflect
+    values += add_reflect
+    values /= math.sin(math.radians(sun_elev))
+    if nodata is not None:
+        values[data == nodata] = 0
+    return values
+
+
 def sentinel2_get_info(bucket, scene_path, request_pays=False):
-    """Get sentinel-2 metadata."""
-    data = json.loads(
-        aws.get_object(bucket, f"{scene_path}/tileInfo.json", request_pays=request_pays)
-    )
-    return {
+    """Get sentinel-2 metadata (cached)."""
+    cache_key = f"{bucket}/{scene_path}"
+    info = metadata_cache.get(cache_key)
+    if info is not None:
+        return info
+
+    with instrument.stage("metadata", dataset=cache_key):
+        data = json.loads(
+            aws.get_object(
+                bucket, f"{scene_path}/tileInfo.json", request_pays=request_pays
+            )
+        )
+    info = {
         "sat": data["productName"][0:3],
         "coverage": data.get("dataCoveragePercentage"),
         "cloud_coverage": data.get("cloudyPixelPercentage"),
     }
+    metadata_cache.set(cache_key, info)
+    return info
 
 
 def cbers_parse_scene_id(sceneid):
@@ -0,0 +1,121 @@
+"""Test remotepixel.aio ."""
+
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+from mock import patch
+
+from rio_toa import toa_utils
+
+from remotepixel import aio, cbers_full, cbers_ovr, l8_ndvi
+from remotepixel.executors import band_executor
+
+fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+
+landsat_scene_c1 = "LC08_L1TP_016037_20170813_20170814_01_RT"
+landsat_bucket = os.path.join(fixtures, "landsat-pds")
+landsat_path = os.path.join(
+    landsat_bucket, "c1", "L8", "016", "037", landsat_scene_c1, landsat_scene_c1
+)
+with open(f"{landsat_path}_MTL.txt", "r") as f:
+    landsat_meta = toa_utils._parse_mtl_txt(f.read())
+
+cbers_scene = "CBERS_4_MUX_20171121_057_094_L2"
+cbers_bucket = os.path.join(fixtures, "cbers-pds")
+
+
+def run(coroutine):
+    """Run a coroutine in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@patch("remotepixel.l8_ndvi.landsat_get_mtl")
+def test_point(landsat_get_mtl, monkeypatch):
+    """Should return the same value as the point handler."""
+    monkeypatch.setattr(l8_ndvi, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    expression = "(b5 - b4) / (b5 + b4)"
+    coords = [-80.073, 33.17]
+    res = run(aio.point(landsat_scene_c1, coords, expression))
+    assert res == l8_ndvi.point(landsat_scene_c1, coords, expression)
+
+
+def test_overview(monkeypatch):
+    """Should return the same image as the overview handler."""
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", cbers_bucket)
+    cbers_ovr.render.cache.clear()
+    res = run(aio.overview(cbers_scene, bands=[7, 6, 5], output="bytes"))
+    cbers_ovr.render.cache.clear()
+    assert res == cbers_ovr.create(cbers_scene, bands=[7, 6, 5], output="bytes")
+
+
+def test_full(monkeypatch):
+    """Should run the full resolution handler."""
+    monkeypatch.setattr(cbers_full, "CBERS_BUCKET", cbers_bucket)
+    expression = "(b8 - b7) / (b8 + b7)"
+    memfile = run(aio.full(cbers_scene, expression=expression, max_concurrency=2))
+    with memfile.open() as src:
+        assert src.count == 1
+
+
+def test_full_invalid():
+    """Should raise on sensors without full resolution handler."""
+    with pytest.raises(ValueError):
+        run(aio.full("S2A_tile_20170729_19UDP_0", bands=[4, 3, 2]))
+
+
+def test_global_limit(monkeypatch):
+    """Should run at most MAX_REQUESTS handlers at once."""
+    monkeypatch.setattr(aio, "MAX_REQUESTS", 2)
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def handler(x):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return x
+
+    async def requests():
+        return await asyncio.gather(*[aio.run(handler, x) for x in range(6)])
+
+    assert run(requests()) == list(range(6))
+    assert running[1] <= 2
+
+
+def test_cancel():
+    """Should stop scheduling band reads once the request is cancelled."""
+    started = threading.Event()
+    reads = []
+
+    def read(x):
+        reads.append(x)
+        started.set()
+        time.sleep(0.05)
+        return x
+
+    def handler():
+        with band_executor() as executor:
+            return executor.map(read, range(20))
+
+    async def request():
+        task = asyncio.ensure_future(aio.run(handler, max_concurrency=1))
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, started.wait, 1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run(request())
+    time.sleep(0.2)
+    assert len(reads) < 20
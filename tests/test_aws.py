@@ -0,0 +1,126 @@
+"""Test remotepixel.aws ."""
+
+import pytest
+
+from mock import patch
+
+from remotepixel import aws
+
+
+@pytest.fixture(autouse=True)
+def clear_clients():
+    """Reset the shared client pool."""
+    aws._clients.clear()
+    yield
+    aws._clients.clear()
+
+
+@patch("remotepixel.aws.boto3_session")
+def test_get_client_reuse(session):
+    """Should create the S3 client once per region."""
+    client = aws.get_client()
+    assert aws.get_client() is client
+    assert session.call_count == 1
+
+    aws.get_client("eu-central-1")
+    assert session.call_count == 2
+
+
+@patch("remotepixel.aws.boto3_session")
+def test_get_object(session):
+    """Should use the shared client and set the requester pays header."""
+    s3 = session.return_value.client.return_value
+    s3.get_object.return_value = {"Body": type("b", (), {"read": lambda s: b"a"})()}
+
+    assert aws.get_object("bucket", "key") == b"a"
+    assert aws.get_object("bucket", "key", request_pays=True) == b"a"
+    s3.get_object.assert_called_with(
+        Bucket="bucket", Key="key", RequestPayer="requester"
+    )
+    assert session.call_count == 1
+
+
+@patch("remotepixel.aws.boto3_session")
+def test_iter_object(session):
+    """Should stream the object content in chunks."""
+    s3 = session.return_value.client.return_value
+    body = s3.get_object.return_value["Body"]
+    body.iter_chunks.return_value = iter([b"a", b"b"])
+
+    chunks = aws.iter_object("bucket", "key", request_pays=True, chunk_size=1)
+    assert not s3.get_object.called
+    assert list(chunks) == [b"a", b"b"]
+    s3.get_object.assert_called_with(
+        Bucket="bucket", Key="key", RequestPayer="requester"
+    )
+    body.iter_chunks.assert_called_with(1)
+    assert body.close.call_count == 1
+
+
+@patch("remotepixel.aws.boto3_session")
+def test_iter_object_close(session):
+    """Should close the body when the consumer stops early."""
+    s3 = session.return_value.client.return_value
+    body = s3.get_object.return_value["Body"]
+    body.iter_chunks.return_value = iter([b"a", b"b"])
+
+    chunks = aws.iter_object("bucket", "key")
+    assert next(chunks) == b"a"
+    assert not body.close.called
+    chunks.close()
+    assert body.close.call_count == 1
+
+
+@patch("remotepixel.aws.get_object")
+def test_get_objects(get_object):
+    """Should fetch all keys and report failures."""
+
+    def _get(bucket, key, request_pays=False):
+        if key == "bad":
+            raise Exception("NoSuchKey")
+        return key.encode()
+
+    get_object.side_effect = _get
+    objects, errors = aws.get_objects("bucket", ["a", "bad", "b", "a"])
+    assert objects == {"a": b"a", "b": b"b"}
+    assert list(errors) == ["bad"]
+    assert get_object.call_count == 3
+
+
+@patch("remotepixel.aws.iter_object")
+def test_get_objects_decode(iter_object):
+    """Should stream objects to the decoder."""
+
+    def _iter(bucket, key, request_pays=False):
+        if key == "bad":
+            raise Exception("NoSuchKey")
+        return (chunk for chunk in [key.encode(), b"!"])
+
+    iter_object.side_effect = _iter
+    objects, errors = aws.get_objects(
+        "bucket", ["a", "bad"], decode=lambda chunks: b"".join(chunks).upper()
+    )
+    assert objects == {"a": b"A!"}
+    assert list(errors) == ["bad"]
+
+
+@patch("remotepixel.aws.boto3_session")
+def test_get_objects_decode_error(session):
+    """Should close the body when decoding fails."""
+    s3 = session.return_value.client.return_value
+    body = s3.get_object.return_value["Body"]
+    body.iter_chunks.return_value = iter([b"a", b"b"])
+
+    def decode(chunks):
+        next(chunks)
+        raise ValueError("Invalid")
+
+    objects, errors = aws.get_objects("bucket", ["a"], decode=decode)
+    assert not objects
+    assert isinstance(errors["a"], ValueError)
+    assert body.close.call_count == 1
+
+
+def test_get_objects_empty():
+    """Should return empty results."""
+    assert aws.get_objects("bucket", []) == ({}, {})
@@ -0,0 +1,48 @@
+"""Test remotepixel.blocks ."""
+
+import threading
+
+import pytest
+
+from remotepixel.blocks import process_blocks
+
+
+def test_process_blocks():
+    """Should process windows in order with all band data."""
+    windows = list(range(10))
+    readers = [lambda w: ("a", w), lambda w: ("b", w)]
+    processed = []
+    process_blocks(windows, readers, lambda w, d: processed.append((w, d)))
+    assert processed == [(w, [("a", w), ("b", w)]) for w in windows]
+
+
+def test_process_blocks_readahead():
+    """Should not read more than `read_ahead` windows in advance."""
+    lock = threading.Lock()
+    reads = []
+
+    def reader(window):
+        with lock:
+            reads.append(window)
+        return window
+
+    def process(window, data):
+        with lock:
+            assert max(reads) <= window + 2
+
+    process_blocks(range(20), [reader], process, read_ahead=2, max_workers=4)
+    assert sorted(reads) == list(range(20))
+
+
+def test_process_blocks_error():
+    """Should raise reading errors."""
+
+    def reader(window):
+        if window == 3:
+            raise ValueError("bad block")
+        return window
+
+    processed = []
+    with pytest.raises(ValueError):
+        process_blocks(range(10), [reader], lambda w, d: processed.append(w))
+    assert processed == [0, 1, 2]
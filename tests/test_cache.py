@@ -0,0 +1,152 @@
+"""Test remotepixel.cache ."""
+
+from mock import patch
+
+from remotepixel.cache import DiskCache, LRUCache, ResultCache, cache_key, cached
+
+
+def test_lru_eviction():
+    """Should evict the least recently used entry."""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_counters():
+    """Should count hits and misses."""
+    cache = LRUCache()
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 1, "maxsize": 128}
+    cache.clear()
+    assert cache.stats()["hits"] == 0
+    assert not len(cache)
+
+
+@patch("remotepixel.cache.time")
+def test_ttl(time):
+    """Should expire entries."""
+    time.monotonic.return_value = 0
+    cache = LRUCache(ttl=10)
+    cache.set("a", 1)
+    time.monotonic.return_value = 5
+    assert cache.get("a") == 1
+    time.monotonic.return_value = 11
+    assert cache.get("a", "expired") == "expired"
+    assert not len(cache)
+
+
+def test_lru_maxbytes():
+    """Should evict entries over the size limit."""
+    cache = LRUCache(maxsize=10, maxbytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    assert len(cache) == 2
+    cache.set("c", b"1")
+    assert "a" not in cache
+    assert "b" in cache and "c" in cache
+
+
+def test_disk_cache(tmpdir):
+    """Should store values on disk with size-based eviction."""
+    cache = DiskCache(str(tmpdir), maxbytes=1000)
+    cache.set("a", "x" * 400)
+    cache.set("b", "y" * 400)
+    assert cache.get("a") == "x" * 400
+    cache.set("c", "z" * 400)
+    assert "b" not in cache
+    assert len(tmpdir.listdir()) == 2
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 2
+
+    # Entries are found again by a new instance
+    cache = DiskCache(str(tmpdir), maxbytes=1000)
+    assert cache.get("c") == "z" * 400
+
+    cache.clear()
+    assert not tmpdir.listdir()
+
+
+def test_disk_cache_oversized(tmpdir):
+    """Should keep the new entry and not store entries over the budget."""
+    cache = DiskCache(str(tmpdir), maxbytes=1000)
+    cache.set("a", "x" * 400)
+    cache.set("b", "y" * 900)
+    assert "a" not in cache
+    assert cache.get("b") == "y" * 900
+    cache.set("c", "z" * 2000)
+    assert "c" not in cache
+    assert cache.get("b") == "y" * 900
+    assert len(tmpdir.listdir()) == 1
+
+
+def test_result_cache(tmpdir):
+    """Should promote disk hits to memory and report hit rate."""
+    cache = ResultCache(maxsize=1, directory=str(tmpdir))
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert "a" not in cache.memory
+    assert cache.get("a") == "1"
+    assert "a" in cache.memory
+    assert cache.get("a") == "1"
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 2 / 3
+
+    assert ResultCache().stats()["disk"] is None
+
+
+def test_cached():
+    """Should share entries between equivalent calls."""
+    calls = []
+
+    @cached(ResultCache())
+    def render(scene, bands=None, img_format="jpeg"):
+        calls.append(scene)
+        return f"{scene}{bands}{img_format}"
+
+    assert render("a", bands=[4, 3, 2]) == "a[4, 3, 2]jpeg"
+    assert render("a", (4, 3, 2)) == "a[4, 3, 2]jpeg"
+    assert render("a", [4, 3, 2], img_format="jpeg") == "a[4, 3, 2]jpeg"
+    assert len(calls) == 1
+    render("a", [4, 3, 2], img_format="png")
+    assert len(calls) == 2
+    assert render.cache.stats()["hits"] == 2
+
+
+def test_cached_depends():
+    """Should compute again when the state the result depends on changes."""
+    calls = []
+    state = {"a": 1}
+
+    @cached(ResultCache(), depends=lambda arguments: state.get(arguments["scene"]))
+    def render(scene):
+        calls.append(scene)
+        return f"{scene}{state.get(scene)}"
+
+    assert render("a") == "a1"
+    assert render("a") == "a1"
+    state["a"] = 2
+    assert render("a") == "a2"
+    assert len(calls) == 2
+
+
+def test_cache_key():
+    """Should not depend on argument order."""
+    assert cache_key("f", {"a": 1, "b": [1, 2]}) == cache_key(
+        "f", {"b": (1, 2), "a": 1}
+    )
+    assert cache_key("f", {"a": 1}) != cache_key("g", {"a": 1})
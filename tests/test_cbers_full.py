@@ -2,6 +2,8 @@
 import os
 import pytest
 
+import rasterio
+
 from remotepixel import cbers_full
 
 CBERS_SCENE = "CBERS_4_MUX_20171121_057_094_L2"
@@ -35,3 +37,47 @@ def test_create_noExpreBands(monkeypatch):
     monkeypatch.setattr(cbers_full, "CBERS_BUCKET", CBERS_BUCKET)
     with pytest.raises(Exception):
         cbers_full.create(CBERS_SCENE)
+
+
+def test_create_pipeline(monkeypatch):
+    """Should give the same output whatever the read-ahead depth."""
+    monkeypatch.setattr(cbers_full, "CBERS_BUCKET", CBERS_BUCKET)
+    bands = [7, 6, 5]
+    with cbers_full.create(CBERS_SCENE, bands=bands).open() as src:
+        expected = src.read()
+    memfile = cbers_full.create(CBERS_SCENE, bands=bands, read_ahead=1, max_workers=1)
+    with memfile.open() as src:
+        assert (src.read() == expected).all()
+
+
+def test_create_output(monkeypatch, tmpdir):
+    """Should stream the output to a path or a file object."""
+    monkeypatch.setattr(cbers_full, "CBERS_BUCKET", CBERS_BUCKET)
+    expression = "(b8 - b7) / (b8 + b7)"
+    with cbers_full.create(CBERS_SCENE, expression=expression).open() as src:
+        expected = src.read()
+
+    path = str(tmpdir.join("out.tif"))
+    res = cbers_full.create(
+        CBERS_SCENE, expression=expression, output=path, memory_budget=64 * 1024 ** 2
+    )
+    assert res == path
+    with rasterio.open(path) as src:
+        assert (src.read() == expected).all()
+
+    with open(str(tmpdir.join("out2.tif")), "wb") as f:
+        assert cbers_full.create(CBERS_SCENE, expression=expression, output=f) == f
+    with rasterio.open(str(tmpdir.join("out2.tif"))) as src:
+        assert (src.read() == expected).all()
+
+
+def test_create_budgetTooSmall(monkeypatch, tmpdir):
+    """Should raise when the memory budget can't hold a block."""
+    monkeypatch.setattr(cbers_full, "CBERS_BUCKET", CBERS_BUCKET)
+    with pytest.raises(ValueError):
+        cbers_full.create(
+            CBERS_SCENE,
+            bands=[7, 6, 5],
+            output=str(tmpdir.join("out.tif")),
+            memory_budget=1024,
+        )
@@ -39,3 +39,25 @@ def test_area_valid(monkeypatch):
     bbox = [53.0859375, 5.266007882805496, 53.4375, 5.615985819155334]
     res = cbers_ndvi.area(CBERS_SCENE, bbox, expression)
     assert res["date"] == "2017-11-21"
+
+
+def test_point_multi(monkeypatch):
+    """Should return one value per coordinates."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", CBERS_BUCKET)
+    expression = "(b8 - b7) / (b8 + b7)"
+    coords = [[53.9097, 5.3674], [53.9097, 2.3674]]
+    res = cbers_ndvi.point(CBERS_SCENE, coords, expression)
+    assert res["ndvi"].tolist() == [-0.1320754716981132, 0.0]
+
+
+def test_area_output(monkeypatch):
+    """Should return raw PNG bytes."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", CBERS_BUCKET)
+    expression = "(b8 - b7) / (b8 + b7)"
+    bbox = [53.0859375, 5.266007882805496, 53.4375, 5.615985819155334]
+    res = cbers_ndvi.area(
+        CBERS_SCENE, bbox, expression, img_format="png", output="bytes"
+    )
+    assert res["ndvi"].startswith(b"\x89PNG")
+    res = cbers_ndvi.area(CBERS_SCENE, bbox, expression, img_format="png")
+    assert isinstance(res["ndvi"], str)
@@ -1,5 +1,7 @@
 
 import os
+import base64
+from io import BytesIO
 
 import pytest
 
@@ -57,3 +59,43 @@ def test_create_validexpression(monkeypatch):
     monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
     expression = "(b8 - b7) / (b8 + b7)"
     assert cbers_ovr.create(CBERS_SCENE, expression=expression)
+
+
+def test_create_output(monkeypatch):
+    """Should return raw bytes or write to a file object."""
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    img = cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], output="bytes")
+    assert img.startswith(b"\xff\xd8")
+    assert base64.b64decode(cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5])) == img
+
+    sink = BytesIO()
+    assert cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], output=sink) is sink
+    assert sink.getvalue() == img
+
+    with pytest.raises(UserWarning):
+        cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], output="tif")
+
+
+def test_create_webp_options(monkeypatch):
+    """Should encode WebP with encoder options."""
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    high = cbers_ovr.create(
+        CBERS_SCENE, bands=[7, 6, 5], img_format="webp", output="bytes", quality=95
+    )
+    low = cbers_ovr.create(
+        CBERS_SCENE,
+        bands=[7, 6, 5],
+        img_format="webp",
+        output="bytes",
+        quality=10,
+        method=0,
+    )
+    assert high[8:12] == low[8:12] == b"WEBP"
+    assert len(low) < len(high)
+
+
+def test_create_invalid_options(monkeypatch):
+    """Should raise ValueError for unknown encoder options."""
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    with pytest.raises(ValueError):
+        cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], qualty=50)
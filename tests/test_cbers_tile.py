@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from io import BytesIO
+from PIL import Image
+
+from remotepixel import cbers_tile
+
+CBERS_SCENE = "CBERS_4_MUX_20171121_057_094_L2"
+CBERS_BUCKET = os.path.join(os.path.dirname(__file__), "fixtures", "cbers-pds")
+
+
+def test_tile_valid(monkeypatch):
+    """Should work as expected (read r,g,b bands and create PNG tile)."""
+    monkeypatch.setattr(cbers_tile, "CBERS_BUCKET", CBERS_BUCKET)
+    tile = cbers_tile.tile(CBERS_SCENE, 8, 166, 124, bands=[7, 6, 5])
+    img = Image.open(BytesIO(tile))
+    assert img.format == "PNG"
+    assert img.size == (256, 256)
+
+
+def test_tile_expression(monkeypatch):
+    """Should work as expected (apply expression and create PNG tile)."""
+    monkeypatch.setattr(cbers_tile, "CBERS_BUCKET", CBERS_BUCKET)
+    tile = cbers_tile.tile(CBERS_SCENE, 8, 166, 124, expression="(b8 - b7) / (b8 + b7)")
+    assert Image.open(BytesIO(tile)).size == (256, 256)
+
+
+def test_tile_outside(monkeypatch):
+    """Should raise an error."""
+    monkeypatch.setattr(cbers_tile, "CBERS_BUCKET", CBERS_BUCKET)
+    with pytest.raises(Exception):
+        cbers_tile.tile(CBERS_SCENE, 8, 10, 10, bands=[7, 6, 5])
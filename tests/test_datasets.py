@@ -0,0 +1,116 @@
+"""Test remotepixel.datasets ."""
+
+import os
+from concurrent import futures
+
+import pytest
+
+import rasterio
+
+from remotepixel.datasets import DatasetPool
+
+cbers_path = os.path.join(
+    os.path.dirname(__file__),
+    "fixtures",
+    "cbers-pds",
+    "CBERS4/MUX/057/094/CBERS_4_MUX_20171121_057_094_L2",
+)
+address = os.path.join(cbers_path, "CBERS_4_MUX_20171121_057_094_L2_BAND6.tif")
+address2 = os.path.join(cbers_path, "CBERS_4_MUX_20171121_057_094_L2_BAND7.tif")
+
+
+def test_pool_reuse():
+    """Should reuse idle handles."""
+    pool = DatasetPool(max_handles=2)
+    with pool.open(address) as src:
+        first = src
+    with pool.open(address) as src:
+        assert src is first
+        assert not src.closed
+
+    assert pool.stats() == {"hits": 1, "misses": 1, "size": 1, "max_handles": 2}
+
+
+def test_pool_gdal_options():
+    """Should not share handles opened with other per-dataset GDAL options."""
+    pool = DatasetPool()
+    with rasterio.Env(VSI_CACHE_SIZE=1024):
+        with pool.open(address) as src:
+            first = src
+    with pool.open(address) as src:
+        assert src is not first
+    with rasterio.Env(VSI_CACHE_SIZE=1024, GDAL_CACHEMAX=64):
+        with pool.open(address) as src:
+            assert src is first
+    assert len(pool) == 2
+
+
+def test_pool_exclusive():
+    """Should not hand out a handle already in use."""
+    pool = DatasetPool()
+    with pool.open(address) as src1:
+        with pool.open(address) as src2:
+            assert src1 is not src2
+    assert len(pool) == 2
+
+
+def test_pool_discard():
+    """Should close idle and in use handles of a discarded address."""
+    pool = DatasetPool()
+    with pool.open(address2) as other:
+        pass
+    with pool.open(address) as in_use:
+        with pool.open(address) as idle:
+            pass
+        pool.discard(address)
+        assert idle.closed
+        assert not in_use.closed
+    assert in_use.closed
+    assert not other.closed
+    assert len(pool) == 1
+
+    with pool.open(address) as src:
+        pass
+    assert not src.closed
+    assert len(pool) == 2
+
+
+def test_pool_eviction():
+    """Should close least recently used handles."""
+    pool = DatasetPool(max_handles=1)
+    with pool.open(address) as src1:
+        pass
+    with pool.open(address2) as src2:
+        pass
+    assert src1.closed
+    assert not src2.closed
+    assert len(pool) == 1
+
+    pool.clear()
+    assert src2.closed
+    assert not len(pool)
+
+
+def test_pool_error():
+    """Should close handles on error."""
+    pool = DatasetPool()
+    with pytest.raises(ValueError):
+        with pool.open(address) as src:
+            raise ValueError()
+    assert src.closed
+    assert not len(pool)
+
+
+def test_pool_concurrent():
+    """Should allow concurrent reads."""
+    pool = DatasetPool(max_handles=4)
+
+    def _read(idx):
+        with pool.open(address) as src:
+            return src.read(1, window=((0, 64), (0, 64))).sum()
+
+    with futures.ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(_read, range(20)))
+
+    assert len(set(results)) == 1
+    assert len(pool) <= 4
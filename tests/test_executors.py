@@ -0,0 +1,97 @@
+"""Test remotepixel.executors ."""
+
+import time
+import threading
+from concurrent import futures
+
+import pytest
+
+from remotepixel import executors
+
+
+def test_band_executor_private():
+    """Should use a private thread pool outside of a request."""
+    with executors.band_executor(max_workers=2) as executor:
+        assert isinstance(executor, executors.RequestExecutor)
+        assert isinstance(executor.executor, futures.ThreadPoolExecutor)
+        assert executor.max_workers == 2
+        assert list(executor.map(lambda x: x * 2, [1, 2, 3])) == [2, 4, 6]
+
+
+def test_band_executor_request():
+    """Should use the request executor within `run`."""
+    with futures.ThreadPoolExecutor(max_workers=4) as shared:
+        request = executors.RequestExecutor(shared, max_workers=2)
+
+        def handler():
+            with executors.band_executor() as executor:
+                assert executor is request
+                return executor.map(lambda x: x * 2, [1, 2, 3])
+
+        assert request.run(handler) == [2, 4, 6]
+        assert executors.current_request() is None
+
+
+def test_request_limit():
+    """Should run at most `max_workers` calls at once."""
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def worker(x):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return x
+
+    with futures.ThreadPoolExecutor(max_workers=8) as shared:
+        request = executors.RequestExecutor(shared, max_workers=2)
+        assert request.map(worker, range(10)) == list(range(10))
+    assert running[1] == 2
+
+
+def test_request_cancel():
+    """Should cancel pending calls and refuse new ones."""
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def worker(x):
+        calls.append(x)
+        started.set()
+        release.wait(1)
+        return x
+
+    with futures.ThreadPoolExecutor(max_workers=1) as shared:
+        request = executors.RequestExecutor(shared, max_workers=2)
+        first = request.submit(worker, 1)
+        second = request.submit(worker, 2)
+        started.wait(1)
+        request.cancel()
+        release.set()
+
+        assert first.result() == 1
+        assert second.cancelled()
+        assert request.cancelled
+        with pytest.raises(futures.CancelledError):
+            request.submit(worker, 3)
+        with pytest.raises(futures.CancelledError):
+            request.run(worker, 4)
+    assert calls == [1]
+
+
+def test_check_cancelled():
+    """Should only raise within a cancelled request."""
+    executors.check_cancelled()
+
+    request = executors.RequestExecutor(None)
+
+    def handler():
+        executors.check_cancelled()
+        request.cancel()
+        executors.check_cancelled()
+
+    with pytest.raises(futures.CancelledError):
+        request.run(handler)
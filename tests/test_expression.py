@@ -0,0 +1,71 @@
+"""tests remotepixel.expression."""
+
+import numpy as np
+import pytest
+
+from remotepixel.expression import Expression, compile_expression
+
+
+def test_bands_ordered():
+    """Should return unique bands in order of appearance."""
+    expr = Expression("(b5 - b4) / (b5 + b4)")
+    assert expr.bands == ("5", "4")
+    assert len(expr) == 1
+
+    expr = Expression("b4, b3,b2")
+    assert expr.bands == ("4", "3", "2")
+    assert len(expr) == 3
+
+
+def test_band_pattern():
+    """Should use custom band pattern."""
+    expr = Expression("(b8A - b04) / (b8A + b04)", band_pattern=r"[0-9A]{1,2}")
+    assert expr.bands == ("8A", "04")
+
+
+def test_compile_cached():
+    """Should return the same object for the same expression."""
+    assert compile_expression("b1 + b2") is compile_expression("b1 + b2")
+    assert compile_expression("b1 + b2") is not compile_expression("b2 + b1")
+
+
+def test_evaluate():
+    """Should evaluate each bloc."""
+    b4 = np.array([[1, 2], [3, 0]], dtype=np.uint16)
+    b5 = np.array([[3, 2], [1, 0]], dtype=np.uint16)
+    expr = Expression("(b5 - b4) / (b5 + b4)")
+    ratio = expr.evaluate([b5, b4])
+    assert ratio.shape == (1, 2, 2)
+    assert ratio.dtype == np.float64
+    np.testing.assert_allclose(ratio[0], [[0.5, 0], [-0.5, 0]])
+
+    expr = Expression("b2,b1*2")
+    data = expr.evaluate([b4, b5])
+    assert data.shape == (2, 2, 2)
+    np.testing.assert_array_equal(data[0], b4)
+    np.testing.assert_array_equal(data[1], b5 * 2)
+
+
+def test_evaluate_float32():
+    """Should keep float32 inputs as float32."""
+    b1 = np.ones((2, 2), dtype=np.float32)
+    data = Expression("b1 / 3").evaluate([b1])
+    assert data.dtype == np.float32
+
+
+def test_invalid():
+    """Should raise ValueError."""
+    with pytest.raises(ValueError):
+        Expression("")
+
+    with pytest.raises(ValueError):
+        Expression("1 + 2")
+
+    with pytest.raises(ValueError):
+        Expression("b1,,b2")
+
+    with pytest.raises(ValueError):
+        Expression("b1 +* b2")
+
+    with pytest.raises(ValueError):
+        Expression("b1 + b2").evaluate([np.ones(2)])
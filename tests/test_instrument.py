@@ -0,0 +1,98 @@
+"""Test remotepixel.instrument ."""
+
+import os
+import socket
+import logging
+
+from remotepixel import instrument, cbers_ovr
+
+CBERS_SCENE = "CBERS_4_MUX_20171121_057_094_L2"
+CBERS_BUCKET = os.path.join(os.path.dirname(__file__), "fixtures", "cbers-pds")
+
+
+def test_disabled():
+    """Should skip instrumentation without sinks."""
+    assert not instrument.enabled()
+    with instrument.stage("read", dataset="a") as stage:
+        stage.set(bytes=1)
+    assert stage is instrument._NULL_STAGE
+
+    executor = object()
+    assert instrument.pool(executor) is executor
+
+
+def test_record(monkeypatch):
+    """Should record the stages of a handler."""
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    cbers_ovr.render.cache.clear()
+    with instrument.record() as recorder:
+        assert instrument.enabled()
+        cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5])
+    assert not instrument.enabled()
+
+    stages = {event["stage"] for event in recorder.events}
+    assert {"handler", "queue", "read", "rescale", "encode"} <= stages
+    assert all(event["handler"] == "cbers_ovr.create" for event in recorder.events)
+
+    summary = recorder.summary()
+    assert summary["stages"]["handler"]["count"] == 1
+    assert summary["stages"]["read"]["count"] == 3
+    assert summary["stages"]["queue"]["count"] == 3
+    assert len(summary["datasets"]) == 3
+    for totals in summary["datasets"].values():
+        assert totals["requests"] >= 1
+        assert totals["bytes"] == 512 * 512
+    cbers_ovr.render.cache.clear()
+
+
+def test_stage_error():
+    """Should tag the event with the exception and log sink errors."""
+    events = []
+
+    def failing(event):
+        raise Exception("sink error")
+
+    instrument.add_sink(failing)
+    instrument.add_sink(events.append)
+    try:
+        try:
+            with instrument.stage("read", dataset="a"):
+                raise ValueError("read error")
+        except ValueError:
+            pass
+    finally:
+        instrument.remove_sink(failing)
+        instrument.remove_sink(events.append)
+
+    assert len(events) == 1
+    assert events[0]["stage"] == "read"
+    assert events[0]["error"] == "ValueError"
+    assert events[0]["dataset"] == "a"
+
+
+def test_logging_sink(caplog):
+    """Should log one line per event."""
+    sink = instrument.LoggingSink()
+    with caplog.at_level(logging.INFO, logger="remotepixel.instrument"):
+        sink({"stage": "read", "duration": 0.5, "dataset": "a", "handler": None})
+    assert "read 500.00ms dataset=a" in caplog.text
+
+
+def test_statsd_sink():
+    """Should send timers and byte counters."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(1)
+    sink = instrument.StatsdSink(
+        "127.0.0.1", server.getsockname()[1], prefix="test", per_handler=True
+    )
+    try:
+        sink({"stage": "read", "duration": 0.5, "handler": "l8_ovr.create", "bytes": 8})
+        data = server.recv(1024).decode()
+    finally:
+        sink.close()
+        server.close()
+
+    assert data == (
+        "test.l8_ovr.create.read:500.000|ms\ntest.l8_ovr.create.read.bytes:8|c"
+    )
@@ -1,8 +1,12 @@
 
 import os
 import pytest
+import tracemalloc
 from mock import patch
 
+import numpy as np
+import rasterio
+
 from rio_toa import toa_utils
 from remotepixel import l8_full
 
@@ -51,3 +55,42 @@ def test_create_noExpreBands(landsat_get_mtl, monkeypatch):
     landsat_get_mtl.return_value = landsat_meta
     with pytest.raises(Exception):
         l8_full.create(landsat_scene_c1)
+
+
+@patch("remotepixel.l8_full.landsat_get_mtl")
+def test_create_output(landsat_get_mtl, monkeypatch, tmpdir):
+    """Should stream the output to a path."""
+    monkeypatch.setattr(l8_full, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    path = str(tmpdir.join("out.tif"))
+    assert l8_full.create(
+        landsat_scene_c1, bands=[5, 4, 3], output=path, memory_budget=32 * 1024 ** 2
+    )
+    with rasterio.open(path) as src:
+        assert src.count == 3
+        assert src.dtypes[0] == "uint16"
+
+
+@patch("remotepixel.l8_full.landsat_get_mtl")
+def test_create_precision(landsat_get_mtl, monkeypatch):
+    """Should match the float64 path and use less memory in float32."""
+    expression = "(b5 - b4) / (b5 + b4)"
+    monkeypatch.setattr(l8_full, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+
+    results = {}
+    peaks = {}
+    for precision in ["float64", "float32"]:
+        # Warm dataset handles so only block processing is measured
+        l8_full.create(landsat_scene_c1, expression=expression, precision=precision)
+        tracemalloc.start()
+        memfile = l8_full.create(
+            landsat_scene_c1, expression=expression, precision=precision
+        )
+        peaks[precision] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        with memfile.open() as src:
+            results[precision] = src.read(1)
+
+    np.testing.assert_allclose(results["float32"], results["float64"], atol=1e-6)
+    assert peaks["float32"] < peaks["float64"]
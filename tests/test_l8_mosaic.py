@@ -0,0 +1,93 @@
+
+import os
+
+from mock import patch
+
+from rio_toa import toa_utils
+from remotepixel import l8_mosaic
+
+landsat_scene_c1 = "LC08_L1TP_016037_20170813_20170814_01_RT"
+landsat_bucket = os.path.join(os.path.dirname(__file__), "fixtures", "landsat-pds")
+
+landsat_path = os.path.join(
+    landsat_bucket, "c1", "L8", "016", "037", landsat_scene_c1, landsat_scene_c1
+)
+with open(f"{landsat_path}_MTL.txt", "r") as f:
+    landsat_meta = toa_utils._parse_mtl_txt(f.read())
+
+
+@patch("remotepixel.l8_mosaic.landsat_get_mtl")
+def test_worker_valid(landsat_get_mtl, monkeypatch):
+    """Should return reprojected uint8 data in memory."""
+    monkeypatch.setattr(l8_mosaic, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    data, transform = l8_mosaic.worker(landsat_scene_c1, [4, 3, 2])
+    assert data.shape[0] == 3
+    assert data.dtype == "uint8"
+    assert data.any()
+
+
+@patch("remotepixel.l8_mosaic.landsat_get_mtl")
+def test_worker_invalid(landsat_get_mtl, monkeypatch):
+    """Should return None."""
+    monkeypatch.setattr(l8_mosaic, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    assert not l8_mosaic.worker(landsat_scene_c1, [12, 3, 2])
+
+
+@patch("remotepixel.l8_mosaic.landsat_get_mtl")
+def test_create_valid(landsat_get_mtl, monkeypatch):
+    """Should create a mosaic without temporary files."""
+    monkeypatch.setattr(l8_mosaic, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    data, _ = l8_mosaic.worker(landsat_scene_c1, [4, 3, 2])
+
+    memfile, bounds = l8_mosaic.create([landsat_scene_c1, landsat_scene_c1])
+    with memfile.open() as src:
+        assert src.count == 3
+        assert src.crs == "epsg:3857"
+        assert src.shape == data.shape[1:]
+        assert src.read().any()
+    assert -82 < bounds[0] < bounds[2] < -78
+    assert not os.path.exists(f"/tmp/{landsat_scene_c1}.tif")
+
+
+@patch("remotepixel.l8_mosaic.landsat_get_mtl")
+def test_worker_trim(landsat_get_mtl, monkeypatch):
+    """Should remove more pixels with a larger trim width."""
+    monkeypatch.setattr(l8_mosaic, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    data, _ = l8_mosaic.worker(landsat_scene_c1, [4, 3, 2], trim=0)
+    data5, _ = l8_mosaic.worker(landsat_scene_c1, [4, 3, 2])
+    data10, _ = l8_mosaic.worker(landsat_scene_c1, [4, 3, 2], trim=10)
+    assert (data > 0).sum() > (data5 > 0).sum() > (data10 > 0).sum()
+    # mask is shared by all bands
+    assert ((data5 > 0).all(axis=0) == (data5 > 0).any(axis=0)).all()
+
+
+@patch("remotepixel.l8_mosaic.landsat_get_mtl")
+def test_footprint(landsat_get_mtl, monkeypatch):
+    """Should match the valid data of the worker without reading bands."""
+    monkeypatch.setattr(l8_mosaic, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    data, transform = l8_mosaic.worker(landsat_scene_c1, [4, 3, 2])
+    valid = (data != 0).all(axis=0)
+
+    mask, mask_transform = l8_mosaic.footprint(landsat_scene_c1)
+    assert mask_transform == transform
+    assert mask.shape == valid.shape
+    assert (mask & valid).sum() > 0.95 * (mask | valid).sum()
+    assert not l8_mosaic.footprint("LC08_L1TP_016037_20170813_20170814_01_XX")
+
+
+@patch("remotepixel.l8_mosaic.landsat_get_mtl")
+def test_create_skip_covered(landsat_get_mtl, monkeypatch):
+    """Should not read scenes adding no coverage."""
+    monkeypatch.setattr(l8_mosaic, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    invalid = "LC08_L1TP_016037_20170813_20170814_01_XX"
+    with patch("remotepixel.l8_mosaic.worker", wraps=l8_mosaic.worker) as worker:
+        memfile, _ = l8_mosaic.create([invalid, landsat_scene_c1, landsat_scene_c1])
+        memfile.close()
+    assert worker.call_count == 1
+    assert worker.call_args[0][0] == landsat_scene_c1
@@ -1,6 +1,8 @@
 
 import os
 
+import numpy as np
+
 from mock import patch
 
 from rio_toa import toa_utils
@@ -58,3 +60,32 @@ def test_area_valid(landsat_get_mtl, monkeypatch):
     res = l8_ndvi.area(landsat_scene_c1, bbox, expression)
     assert res["cloud"] == 26.70
     assert res["date"] == "2017-08-13"
+
+
+@patch("remotepixel.l8_ndvi.landsat_get_mtl")
+def test_point_multi(landsat_get_mtl, monkeypatch):
+    """Should return one value per coordinates."""
+    monkeypatch.setattr(l8_ndvi, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    expression = "(b5 - b4) / (b5 + b4)"
+    coords = [[-80.073, 33.17], [-80.0, 32.1], [-80.073, 33.17]]
+    res = l8_ndvi.point(landsat_scene_c1, coords, expression)
+    assert res["ndvi"].shape == (3,)
+    assert round(res["ndvi"][0], 5) == 0.71744
+    assert res["ndvi"][1] == 0
+    assert res["ndvi"][2] == res["ndvi"][0]
+    assert res["date"] == "2017-08-13"
+
+
+@patch("remotepixel.l8_ndvi.landsat_get_mtl")
+def test_point_precision(landsat_get_mtl, monkeypatch):
+    """Should match the float64 path in float32."""
+    monkeypatch.setattr(l8_ndvi, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    expression = "(b5 - b4) / (b5 + b4)"
+    coords = [[-80.073, 33.17], [-80.1, 33.2]]
+    res32 = l8_ndvi.point(landsat_scene_c1, coords, expression)
+    res64 = l8_ndvi.point(landsat_scene_c1, coords, expression, precision="float64")
+    assert res32["ndvi"].dtype == np.float32
+    assert res64["ndvi"].dtype == np.float64
+    np.testing.assert_allclose(res32["ndvi"], res64["ndvi"], atol=1e-6)
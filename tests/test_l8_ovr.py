@@ -1,9 +1,13 @@
 
 import os
+from io import BytesIO
+
+import numpy as np
 
 import pytest
 
 from mock import patch
+from PIL import Image
 
 from rio_toa import toa_utils
 from remotepixel import l8_ovr
@@ -83,3 +87,29 @@ def test_create_validexpression(landsat_get_mtl, monkeypatch):
     landsat_get_mtl.return_value = landsat_meta
     expression = "(b5 - b4) / (b5 + b4)"
     assert l8_ovr.create(landsat_scene_c1, expression=expression)
+
+
+@patch("remotepixel.l8_ovr.landsat_get_mtl")
+def test_render_precision(landsat_get_mtl, monkeypatch):
+    """Should render the same image in float32 and float64."""
+    monkeypatch.setattr(l8_ovr, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    images = [
+        np.asarray(
+            Image.open(
+                BytesIO(
+                    l8_ovr.render(
+                        landsat_scene_c1,
+                        bands=[4, 3, 2],
+                        img_format="png",
+                        precision=precision,
+                    )
+                )
+            )
+        ).astype(np.int16)
+        for precision in ["float32", "float64"]
+    ]
+    diff = np.abs(images[0] - images[1])
+    # Colors within 1 DN; the mask can only differ where reflectance rounds to 0
+    assert diff[..., :3].max() <= 1
+    assert (diff[..., 3] > 0).mean() < 1e-4
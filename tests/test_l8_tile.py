@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from io import BytesIO
+from mock import patch
+from PIL import Image
+
+from rio_toa import toa_utils
+from remotepixel import l8_tile
+
+landsat_scene_c1 = "LC08_L1TP_016037_20170813_20170814_01_RT"
+landsat_bucket = os.path.join(os.path.dirname(__file__), "fixtures", "landsat-pds")
+
+landsat_path = os.path.join(
+    landsat_bucket, "c1", "L8", "016", "037", landsat_scene_c1, landsat_scene_c1
+)
+with open("{}_MTL.txt".format(landsat_path), "r") as f:
+    landsat_meta = toa_utils._parse_mtl_txt(f.read())
+
+
+@patch("remotepixel.l8_tile.landsat_get_mtl")
+def test_tile_valid(landsat_get_mtl, monkeypatch):
+    """Should work as expected (read r,g,b bands and create PNG tile)."""
+    monkeypatch.setattr(l8_tile, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    tile = l8_tile.tile(landsat_scene_c1, 8, 71, 102, bands=[4, 3, 2])
+    img = Image.open(BytesIO(tile))
+    assert img.format == "PNG"
+    assert img.size == (256, 256)
+
+
+@patch("remotepixel.l8_tile.landsat_get_mtl")
+def test_tile_expression(landsat_get_mtl, monkeypatch):
+    """Should work as expected (apply expression and create 512px WebP tile)."""
+    monkeypatch.setattr(l8_tile, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    tile = l8_tile.tile(
+        landsat_scene_c1,
+        8,
+        71,
+        102,
+        expression="(b5 - b4) / (b5 + b4)",
+        tilesize=512,
+        img_format="webp",
+    )
+    img = Image.open(BytesIO(tile))
+    assert img.format == "WEBP"
+    assert img.size == (512, 512)
+
+
+@patch("remotepixel.l8_tile.landsat_get_mtl")
+def test_tile_outside(landsat_get_mtl, monkeypatch):
+    """Should raise an error without reading bands or metadata."""
+    monkeypatch.setattr(l8_tile, "LANDSAT_BUCKET", landsat_bucket)
+    with pytest.raises(Exception):
+        l8_tile.tile(landsat_scene_c1, 8, 10, 10, bands=[4, 3, 2])
+    landsat_get_mtl.assert_not_called()
+
+
+def test_tile_invalidFormat():
+    """Should raise invalid format."""
+    with pytest.raises(UserWarning):
+        l8_tile.tile(landsat_scene_c1, 8, 71, 102, bands=[4, 3, 2], img_format="tif")
+
+
+def test_tile_invalidBands():
+    """Should raise an error with invalid band combination."""
+    with pytest.raises(Exception):
+        l8_tile.tile(landsat_scene_c1, 8, 71, 102, bands=[4, 3])
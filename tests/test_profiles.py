@@ -0,0 +1,195 @@
+"""Test remotepixel.profiles ."""
+
+import os
+import asyncio
+from concurrent import futures
+
+import pytest
+from mock import patch
+
+from rasterio.env import get_gdal_config
+
+from remotepixel import (
+    aio,
+    profiles,
+    cbers_full,
+    cbers_ndvi,
+    cbers_ovr,
+    cbers_tile,
+    l8_full,
+    l8_mosaic,
+    l8_ndvi,
+    l8_ovr,
+    l8_tile,
+    s2_ndvi,
+    s2_ovr,
+    s2_tile,
+    srtm_mosaic,
+    stats,
+)
+
+CBERS_SCENE = "CBERS_4_MUX_20171121_057_094_L2"
+CBERS_BUCKET = os.path.join(os.path.dirname(__file__), "fixtures", "cbers-pds")
+
+
+@pytest.mark.parametrize("name", sorted(profiles.PROFILES))
+def test_presets(name):
+    """Should only hold GDAL options, with the common values."""
+    options = profiles.get_profile(name)
+    assert options["GDAL_DISABLE_READDIR_ON_OPEN"] == "EMPTY_DIR"
+    for key, value in options.items():
+        assert key.isupper()
+        assert key != "AWS_REQUEST_PAYER"
+        if key in profiles.COMMON and key not in profiles.PER_DATASET:
+            assert value == profiles.COMMON[key]
+
+
+def test_presets_shared():
+    """Should only differ between presets on per-dataset options."""
+    values = {}
+    for options in profiles.PROFILES.values():
+        for key, value in options.items():
+            values.setdefault(key, set()).add(value)
+    differing = {key for key, shared in values.items() if len(shared) > 1}
+    assert differing <= profiles.PER_DATASET
+    assert profiles.PROFILES["sentinel2"]["VSI_CACHE_SIZE"] == 25 * profiles.MB
+
+
+def test_presets_remote():
+    """Should merge ranges and cache reads for remote sensors."""
+    for name in ["default", "landsat", "sentinel2", "cbers"]:
+        options = profiles.get_profile(name)
+        for key, value in profiles.COMMON.items():
+            assert key in profiles.PER_DATASET or options[key] == value
+        assert options["VSI_CACHE_SIZE"] > 0
+    assert profiles.get_profile("sentinel2")["GDAL_NUM_THREADS"] == "ALL_CPUS"
+
+
+def test_get_profile():
+    """Should override and remove options."""
+    options = profiles.get_profile(
+        "landsat", {"VSI_CACHE_SIZE": 1024, "GDAL_HTTP_MULTIPLEX": None}
+    )
+    assert options["VSI_CACHE_SIZE"] == 1024
+    assert "GDAL_HTTP_MULTIPLEX" not in options
+    assert profiles.PROFILES["landsat"]["GDAL_HTTP_MULTIPLEX"] == "YES"
+
+    with pytest.raises(ValueError):
+        profiles.get_profile("modis")
+
+
+def test_profile_decorator():
+    """Should apply the profile in the handler and its worker threads."""
+
+    @profiles.profile("sentinel2")
+    def handler(key):
+        with futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return get_gdal_config(key), executor.submit(get_gdal_config, key).result()
+
+    assert handler.profile == "sentinel2"
+    assert handler("GDAL_NUM_THREADS") == ("ALL_CPUS", "ALL_CPUS")
+    options = {"GDAL_NUM_THREADS": "2"}
+    assert handler("GDAL_NUM_THREADS", gdal_options=options) == (2, 2)
+    assert get_gdal_config("GDAL_NUM_THREADS") is None
+
+
+def test_entry_points():
+    """Should apply the sensor profile to every entry point."""
+    handlers = {
+        "landsat": [
+            l8_ovr.create,
+            l8_ndvi.point,
+            l8_ndvi.area,
+            l8_tile.tile,
+            l8_full.create,
+            l8_mosaic.create,
+        ],
+        "sentinel2": [s2_ovr.create, s2_ndvi.point, s2_ndvi.area, s2_tile.tile],
+        "cbers": [
+            cbers_ovr.create,
+            cbers_ndvi.point,
+            cbers_ndvi.area,
+            cbers_tile.tile,
+            cbers_full.create,
+        ],
+        "srtm": [srtm_mosaic.create, srtm_mosaic.elevation, srtm_mosaic.profile],
+        "default": [stats.create],
+    }
+    for name, funcs in handlers.items():
+        for func in funcs:
+            assert func.__wrapped__.profile == name, func.__qualname__
+
+
+def test_handler_override(monkeypatch):
+    """Should pass `gdal_options` to the handler profile."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", CBERS_BUCKET)
+    seen = []
+
+    def sample(*args, **kwargs):
+        seen.append(get_gdal_config("VSI_CACHE_SIZE"))
+        return sample_points(*args, **kwargs)
+
+    sample_points = cbers_ndvi.sample_points
+    with patch("remotepixel.cbers_ndvi.sample_points", side_effect=sample):
+        cbers_ndvi.point(CBERS_SCENE, [53.9097, 5.3674], "(b8 - b7) / (b8 + b7)")
+        cbers_ndvi.point(
+            CBERS_SCENE,
+            [53.9097, 5.3674],
+            "(b8 - b7) / (b8 + b7)",
+            gdal_options={"VSI_CACHE_SIZE": 1024},
+        )
+    assert seen == [5 * profiles.MB] * 2 + [1024] * 2
+
+
+def _record_reads(seen):
+    """Patch the CBERS overview reads to record the active GDAL options."""
+    get_overview = cbers_ovr.get_overview
+
+    def read(*args, **kwargs):
+        seen.append(get_gdal_config("GDAL_INGESTED_BYTES_AT_OPEN"))
+        return get_overview(*args, **kwargs)
+
+    return patch("remotepixel.cbers_ovr.get_overview", side_effect=read)
+
+
+def test_bind():
+    """Should carry the options of a non-main thread to pool threads."""
+
+    def handler():
+        with futures.ThreadPoolExecutor(max_workers=1) as executor:
+            func = profiles.bind(get_gdal_config)
+            return executor.submit(func, "GDAL_NUM_THREADS").result()
+
+    with futures.ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(profiles.bind(handler)).result() is None
+        assert executor.submit(profiles.profile("sentinel2")(handler)).result() == (
+            "ALL_CPUS"
+        )
+    assert profiles.bind(handler) is handler
+
+
+def test_profile_thread(monkeypatch):
+    """Should apply the profile to band reads of a handler run in a thread."""
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    cbers_ovr.render.cache.clear()
+    seen = []
+    with _record_reads(seen):
+        with futures.ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(cbers_ovr.create, CBERS_SCENE, bands=[7, 6, 5]).result()
+    cbers_ovr.render.cache.clear()
+    assert seen == [32768] * 3
+
+
+def test_profile_aio(monkeypatch):
+    """Should apply the profile to band reads of the async handlers."""
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    cbers_ovr.render.cache.clear()
+    seen = []
+    loop = asyncio.new_event_loop()
+    try:
+        with _record_reads(seen):
+            loop.run_until_complete(aio.overview(CBERS_SCENE, bands=[7, 6, 5]))
+    finally:
+        loop.close()
+    cbers_ovr.render.cache.clear()
+    assert seen == [32768] * 3
@@ -54,3 +54,17 @@ def test_area_valid(sentinel2_get_info, monkeypatch):
     res = s2_ndvi.area(sentinel_scene, bbox, expression)
     assert res["date"] == "2017-07-29"
     assert res["sat"] == "S2B"
+
+
+@patch("remotepixel.s2_ndvi.sentinel2_get_info")
+def test_point_multi(sentinel2_get_info, monkeypatch):
+    """Should return one value per coordinates."""
+    monkeypatch.setattr(s2_ndvi, "SENTINEL_BUCKET", sentinel_bucket)
+    sentinel2_get_info.return_value = {"cloud_coverage": 5.01, "sat": "S2B"}
+    expression = "(b08 - b04) / (b08 + b04)"
+    coords = [
+        [-69.6140202938876, 48.25520824803732],
+        [-69.6140202938876, 38.25520824803732],
+    ]
+    res = s2_ndvi.point(sentinel_scene, coords, expression)
+    assert res["ndvi"].tolist() == [0.15250335699213505, 0.0]
@@ -3,6 +3,8 @@ import os
 
 import pytest
 
+from mock import patch
+
 from remotepixel import s2_ovr
 
 sentinel_scene = "S2A_tile_20170729_19UDP_0"
@@ -59,3 +61,14 @@ def test_create_validexpression(monkeypatch):
     monkeypatch.setattr(s2_ovr, "SENTINEL_BUCKET", sentinel_bucket)
     expression = "(b08 - b04) / (b08 + b04)"
     assert s2_ovr.create(sentinel_scene, expression=expression)
+
+
+def test_create_cached(monkeypatch):
+    """Should return the cached image without reading bands again."""
+    monkeypatch.setattr(s2_ovr, "SENTINEL_BUCKET", sentinel_bucket)
+    s2_ovr.render.cache.clear()
+    with patch("remotepixel.s2_ovr.get_overview", wraps=s2_ovr.get_overview) as ovr:
+        img = s2_ovr.create(sentinel_scene, bands=["04", "03", "02"], ovrSize=64)
+        assert ovr.call_count == 3
+        assert s2_ovr.create(sentinel_scene, ["04", "03", "02"], ovrSize=64) == img
+        assert ovr.call_count == 3
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from io import BytesIO
+from PIL import Image
+
+from remotepixel import s2_tile
+
+sentinel_scene = "S2A_tile_20170729_19UDP_0"
+sentinel_bucket = os.path.join(os.path.dirname(__file__), "fixtures", "sentinel-s2-l1c")
+
+
+def test_tile_valid(monkeypatch):
+    """Should work as expected (read r,g,b bands and create JPEG tile)."""
+    monkeypatch.setattr(s2_tile, "SENTINEL_BUCKET", sentinel_bucket)
+    tile = s2_tile.tile(
+        sentinel_scene, 8, 78, 88, bands=["04", "03", "02"], img_format="jpeg"
+    )
+    img = Image.open(BytesIO(tile))
+    assert img.format == "JPEG"
+    assert img.size == (256, 256)
+
+
+def test_tile_expression(monkeypatch):
+    """Should work as expected (apply expression and create PNG tile)."""
+    monkeypatch.setattr(s2_tile, "SENTINEL_BUCKET", sentinel_bucket)
+    tile = s2_tile.tile(
+        sentinel_scene, 8, 78, 88, expression="(b08 - b04) / (b08 + b04)"
+    )
+    assert Image.open(BytesIO(tile)).size == (256, 256)
+
+
+def test_tile_outside(monkeypatch):
+    """Should raise an error."""
+    monkeypatch.setattr(s2_tile, "SENTINEL_BUCKET", sentinel_bucket)
+    with pytest.raises(Exception):
+        s2_tile.tile(sentinel_scene, 8, 10, 10, bands=["04", "03", "02"])
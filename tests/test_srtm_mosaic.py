@@ -0,0 +1,170 @@
+"""Test remotepixel.srtm_mosaic ."""
+
+import gzip
+
+import pytest
+from mock import patch
+
+import numpy as np
+
+from remotepixel import srtm_mosaic
+
+TILES = ["N42W075", "N42W074", "N43W075", "N43W074"]
+
+
+def _tile(value, size=121):
+    data = np.full((size, size), value, dtype=">i2")
+    data[0, 0] = srtm_mosaic.HGT_VOID
+    return gzip.compress(data.tobytes())
+
+
+def _chunks(data, size=100):
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start with an empty tile cache."""
+    srtm_mosaic.tile_cache.clear()
+    yield
+    srtm_mosaic.tile_cache.clear()
+
+
+@pytest.fixture
+def iter_object():
+    """Serve synthetic tiles, N42W074 is missing."""
+    objects = {
+        srtm_mosaic._tile_key(tile): _tile(i + 1) for i, tile in enumerate(TILES)
+    }
+    del objects[srtm_mosaic._tile_key("N42W074")]
+
+    def _iter(bucket, key, **kwargs):
+        if key not in objects:
+            raise Exception("NoSuchKey")
+        return _chunks(objects[key])
+
+    with patch("remotepixel.aws.iter_object", side_effect=_iter) as mock:
+        yield mock
+
+
+def test_decode_tile():
+    """Should decode streamed big-endian tiles and map voids to nodata."""
+    data = srtm_mosaic.decode_tile(_chunks(_tile(-12)))
+    assert data.shape == (121, 121)
+    assert data.dtype == np.int16
+    assert data[0, 0] == srtm_mosaic.SRTM_NODATA
+    assert data[1, 1] == -12
+    assert not data.flags.writeable
+
+    with pytest.raises(ValueError):
+        srtm_mosaic.decode_tile([gzip.compress(b"\x00" * 10)])
+
+
+def test_tile_transform():
+    """Should center edge pixels on the tile bounds."""
+    transform = srtm_mosaic.tile_transform("S01E010", 3601)
+    assert transform.a == pytest.approx(1 / 3600)
+    assert transform * (0.5, 0.5) == pytest.approx((10, 0))
+    assert transform * (3600.5, 3600.5) == pytest.approx((11, -1))
+
+
+def test_create(iter_object):
+    """Should merge the available tiles."""
+    memfile = srtm_mosaic.create(TILES)
+    with memfile.open() as dataset:
+        assert dataset.nodata == srtm_mosaic.SRTM_NODATA
+        assert dataset.shape == (241, 241)
+        assert dataset.bounds.left == pytest.approx(-75 - 1 / 240)
+        assert dataset.bounds.top == pytest.approx(44 + 1 / 240)
+        data = dataset.read(1)
+    assert data[0, 0] == srtm_mosaic.SRTM_NODATA
+    assert data[1, 1] == 3
+    assert data[-1, -1] == srtm_mosaic.SRTM_NODATA
+    assert iter_object.call_count == 4
+
+
+def test_create_cache(iter_object):
+    """Should reuse decoded tiles between requests."""
+    srtm_mosaic.create(TILES[:1])
+    srtm_mosaic.create(TILES[:1] + TILES[2:] + TILES[:1])
+    assert iter_object.call_count == 3
+    assert srtm_mosaic.tile_cache.stats()["hits"] == 1
+
+
+@pytest.fixture
+def gradient():
+    """Serve N42W075 with values equal to the column index."""
+    data = np.tile(np.arange(121, dtype=">i2"), (121, 1))
+    data[0, 0] = srtm_mosaic.HGT_VOID
+    objects = {srtm_mosaic._tile_key("N42W075"): gzip.compress(data.tobytes())}
+
+    def _iter(bucket, key, **kwargs):
+        if key not in objects:
+            raise Exception("NoSuchKey")
+        return _chunks(objects[key])
+
+    with patch("remotepixel.aws.iter_object", side_effect=_iter) as mock:
+        yield mock
+
+
+def test_tile_name():
+    """Should name the tile covering a coordinate."""
+    assert srtm_mosaic.tile_name(-74.5, 42.5) == "N42W075"
+    assert srtm_mosaic.tile_name(10, -0.5) == "S01E010"
+    assert srtm_mosaic.tile_name(180, 0) == "N00E179"
+
+
+def test_elevation(gradient):
+    """Should sample the covering tiles only."""
+    assert srtm_mosaic.elevation([-74.5, 42.5]) == 60
+    values = srtm_mosaic.elevation(
+        [
+            [-75, 43],
+            [-74.5, 42.1],
+            [-74 - 0.1 / 120, 42],
+            [-74, 42.5],
+            [-74.5 + 0.3 / 120, 42],
+        ]
+    )
+    assert np.isnan(values[0])
+    assert values[1:3].tolist() == [60, 120]
+    assert np.isnan(values[3])
+    assert values[4] == 60
+    assert gradient.call_count == 3
+    assert srtm_mosaic.elevation(np.empty((0, 2))).shape == (0,)
+
+
+def test_elevation_interpolate(gradient):
+    """Should interpolate between valid pixels."""
+    values = srtm_mosaic.elevation(
+        [
+            [-74.5 + 0.25 / 120, 42.5],
+            [-74 - 0.5 / 120, 42],
+            [-75 + 0.5 / 120, 43 - 1e-9],
+        ],
+        interpolate=True,
+    )
+    assert values[:2] == pytest.approx([60.25, 119.5])
+    # The void pixel is left out
+    assert values[2] == pytest.approx(1)
+
+
+def test_profile(gradient):
+    """Should sample evenly spaced points along the line."""
+    result = srtm_mosaic.profile(
+        {
+            "type": "LineString",
+            "coordinates": [[-75, 42.5], [-74.6, 42.5], [-74.2, 42.5]],
+        },
+        n_samples=5,
+    )
+    assert result["coordinates"][:, 0] == pytest.approx(
+        [-75, -74.8, -74.6, -74.4, -74.2]
+    )
+    assert result["distance"][-1] == pytest.approx(65600, rel=0.01)
+    assert result["elevation"].tolist() == [0, 24, 48, 72, 96]
+
+    with pytest.raises(ValueError):
+        srtm_mosaic.profile([[-75, 42.5]])
+    with pytest.raises(ValueError):
+        srtm_mosaic.profile([[-75, 42.5], [-74, 42.5]], n_samples=1)
@@ -0,0 +1,142 @@
+"""Test remotepixel.stats ."""
+
+import os
+import json
+
+import pytest
+
+from mock import patch
+
+from rio_toa import toa_utils
+
+from remotepixel import stats, cbers_ovr, cbers_tile, cbers_ndvi, l8_ndvi
+from remotepixel.utils import metadata_cache
+
+CBERS_SCENE = "CBERS_4_MUX_20171121_057_094_L2"
+CBERS_BUCKET = os.path.join(os.path.dirname(__file__), "fixtures", "cbers-pds")
+CBERS_PATH = os.path.join(
+    CBERS_BUCKET, "CBERS4/MUX/057/094/CBERS_4_MUX_20171121_057_094_L2/"
+)
+
+landsat_scene_c1 = "LC08_L1TP_016037_20170813_20170814_01_RT"
+landsat_bucket = os.path.join(os.path.dirname(__file__), "fixtures", "landsat-pds")
+landsat_path = os.path.join(
+    landsat_bucket, "c1", "L8", "016", "037", landsat_scene_c1, landsat_scene_c1
+)
+with open("{}_MTL.txt".format(landsat_path), "r") as f:
+    landsat_meta = toa_utils._parse_mtl_txt(f.read())
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start each test without statistics in memory."""
+    stats.stats_cache.clear()
+    yield
+    stats.stats_cache.clear()
+
+
+def test_band_stats():
+    """Should compute statistics from the lowest resolution overview."""
+    address = f"{CBERS_PATH}{CBERS_SCENE}_BAND6.tif"
+    band = stats.band_stats(address, bins=16)
+    assert band["min"] > 0
+    assert band["min"] <= band["pc"][0] <= band["pc"][1] <= band["max"]
+    assert len(band["histogram"][0]) == 16
+    assert len(band["histogram"][1]) == 17
+
+    band = stats.band_stats(address, convert=lambda values: values / 255.0)
+    assert band["max"] <= 1
+
+
+def test_create_sidecar(tmpdir, monkeypatch):
+    """Should store statistics as a JSON sidecar and merge new bands."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", CBERS_BUCKET)
+    directory = str(tmpdir)
+    result = stats.create(CBERS_SCENE, [7, 6], directory=directory)
+    assert list(result["bands"]) == ["7", "6"]
+    assert result["percentiles"] == [2, 98]
+
+    with open(stats.sidecar_path(CBERS_SCENE, directory)) as f:
+        assert json.load(f) == result
+
+    stats.create(CBERS_SCENE, [5], directory=directory)
+    stats.stats_cache.clear()
+    assert set(stats.load(CBERS_SCENE, directory=directory)["bands"]) == {"5", "6", "7"}
+
+
+def test_load_missing(tmpdir):
+    """Should return None without statistics."""
+    assert not stats.load(CBERS_SCENE)
+    assert not stats.load(CBERS_SCENE, directory=str(tmpdir))
+    assert not stats.band_ranges(CBERS_SCENE, [7, 6, 5])
+
+
+def test_band_ranges(monkeypatch):
+    """Should return ranges only when all bands have statistics."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", CBERS_BUCKET)
+    result = stats.create(CBERS_SCENE, [7, 6])
+    assert stats.band_ranges(CBERS_SCENE, [7, 6]) == [
+        result["bands"]["7"]["pc"],
+        result["bands"]["6"]["pc"],
+    ]
+    assert stats.band_ranges(CBERS_SCENE, [7, 6], scale=2)[0] == [
+        v * 2 for v in result["bands"]["7"]["pc"]
+    ]
+    assert not stats.band_ranges(CBERS_SCENE, [7, 6, 5])
+
+
+@patch("remotepixel.l8_ndvi.landsat_get_mtl")
+def test_create_landsat(landsat_get_mtl, monkeypatch):
+    """Should compute Landsat-8 statistics in TOA reflectance."""
+    monkeypatch.setattr(l8_ndvi, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    result = stats.create(landsat_scene_c1, [4])
+    assert 0 < result["bands"]["4"]["pc"][1] < 1
+
+
+@patch("remotepixel.cbers_ovr.histogram_percentiles")
+def test_ovr_uses_sidecar(histogram_percentiles, monkeypatch):
+    """Should rescale with the sidecar percentiles."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", CBERS_BUCKET)
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    cbers_ovr.render.cache.clear()
+    stats.create(CBERS_SCENE, [7, 6, 5])
+    assert cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], ovrSize=64)
+    histogram_percentiles.assert_not_called()
+
+
+def test_ovr_cached_before_sidecar(monkeypatch):
+    """Should not return a render cached before the statistics existed."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", CBERS_BUCKET)
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    cbers_ovr.render.cache.clear()
+    default = cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], ovrSize=64)
+    stats.create(CBERS_SCENE, [7, 6, 5])
+    stretched = cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], ovrSize=64)
+    assert stretched != default
+    assert cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], ovrSize=64) == stretched
+    assert cbers_ovr.render.cache.stats()["hits"] == 1
+
+
+def test_ovr_metadata_counters(monkeypatch):
+    """Should not count statistics lookups as metadata lookups."""
+    monkeypatch.setattr(cbers_ovr, "CBERS_BUCKET", CBERS_BUCKET)
+    cbers_ovr.render.cache.clear()
+    metadata_cache.clear()
+    cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], ovrSize=64)
+    cbers_ovr.create(CBERS_SCENE, bands=[7, 6, 5], ovrSize=64)
+    assert metadata_cache.stats()["hits"] == metadata_cache.stats()["misses"] == 0
+    assert stats.stats_cache.stats()["misses"] == 3
+
+
+def test_tile_uses_sidecar(monkeypatch):
+    """Should rescale tiles with the sidecar percentiles."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", CBERS_BUCKET)
+    monkeypatch.setattr(cbers_tile, "CBERS_BUCKET", CBERS_BUCKET)
+    default = cbers_tile.tile(CBERS_SCENE, 8, 166, 124, bands=[7, 6, 5])
+    stats.create(CBERS_SCENE, [7, 6, 5])
+    with patch(
+        "remotepixel.cbers_tile.band_ranges", wraps=cbers_tile.band_ranges
+    ) as ranges:
+        assert cbers_tile.tile(CBERS_SCENE, 8, 166, 124, bands=[7, 6, 5]) != default
+        ranges.assert_called_once_with(CBERS_SCENE, [7, 6, 5])
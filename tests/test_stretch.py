@@ -0,0 +1,49 @@
+"""Test remotepixel.stretch ."""
+
+import numpy as np
+
+from remotepixel.stretch import histogram_percentiles
+
+
+def test_integer_exact():
+    """Should match np.percentile on integer data."""
+    rng = np.random.RandomState(0)
+    data = rng.normal(8000, 2000, (300, 300)).clip(1, 65535).astype(np.uint16)
+    mask = (rng.rand(300, 300) > 0.3).astype(np.uint8) * 255
+    expected = np.percentile(data[mask > 0], (2, 98))
+    np.testing.assert_allclose(histogram_percentiles(data, mask), expected, atol=1)
+
+    data = rng.randint(0, 256, (300, 300)).astype(np.uint8)
+    expected = np.percentile(data, (2, 50, 98))
+    np.testing.assert_allclose(
+        histogram_percentiles(data, percentiles=(2, 50, 98)), expected, atol=1
+    )
+
+
+def test_float_close():
+    """Should match np.percentile within a bin on float data."""
+    rng = np.random.RandomState(0)
+    data = rng.gamma(2, 0.05, (300, 300))
+    mask = (rng.rand(300, 300) > 0.3).astype(np.uint8) * 255
+    data[mask == 0] = 0
+    expected = np.percentile(data[mask > 0], (2, 98))
+    bin_width = data.max() / 4096
+    np.testing.assert_allclose(
+        histogram_percentiles(data, mask), expected, atol=bin_width
+    )
+
+
+def test_constant():
+    """Should handle constant data."""
+    data = np.full((10, 10), 0.5, dtype=np.float32)
+    assert histogram_percentiles(data) == [0.5, 0.5]
+    data = np.full((10, 10), 7, dtype=np.uint8)
+    assert histogram_percentiles(data) == [7, 7]
+
+
+def test_empty_mask():
+    """Should return NaN without valid pixel."""
+    data = np.ones((10, 10), dtype=np.uint8)
+    mask = np.zeros((10, 10), dtype=np.uint8)
+    assert np.isnan(histogram_percentiles(data, mask)).all()
+    assert np.isnan(histogram_percentiles(np.array([]))).all()
@@ -0,0 +1,101 @@
+"""Test remotepixel.timeseries ."""
+
+import os
+
+from mock import patch
+
+import rasterio
+from rasterio.env import get_gdal_config
+from rio_toa import toa_utils
+
+from remotepixel import timeseries, l8_ndvi, s2_ndvi, cbers_ndvi
+
+fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+
+landsat_scene_c1 = "LC08_L1TP_016037_20170813_20170814_01_RT"
+landsat_bucket = os.path.join(fixtures, "landsat-pds")
+landsat_path = os.path.join(
+    landsat_bucket, "c1", "L8", "016", "037", landsat_scene_c1, landsat_scene_c1
+)
+with open(f"{landsat_path}_MTL.txt", "r") as f:
+    landsat_meta = toa_utils._parse_mtl_txt(f.read())
+
+sentinel_scene = "S2A_tile_20170729_19UDP_0"
+sentinel_bucket = os.path.join(fixtures, "sentinel-s2-l1c")
+
+cbers_scene = "CBERS_4_MUX_20171121_057_094_L2"
+cbers_bucket = os.path.join(fixtures, "cbers-pds")
+
+
+@patch("remotepixel.l8_ndvi.landsat_get_mtl")
+def test_timeseries_landsat(landsat_get_mtl, monkeypatch):
+    """Should return one value per scene and report invalid scenes."""
+    monkeypatch.setattr(l8_ndvi, "LANDSAT_BUCKET", landsat_bucket)
+    landsat_get_mtl.return_value = landsat_meta
+    expression = "(b5 - b4) / (b5 + b4)"
+    coords = [-80.073, 33.17]
+    scenes = [landsat_scene_c1, "LC08_L1TP_016037_20170813_20170814_01_XX", "S3_bad"]
+    res = list(timeseries.timeseries(scenes, coords, expression))
+    assert len(res) == 3
+
+    values = [r for r in res if "error" not in r]
+    assert len(values) == 1
+    assert values[0]["scene"] == landsat_scene_c1
+    assert values[0]["date"] == "2017-08-13"
+    assert round(values[0]["ndvi"], 5) == 0.71744
+
+    errors = sorted(r["scene"] for r in res if "error" in r)
+    assert errors == ["LC08_L1TP_016037_20170813_20170814_01_XX", "S3_bad"]
+
+
+@patch("remotepixel.s2_ndvi.sentinel2_get_info")
+def test_timeseries_mixed(sentinel2_get_info, monkeypatch):
+    """Should sample Sentinel-2 and CBERS scenes in the same series."""
+    monkeypatch.setattr(s2_ndvi, "SENTINEL_BUCKET", sentinel_bucket)
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", cbers_bucket)
+    sentinel2_get_info.return_value = {"cloud_coverage": 5.01, "sat": "S2B"}
+
+    expression = "(b08 - b04) / (b08 + b04)"
+    coords = [-69.6140202938876, 48.25520824803732]
+    res = list(timeseries.timeseries([sentinel_scene], coords, expression))
+    assert res[0]["sat"] == "S2B"
+    assert round(res[0]["ndvi"], 5) == 0.1525
+
+    expression = "(b8 - b7) / (b8 + b7)"
+    coords = [53.9097, 5.3674]
+    res = list(timeseries.timeseries([cbers_scene, cbers_scene], coords, expression))
+    assert [round(r["ndvi"], 5) for r in res] == [-0.13208, -0.13208]
+
+
+def test_timeseries_empty():
+    """Should not yield anything."""
+    assert not list(timeseries.timeseries([], [0, 0], "b1"))
+
+
+def test_timeseries_env(monkeypatch):
+    """Should apply the profile to the reads only, not around each yield."""
+    monkeypatch.setattr(cbers_ndvi, "CBERS_BUCKET", cbers_bucket)
+    seen = []
+
+    def sample(*args, **kwargs):
+        seen.append(get_gdal_config("VSI_CACHE_SIZE"))
+        return sample_points(*args, **kwargs)
+
+    sample_points = timeseries.sample_points
+    expression = "(b8 - b7) / (b8 + b7)"
+    coords = [53.9097, 5.3674]
+    with patch("remotepixel.timeseries.sample_points", side_effect=sample):
+        with rasterio.Env(GDAL_CACHEMAX=64):
+            series = timeseries.timeseries(
+                [cbers_scene] * 3,
+                coords,
+                expression,
+                max_workers=1,
+                gdal_options={"VSI_CACHE_SIZE": 1024},
+            )
+            res = [next(series)]
+            assert "GDAL_HTTP_MULTIPLEX" not in rasterio.env.getenv()
+            assert get_gdal_config("GDAL_HTTP_MULTIPLEX") is None
+        res.extend(series)
+    assert [round(r["ndvi"], 5) for r in res] == [-0.13208] * 3
+    assert seen == [1024] * 6
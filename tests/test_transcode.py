@@ -0,0 +1,208 @@
+"""Test remotepixel.transcode ."""
+
+import os
+import threading
+
+import pytest
+from mock import patch
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from remotepixel import transcode, utils
+from remotepixel.datasets import pool
+
+sentinel_bucket = os.path.join(os.path.dirname(__file__), "fixtures", "sentinel-s2-l1c")
+sentinel_path = os.path.join(sentinel_bucket, "tiles/19/U/DP/2017/7/29/0")
+
+
+@pytest.fixture
+def cache(tmpdir, monkeypatch):
+    """Enable the transcoding cache."""
+    cache = transcode.TranscodeCache(str(tmpdir.mkdir("cache")))
+    monkeypatch.setattr(transcode, "cache", cache)
+    yield cache
+    pool.clear()
+
+
+def _band(path, size):
+    data = np.arange(size * size, dtype=np.uint16).reshape(size, size)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        count=1,
+        dtype="uint16",
+        width=size,
+        height=size,
+        crs="epsg:32619",
+        transform=from_origin(399960, 5400000, 10, 10),
+    ) as dst:
+        dst.write(data, 1)
+    return data
+
+
+def test_overview_factors():
+    """Should decimate down to half a block."""
+    assert transcode.overview_factors(10980, 10980) == [2, 4, 8, 16, 32]
+    assert transcode.overview_factors(1024, 300) == [2, 4]
+    assert transcode.overview_factors(122, 122) == []
+
+
+def test_transcode(tmpdir):
+    """Should write a tiled, compressed GeoTIFF with overviews."""
+    address = str(tmpdir.join("B04.jp2"))
+    data = _band(address, 1100)
+    path = str(tmpdir.join("B04.tif"))
+    transcode.transcode(address, path)
+    with rasterio.open(path) as src:
+        assert src.driver == "GTiff"
+        assert src.block_shapes[0] == (512, 512)
+        assert src.compression.name == "deflate"
+        assert src.overviews(1) == [2, 4]
+        assert src.crs == "epsg:32619"
+        assert (src.read(1) == data).all()
+
+
+def test_cache(cache):
+    """Should transcode a band once and reuse the file."""
+    address = os.path.join(sentinel_path, "B04.jp2")
+    path = cache.get(address)
+    assert path.startswith(cache.directory) and path.endswith(".tif")
+    assert cache.get(address) == path
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert [f.endswith(".tif") for f in os.listdir(cache.directory)] == [True]
+
+    with rasterio.open(address) as src, rasterio.open(path) as dst:
+        assert (src.read() == dst.read()).all()
+
+    # Files are found again by a new instance
+    cache = transcode.TranscodeCache(cache.directory)
+    assert cache.get(address) == path
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_eviction(cache):
+    """Should remove least recently used files over the budget."""
+    paths = [cache.get(os.path.join(sentinel_path, f"B0{b}.jp2")) for b in (2, 3)]
+    # Room for two files
+    cache.maxbytes = int(2.5 * max(os.path.getsize(path) for path in paths))
+    cache.get(os.path.join(sentinel_path, "B02.jp2"))
+    cache.get(os.path.join(sentinel_path, "B04.jp2"))
+    assert os.path.exists(paths[0])
+    assert not os.path.exists(paths[1])
+    assert len(cache) == 2
+
+
+def test_cache_eviction_handles(cache):
+    """Should close pooled handles of evicted files."""
+    path = cache.get(os.path.join(sentinel_path, "B02.jp2"))
+    with utils.open_dataset(path) as src:
+        pass
+    cache.maxbytes = int(1.5 * os.path.getsize(path))
+    cache.get(os.path.join(sentinel_path, "B03.jp2"))
+    assert not os.path.exists(path)
+    assert src.closed
+
+
+def test_cache_concurrent(cache):
+    """Should transcode once for concurrent requests."""
+    address = os.path.join(sentinel_path, "B04.jp2")
+    started = threading.Event()
+    release = threading.Event()
+
+    def _transcode(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return transcode_func(*args, **kwargs)
+
+    transcode_func = transcode.transcode
+    with patch("remotepixel.transcode.transcode", side_effect=_transcode) as mock:
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get(address)))
+            for _ in range(3)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert mock.call_count == 1
+    assert len(set(results)) == 1
+    assert not cache._pending
+
+
+def test_cache_error(cache):
+    """Should not keep partial files."""
+    with pytest.raises(Exception):
+        cache.get(os.path.join(sentinel_path, "B99.jp2"))
+    assert not os.listdir(cache.directory)
+    assert not len(cache)
+
+
+def test_cache_stale(tmpdir):
+    """Should remove temporary files left by a killed process."""
+    stale = tmpdir.join("tmpa.tmp")
+    stale.write(b"partial")
+    os.utime(str(stale), (0, 0))
+    recent = tmpdir.join("tmpb.tmp")
+    recent.write(b"partial")
+    cache = transcode.TranscodeCache(str(tmpdir))
+    assert not stale.exists()
+    assert recent.exists()
+    assert not len(cache)
+
+
+def test_local_address(cache, monkeypatch):
+    """Should only transcode JPEG2000 addresses of an enabled cache."""
+    address = os.path.join(sentinel_path, "B04.jp2")
+    assert transcode.local_address("s3://bucket/B4.TIF") == "s3://bucket/B4.TIF"
+    assert transcode.local_address(address).startswith(cache.directory)
+
+    monkeypatch.setattr(transcode, "cache", None)
+    assert transcode.local_address(address) == address
+
+
+def test_get_overview_area(cache):
+    """Should read the same values from the transcoded band."""
+    address = os.path.join(sentinel_path, "B04.jp2")
+    bbox = [-69.6, 48.2, -69.4, 48.4]
+    cached = utils.get_overview(address, 512), utils.get_area(address, bbox)
+    assert cache.stats()["misses"] == 1
+
+    with patch("remotepixel.transcode.cache", None):
+        direct = utils.get_overview(address, 512), utils.get_area(address, bbox)
+    assert (cached[0] == direct[0]).all()
+    assert (cached[1] == direct[1]).all()
+
+
+def test_cache_oversized(tmpdir):
+    """Should return the address of bands over the budget, transcoded once."""
+    cache = transcode.TranscodeCache(str(tmpdir), maxbytes=1000)
+    address = os.path.join(sentinel_path, "B04.jp2")
+    with patch("remotepixel.transcode.transcode", wraps=transcode.transcode) as mock:
+        assert cache.get(address) == address
+        assert cache.get(address) == address
+    assert mock.call_count == 1
+    assert not os.listdir(cache.directory)
+
+
+def test_get_overview_area_evicted(cache):
+    """Should read the JPEG2000 band if the transcoded file is gone."""
+    address = os.path.join(sentinel_path, "B04.jp2")
+    bbox = [-69.6, 48.2, -69.4, 48.4]
+    with patch("remotepixel.transcode.cache", None):
+        direct = utils.get_overview(address, 512), utils.get_area(address, bbox)
+
+    path = cache.get(address)
+    with patch.object(cache, "get", return_value=path):
+        os.remove(path)
+        pool.clear()
+        evicted = utils.get_overview(address, 512), utils.get_area(address, bbox)
+    assert (evicted[0] == direct[0]).all()
+    assert (evicted[1] == direct[1]).all()
@@ -1,14 +1,22 @@
 """Test remotepixel.utils ."""
 
 import os
+import json
+from io import BytesIO
 
 import pytest
 
+import numpy as np
+import rasterio
+
+from PIL import Image
+
+from mock import Mock, patch
+
 from rio_toa import toa_utils
 
 from remotepixel import utils
 
-
 mtl_file = os.path.join(
     os.path.dirname(__file__), "fixtures", "LC80140352017115LGN00_MTL.txt"
 )
@@ -64,3 +72,243 @@ def test_cbers_id_valid():
         "sensor": "CBERS",
     }
     assert utils.cbers_parse_scene_id(scene) == expected_content
+
+
+@patch("remotepixel.utils.rt_utils")
+def test_landsat_get_mtl_cached(rt_utils):
+    """Should only fetch the MTL once per scene."""
+    utils.metadata_cache.clear()
+    rt_utils.landsat_get_mtl.return_value = meta_data
+    scene = "LC08_L1TP_016037_20170813_20170814_01_RT"
+    assert utils.landsat_get_mtl(scene) == meta_data
+    assert utils.landsat_get_mtl(scene) == meta_data
+    rt_utils.landsat_get_mtl.assert_called_once_with(scene)
+    assert utils.metadata_cache.hits == 1
+
+
+@patch("remotepixel.utils.aws.get_object")
+def test_sentinel2_get_info_cached(get_object):
+    """Should only fetch tileInfo.json once per scene."""
+    utils.metadata_cache.clear()
+    get_object.return_value = json.dumps(
+        {
+            "productName": "S2A_MSIL1C_20170729T155901",
+            "dataCoveragePercentage": 100,
+            "cloudyPixelPercentage": 5.01,
+        }
+    ).encode()
+    expected = {"sat": "S2A", "coverage": 100, "cloud_coverage": 5.01}
+    path = "tiles/19/U/DP/2017/7/29/0"
+    assert utils.sentinel2_get_info("sentinel-s2-l1c", path) == expected
+    assert utils.sentinel2_get_info("sentinel-s2-l1c", path) == expected
+    assert get_object.call_count == 1
+
+
+def test_sample_points():
+    """Should read values and return 0 outside the dataset."""
+    address = os.path.join(
+        os.path.dirname(__file__),
+        "fixtures",
+        "cbers-pds",
+        "CBERS4/MUX/057/094/CBERS_4_MUX_20171121_057_094_L2",
+        "CBERS_4_MUX_20171121_057_094_L2_BAND6.tif",
+    )
+    with rasterio.open(address) as src:
+        x, y = src.xy(10, 20)
+        xs = [x, src.bounds.left - 100, x]
+        ys = [y, src.bounds.top, y]
+        values = utils.sample_points(src, xs, ys)
+        expected = src.read(1, window=((10, 11), (20, 21)))[0, 0]
+        assert not utils.sample_points(src, [], []).size
+
+    assert values.tolist() == [expected, 0, expected]
+
+
+def test_merge_arrays():
+    """Should merge arrays with first valid pixel priority."""
+    from rasterio.transform import from_origin
+
+    arr1 = np.zeros((1, 4, 4), dtype=np.uint8)
+    arr1[:, :, 1:] = 1
+    arr2 = np.full((1, 4, 4), 2, dtype=np.uint8)
+    arrays = [(arr1, from_origin(0, 4, 1, 1)), (arr2, from_origin(2, 6, 1, 1))]
+    dest, transform = utils.merge_arrays(arrays, "epsg:3857")
+    assert not arrays
+    assert dest.shape == (1, 6, 6)
+    assert transform == from_origin(0, 6, 1, 1)
+    expected = np.array(
+        [
+            [0, 0, 2, 2, 2, 2],
+            [0, 0, 2, 2, 2, 2],
+            [0, 1, 1, 1, 2, 2],
+            [0, 1, 1, 1, 2, 2],
+            [0, 1, 1, 1, 0, 0],
+            [0, 1, 1, 1, 0, 0],
+        ]
+    )
+    assert (dest[0] == expected).all()
+
+    with pytest.raises(ValueError):
+        utils.merge_arrays([], "epsg:3857")
+
+
+def test_merge_arrays_resample():
+    """Should only resample arrays off the output grid."""
+    from rasterio.transform import from_origin
+
+    arr1 = np.ones((1, 4, 4), dtype=np.uint8)
+    arr2 = np.full((1, 2, 2), 2, dtype=np.uint8)
+    arrays = [(arr1, from_origin(0, 4, 1, 1)), (arr2, from_origin(0, 4, 2, 2))]
+    with patch("remotepixel.utils.reproject", wraps=utils.reproject) as reproject:
+        dest, _ = utils.merge_arrays(arrays, "epsg:3857", nodata=255)
+    assert reproject.call_count == 1
+    assert (dest == 1).all()
+
+    arrays = [(arr2, from_origin(0, 4, 2, 2)), (arr1, from_origin(0, 4, 1, 1))]
+    dest, transform = utils.merge_arrays(arrays, "epsg:3857", nodata=255)
+    assert dest.shape == (1, 2, 2)
+    assert (dest == 2).all()
+
+
+def test_select_covering():
+    """Should select masks adding coverage, in order."""
+    from rasterio.transform import from_origin
+
+    left = np.zeros((4, 4), dtype=bool)
+    left[:, :2] = True
+    full = np.ones((4, 4), dtype=bool)
+    masks = [
+        (left, from_origin(0, 4, 1, 1)),
+        (left[:, :1], from_origin(1, 4, 1, 1)),
+        (full, from_origin(0, 4, 1, 1)),
+        (full, from_origin(0, 4, 1, 1)),
+        # Coarser mask, resampled on the grid
+        (np.ones((2, 2), dtype=bool), from_origin(2, 4, 2, 2)),
+    ]
+    assert utils.select_covering(masks, "epsg:3857") == [0, 2, 4]
+    assert utils.select_covering(masks[:4], "epsg:3857") == [0, 2]
+    assert utils.select_covering([], "epsg:3857") == []
+    assert utils.select_covering(masks[3:4], "epsg:3857") == [0]
+
+
+def test_trim_edges():
+    """Should match trimming each contiguous run."""
+    np.random.seed(1)
+    mask = np.random.rand(50, 60) > 0.1
+    mask[10:20, :] = False
+    mask[30, :] = True
+
+    expected = mask.copy().ravel()
+    for sl in np.ma.notmasked_contiguous(np.ma.masked_values(mask.ravel(), 0)):
+        expected[sl.start : sl.start + 5] = False
+        expected[sl.stop - 5 : sl.stop] = False
+
+    assert (utils.trim_edges(mask, 5) == expected.reshape(mask.shape)).all()
+    assert (utils.trim_edges(mask, 0) == mask).all()
+    assert not utils.trim_edges(np.ones((1, 9), dtype=bool), 5).any()
+
+
+def test_trim_edges_boundary():
+    """Should remove runs of 2 * width pixels and keep longer ones."""
+    assert not utils.trim_edges(np.ones((1, 4), dtype=bool), 2).any()
+    trimmed = utils.trim_edges(np.ones((1, 5), dtype=bool), 2)
+    assert trimmed.tolist() == [[False, False, True, False, False]]
+
+
+def test_get_overview_level():
+    """Should read from the smallest overview covering the requested size."""
+    landsat_scene_c1 = "LC08_L1TP_016037_20170813_20170814_01_RT"
+    landsat_bucket = os.path.join(os.path.dirname(__file__), "fixtures", "landsat-pds")
+    landsat_path = os.path.join(
+        landsat_bucket, "c1", "L8", "016", "037", landsat_scene_c1, landsat_scene_c1
+    )
+    # BQA fixture is 255x259 with one overview (decimation 2)
+    address = f"{landsat_path}_BQA.TIF"
+    matrix, level = utils.get_overview(address, 100, return_level=True)
+    assert matrix.shape == (1, 100, 100)
+    assert level == 0
+
+    matrix, level = utils.get_overview(address, 200, return_level=True)
+    assert matrix.shape == (1, 200, 200)
+    assert level is None
+
+    # No overviews: decimated read of full resolution
+    address = f"{landsat_path}_B4.TIF"
+    matrix, level = utils.get_overview(address, 64, return_level=True)
+    assert matrix.shape == (1, 64, 64)
+    assert level is None
+
+
+def test_overview_level():
+    """Should pick the largest decimation still covering the size."""
+    src = Mock(width=7000, height=6000)
+    src.overviews.return_value = [2, 4, 8, 16, 32]
+    assert utils.overview_level(src, 512) == 2
+    assert utils.overview_level(src, 375) == 3
+    assert utils.overview_level(src, 100) == 4
+    assert utils.overview_level(src, 4000) is None
+    src.overviews.return_value = []
+    assert utils.overview_level(src, 512) is None
+
+
+def test_get_tile():
+    """Should read a tile on the exact tile grid."""
+    landsat_scene_c1 = "LC08_L1TP_016037_20170813_20170814_01_RT"
+    landsat_bucket = os.path.join(os.path.dirname(__file__), "fixtures", "landsat-pds")
+    landsat_path = os.path.join(
+        landsat_bucket, "c1", "L8", "016", "037", landsat_scene_c1, landsat_scene_c1
+    )
+    address = f"{landsat_path}_B4.TIF"
+    utils.metadata_cache.clear()
+    utils.footprint_cache.clear()
+    assert utils.tile_exists(address, 8, 71, 102)
+    assert not utils.tile_exists(address, 8, 10, 10)
+    assert utils.footprint_cache.hits == 1
+    assert not utils.metadata_cache.hits + utils.metadata_cache.misses
+    assert utils.get_tile(address, 8, 71, 102).shape == (1, 256, 256)
+    assert utils.get_tile(address, 8, 71, 102, tilesize=512).shape == (1, 512, 512)
+
+
+def test_encode_img():
+    """Should return raw image bytes."""
+    img = Image.fromarray(np.zeros((16, 16, 3), dtype=np.uint8))
+    img.putalpha(255)
+    assert utils.encode_img(img, "png").startswith(b"\x89PNG")
+    assert utils.encode_img(img, "jpeg").startswith(b"\xff\xd8")
+    assert utils.encode_img(img, "webp")[8:12] == b"WEBP"
+
+
+def test_encode_img_options():
+    """Should pass encoder options and reject unknown ones."""
+    img = Image.fromarray(np.zeros((16, 16, 3), dtype=np.uint8))
+    assert utils.encode_img(img, "jpeg", quality=50, optimize=True)
+    with pytest.raises(ValueError):
+        utils.encode_img(img, "jpeg", qualty=50)
+    with pytest.raises(ValueError):
+        utils.encode_img(img, "png", quality=50)
+
+
+def test_format_img():
+    """Should return bytes, base64 or write to a file object."""
+    assert utils.format_img(b"abc") == b"abc"
+    assert utils.format_img(b"abc", "base64") == "YWJj"
+    sink = BytesIO()
+    assert utils.format_img(b"abc", sink) is sink
+    assert sink.getvalue() == b"abc"
+    with pytest.raises(UserWarning):
+        utils.format_img(b"abc", "hex")
+
+
+def test_landsat_reflectance():
+    """Should compute TOA reflectance in float32 or float64."""
+    meta = meta_data["L1_METADATA_FILE"]
+    data = np.array([[0, 7000], [12000, 65535]], dtype=np.uint16)
+    ref32 = utils.landsat_reflectance(data, 4, meta)
+    ref64 = utils.landsat_reflectance(data, 4, meta, precision="float64")
+    assert ref32.dtype == np.float32
+    assert ref64.dtype == np.float64
+    assert ref32[0, 0] == 0
+    np.testing.assert_allclose(ref32, ref64, rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        utils.landsat_reflectance(data, 4, meta, precision="int16")